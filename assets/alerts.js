@@ -0,0 +1,65 @@
+// Rain alerts of the logged in traveller (alert_scheduler.py), polled from the server.
+// The sidebar of a logged in traveller carries a badge with id "alert-badge-<user>". While it is shown,
+// /alerts/<user> is polled every POLL_MS with the number of the last alert seen, and a newer alert updates
+// the badge with the number of periods of rain that have not ended. Dash re-renders the sidebar on
+// navigation, so the last value is re-applied.
+// Alerts carrying the probability of rain (rain_stats.py) show it in the title of the badge.
+(function () {
+    var polling = {};
+    var latest = {};
+    var POLL_MS = 30000;    // alert_scheduler.POLL_INTERVAL
+
+    function apply(user) {
+        var badge = document.getElementById('alert-badge-' + user);
+        if (badge && latest[user]) {
+            badge.textContent = String(latest[user].upcoming);
+            var alert = latest[user];
+            badge.title = 'Rain expected on ' + alert.day + ' from ' + alert.start;
+            if (alert.probability !== undefined) {
+                badge.title += ' (' + Math.round(100 * alert.probability) + '% chance, confidence ' +
+                    Math.round(100 * alert.confidence) + '%)';
+            }
+        }
+    }
+
+    function poll(user) {
+        // Stops once the traveller has left the pages, or the session is not theirs (403)
+        if (!document.getElementById('alert-badge-' + user)) {
+            delete polling[user];
+            return;
+        }
+        var since = latest[user] ? latest[user].id : 0;
+        fetch('/alerts/' + encodeURIComponent(user) + '?since=' + since, {credentials: 'same-origin'})
+            .then(function (response) {
+                if (response.status === 403) {
+                    delete polling[user];
+                    return null;
+                }
+                return response.status === 200 ? response.json() : null;
+            })
+            .then(function (alert) {
+                if (alert) {
+                    latest[user] = alert;
+                    apply(user);
+                }
+            })
+            .catch(function () {})
+            .then(function () {
+                if (polling[user]) {
+                    setTimeout(function () { poll(user); }, POLL_MS);
+                }
+            });
+    }
+
+    new MutationObserver(function () {
+        var badges = document.querySelectorAll('[id^="alert-badge-"]');
+        for (var i = 0; i < badges.length; i++) {
+            var user = badges[i].id.slice('alert-badge-'.length);
+            if (!polling[user] && window.fetch) {
+                polling[user] = true;
+                poll(user);
+            }
+            apply(user);
+        }
+    }).observe(document.documentElement, {childList: true, subtree: true});
+})();
@@ -0,0 +1,404 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Benchmark harness for the recommendation and weather pipelines.
+# The generate_*() functions produce synthetic data in the same schema as the CSV files in the repository - vehicle fleets (veh_.csv), excluded vehicles (ex_vehicle_.csv), travellers (pedestrian_preference.csv) and hourly forecasts starting today (WeeklyWeather.csv) - placed around the Monaco scenario.
+# Each benchmark is registered in BENCHMARKS with a setup function (builds the inputs for a size, not timed), a run function (timed) and the largest size it is run for by default, as some of the functions are quadratic or draw every vehicle on a map.
+# import_time() measures the cold import of the modules a gunicorn worker loads on boot with python -X importtime, in a fresh interpreter each time; the results are stored as 'import:<module>' entries next to the other benchmarks.
+# planar_accuracy() checks the planar distance mode of the vehicle index (DISTANCE_METRIC=planar) against haversine over the scenario: the largest relative error of the distances, and the share of queries whose closest vehicles are the same. main() fails when the error exceeds PLANAR_TOLERANCE.
+# run_benchmarks() runs every benchmark for every size, takes the best and median of a few repeats, and writes the results to a JSON file. compare() checks the results against a stored baseline file and flags every benchmark whose median time grew by more than the tolerance.
+#
+# Usage:
+#   python benchmark.py                                   # default sizes, writes benchmark_results.json
+#   python benchmark.py --sizes 100 1000000 --no-limits   # every benchmark up to a million vehicles
+#   python benchmark.py --save-baseline                   # store the results as benchmark_baseline.json
+#   python benchmark.py --baseline benchmark_baseline.json  # exit code 1 on regression
+
+# In[1]:
+
+
+# Importing libraries
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# In[2]:
+
+
+# Bounding box of the Monaco scenario
+LAT_RANGE = (43.72, 43.77)
+LON_RANGE = (7.40, 7.46)
+VEHICLE_TYPES = ['taxi', 'uber']
+EX_VEHICLE_TYPES = ['moped', 'motorcycle', 'passenger', 'coach', 'delivery']
+FUEL_TYPES = ['electric', 'petrol', 'diesel']
+WEATHER_TYPES = ['Clear', 'Cloudy', 'Light Rain', 'Low clouds', 'Rain', 'Rain and Thunderstorm', 'Windy', 'Sunny']
+TRAVELLERS = [('Mary Jane', 'electric'), ('Alex Joe', 'petrol/diesel')]
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_PATH = 'benchmark_results.json'
+BASELINE_PATH = 'benchmark_baseline.json'
+# Largest relative error of the planar distances against haversine within the scenario
+PLANAR_TOLERANCE = 0.002
+
+
+def _coords(rng, n):
+    return rng.uniform(*LAT_RANGE, n), rng.uniform(*LON_RANGE, n)
+
+
+def _edge_ids(rng, n):
+    return np.char.add(np.char.add(rng.integers(150000, 160000, n).astype(str), '_'), rng.integers(0, 10, n).astype(str))
+
+
+def generate_fleet(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat, lon = _coords(rng, n)
+    edges = _edge_ids(rng, n)
+    return pd.DataFrame({
+        'vehicle_id': ['vehicle_%d' % i for i in range(n)],
+        'vehicle_eclass': 'hbefa3/pc_g_eu4',
+        'vehicle_fuel': rng.uniform(0.5, 2.0, n).round(2),
+        'laneID': np.char.add(edges, '_0'),
+        'vehicle_type': rng.choice(VEHICLE_TYPES, n),
+        'vehicle_x': rng.uniform(0, 10000, n).round(2),
+        'vehicle_y': rng.uniform(0, 10000, n).round(2),
+        'edgeID': edges,
+        'lon': lon,
+        'lat': lat,
+        'cluster_label': rng.integers(0, 7, n),
+        'fuel_type': rng.choice(FUEL_TYPES, n),
+        'phnum': rng.integers(9020000000, 9030000000, n),
+        'driver_name': ['Driver %d' % i for i in range(n)],
+    })
+
+
+def generate_ex_vehicles(n, seed=1):
+    rng = np.random.default_rng(seed)
+    lat, lon = _coords(rng, n)
+    edges = _edge_ids(rng, n)
+    return pd.DataFrame({
+        'vehicle_id': ['ex_vehicle_%d' % i for i in range(n)],
+        'vehicle_eclass': 'hbefa3/ldv',
+        'vehicle_fuel': rng.uniform(0.5, 4.0, n).round(2),
+        'laneID': np.char.add(edges, '_0'),
+        'vehicle_type': rng.choice(EX_VEHICLE_TYPES, n),
+        'vehicle_x': rng.uniform(0, 10000, n).round(2),
+        'vehicle_y': rng.uniform(0, 10000, n).round(2),
+        'edgeID': edges,
+        'lon': lon,
+        'lat': lat,
+        'cluster_label': rng.integers(0, 7, n),
+    })
+
+
+# veh_rec() recommends for the two known travellers, so traveller names and fuel preferences alternate between them
+def generate_travellers(n, seed=2):
+    rng = np.random.default_rng(seed)
+    lat, lon = _coords(rng, n)
+    edges = _edge_ids(rng, n)
+    names, fuels = zip(*[TRAVELLERS[i % 2] for i in range(n)])
+    return pd.DataFrame({
+        'person_id': ['pedestrian_%d' % i for i in range(n)],
+        'person_x': lon,
+        'person_y': lat,
+        'edgeID': edges,
+        'laneID': np.char.add(edges, '_0'),
+        'cluster_label': rng.integers(0, 7, n),
+        'traveller_name': list(names),
+        'fuel_preference': list(fuels),
+        'travel_mode': 'ebike',
+    })
+
+
+# Hourly forecast starting today, so rainy_days() always finds the coming week
+def generate_weather(months, seed=3):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp(datetime.date.today())
+    dates = pd.date_range(start, start + pd.DateOffset(months=months), freq='h', inclusive='left')
+    return pd.DataFrame({
+        'Weekday': dates.day_name(),
+        'Date': dates.strftime('%Y-%m-%d ') + dates.hour.astype(str) + ':00',
+        'Temp': rng.integers(5, 30, len(dates)),
+        'Weather': rng.choice(WEATHER_TYPES, len(dates)),
+    })
+
+
+# In[3]:
+
+
+# Setup functions return the arguments of the timed function for a size
+
+def _setup_rainy_days(months):
+    generate_weather(months).to_csv('WeeklyWeather.csv', index=False)
+    return ()
+
+
+def _run_rainy_days():
+    from rain_alert_fn import rainy_days
+    return rainy_days()
+
+
+def _setup_points(n):
+    fleet = generate_fleet(n)
+    traveller = generate_travellers(1)
+    return fleet[['lat', 'lon']].to_numpy().tolist(), [[traveller['person_y'][0], traveller['person_x'][0]]]
+
+
+def _run_closest(points, v):
+    from vehicle_recommendation import closest
+    return closest(points, v)
+
+
+def _run_third_nearest(points, v):
+    from vehicle_recommendation import third_nearest
+    return third_nearest(points, v)
+
+
+def _setup_veh_rec(n):
+    return generate_travellers(2), generate_fleet(n), ['Monday']
+
+
+def _run_veh_rec(travellers, fleet, rainy):
+    from vehicle_recommendation import veh_rec
+    return veh_rec(travellers, fleet, rainy)
+
+
+def _setup_cluster_fn(n):
+    return (generate_fleet(n)[['vehicle_id', 'lat', 'lon']],)
+
+
+def _run_cluster_fn(df):
+    from loc_clustering import cluster_fn
+    return cluster_fn(df.copy(), 1, 3, 7)
+
+
+def _run_select_k(df):
+    from loc_clustering import select_k
+    return select_k(df, 1, 3)
+
+
+def _setup_map_html(n):
+    os.makedirs('maps', exist_ok=True)
+    traveller = generate_travellers(1)
+    return traveller['person_y'][0], traveller['person_x'][0], generate_fleet(n), generate_ex_vehicles(n)
+
+
+def _run_map_html(lat, lng, fleet, ex_fleet):
+    from prepare_map import map_html
+    return map_html(lat, lng, fleet, 'bench', 'Mary Jane', 500, ex_fleet)
+
+
+# One cluster per 20 vehicles, up to 500, with one traveller per 2 vehicles spread over the same clusters
+def _setup_rebalancing(n):
+    clusters = min(max(n // 20, 7), 500)
+    fleet = generate_fleet(n)
+    travellers = generate_travellers(max(n // 2, 2))
+    fleet['cluster_label'] = np.random.default_rng(4).integers(0, clusters, n)
+    travellers['cluster_label'] = np.random.default_rng(5).integers(0, clusters, len(travellers))
+    start = datetime.datetime.combine(datetime.date.today(), datetime.time(8))
+    return fleet, travellers, [(start, start + datetime.timedelta(hours=3))]
+
+
+def _run_rebalancing(fleet, travellers, windows):
+    from rebalancing import rebalancing_plan
+    return rebalancing_plan(fleet, travellers, windows, now=windows[0][0])
+
+
+# Live vehicle index with either distance metric, queried for the closest vehicles of 200 travellers
+def _setup_index(n, metric):
+    from vehicle_index import VehicleIndex
+    travellers = generate_travellers(200)
+    return VehicleIndex.from_frame(generate_fleet(n), metric=metric), travellers['person_y'].tolist(), travellers['person_x'].tolist()
+
+
+def _setup_index_haversine(n):
+    return _setup_index(n, 'haversine')
+
+
+def _setup_index_planar(n):
+    return _setup_index(n, 'planar')
+
+
+def _run_index_nearest(index, lat, lon):
+    return [index.nearest(a, b, 3) for a, b in zip(lat, lon)]
+
+
+# name -> (setup, run, largest default size, size unit)
+BENCHMARKS = {
+    'rainy_days': (_setup_rainy_days, _run_rainy_days, 12, 'months'),
+    'closest': (_setup_points, _run_closest, 10**6, 'vehicles'),
+    'third_nearest': (_setup_points, _run_third_nearest, 10**6, 'vehicles'),
+    'veh_rec': (_setup_veh_rec, _run_veh_rec, 10**4, 'vehicles'),
+    'cluster_fn': (_setup_cluster_fn, _run_cluster_fn, 10**5, 'vehicles'),
+    'select_k': (_setup_cluster_fn, _run_select_k, 10**6, 'vehicles'),
+    'map_html': (_setup_map_html, _run_map_html, 10**3, 'vehicles'),
+    'rebalancing': (_setup_rebalancing, _run_rebalancing, 10**4, 'vehicles'),
+    'index_haversine': (_setup_index_haversine, _run_index_nearest, 10**6, 'vehicles'),
+    'index_planar': (_setup_index_planar, _run_index_nearest, 10**6, 'vehicles'),
+}
+
+# Modules imported by a gunicorn worker before it serves the login page, and the heavy modules behind the pages
+IMPORT_MODULES = ['app', 'vehicle_recommendation', 'prepare_map', 'loc_clustering']
+
+
+# In[4]:
+
+
+# Cumulative import time of a module (seconds) and its slowest imports, from the -X importtime report of a fresh interpreter.
+# The background import of the dashboard pages is turned off, so only the boot path of app is measured.
+def import_time(module):
+    env = dict(os.environ, PRELOAD_PAGES='0')
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % module],
+                          cwd=REPO_DIR, env=env, capture_output=True, text=True)
+    total = None
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or '|' not in line or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((int(cumulative_us), int(self_us), name.strip()))
+        if name.strip() == module and name[1:2] != ' ':
+            total = int(cumulative_us) / 1e6
+    if total is None:
+        raise RuntimeError('import of %s failed:\n%s' % (module, proc.stderr[-2000:]))
+    slowest = sorted((i for i in imports if not i[2].startswith('encodings')), reverse=True)[:10]
+    return total, [{'module': name, 'cumulative_s': c / 1e6, 'self_s': s / 1e6} for c, s, name in slowest]
+
+
+# One untimed warm-up call, so that module imports and first-call caches are not counted
+def time_call(fn, args, repeat):
+    fn(*args)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def run_imports(repeat=3):
+    results = []
+    for module in IMPORT_MODULES:
+        import_time(module)  # warm-up, writes the .pyc files
+        runs = [import_time(module) for _ in range(repeat)]
+        timings = [total for total, _ in runs]
+        results.append({'name': 'import:' + module, 'size': 1, 'unit': 'import',
+                        'median_s': statistics.median(timings), 'min_s': min(timings), 'repeat': repeat,
+                        'slowest': runs[timings.index(min(timings))][1]})
+        print('%-30s median %.6fs  min %.6fs' % ('import:' + module, results[-1]['median_s'], results[-1]['min_s']))
+    return results
+
+
+def run_benchmarks(sizes=(10**2, 10**3, 10**4), months=(1, 3), repeat=3, only=None, limits=True, imports=True):
+    results = run_imports(repeat) if imports and not only else []
+    cwd = os.getcwd()
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    # Benchmarks write their input files (WeeklyWeather.csv) and maps to a scratch directory
+    with tempfile.TemporaryDirectory() as scratch:
+        os.chdir(scratch)
+        try:
+            for name, (setup, run, max_size, unit) in BENCHMARKS.items():
+                if only and name not in only:
+                    continue
+                for size in (months if unit == 'months' else sizes):
+                    if limits and size > max_size:
+                        results.append({'name': name, 'size': size, 'unit': unit, 'skipped': True})
+                        continue
+                    timings = time_call(run, setup(size), repeat)
+                    results.append({'name': name, 'size': size, 'unit': unit,
+                                    'median_s': statistics.median(timings), 'min_s': min(timings), 'repeat': repeat})
+                    print('%-14s %9d %-8s median %.6fs  min %.6fs' % (name, size, unit, results[-1]['median_s'], results[-1]['min_s']))
+        finally:
+            os.chdir(cwd)
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+
+
+def planar_accuracy(n=10000, queries=500, k=3):
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    from road_routing import haversine_m
+    from vehicle_index import VehicleIndex
+    fleet = generate_fleet(n)
+    travellers = generate_travellers(queries)
+    planar = VehicleIndex.from_frame(fleet, metric='planar')
+    lat, lon = travellers['person_y'].to_numpy(), travellers['person_x'].to_numpy()
+    worst = 0.0
+    for a, b in zip(lat[:50], lon[:50]):
+        exact = haversine_m(a, b, fleet['lat'].to_numpy(), fleet['lon'].to_numpy())
+        approx = planar.distance(a, b, fleet['lat'].to_numpy(), fleet['lon'].to_numpy())
+        far = exact > 1.0
+        worst = max(worst, float(np.max(np.abs(approx[far] - exact[far]) / exact[far])))
+    haversine = VehicleIndex.from_frame(fleet, metric='haversine')
+    same = sum([v for _, v in planar.nearest(a, b, k)] == [v for _, v in haversine.nearest(a, b, k)] for a, b in zip(lat, lon))
+    return {'max_relative_error': worst, 'same_nearest': same / queries, 'tolerance': PLANAR_TOLERANCE}
+
+
+# Benchmarks whose median time grew by more than the tolerance (0.2 = 20%) against the baseline
+def compare(report, baseline, tolerance=0.2):
+    base = {(r['name'], r['size']): r for r in baseline['results'] if not r.get('skipped')}
+    regressions = []
+    for r in report['results']:
+        b = base.get((r['name'], r['size']))
+        if r.get('skipped') or b is None:
+            continue
+        ratio = r['median_s'] / b['median_s'] if b['median_s'] > 0 else float('inf')
+        r['baseline_median_s'] = b['median_s']
+        r['ratio'] = ratio
+        r['regression'] = ratio > 1 + tolerance
+        if r['regression']:
+            regressions.append(r)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the recommendation and weather pipelines on synthetic data.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10**2, 10**3, 10**4], help='fleet sizes (number of vehicles)')
+    parser.add_argument('--months', type=int, nargs='+', default=[1, 3], help='hourly forecast lengths in months')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='run only these benchmarks')
+    parser.add_argument('--no-limits', action='store_true', help='run every benchmark for every size')
+    parser.add_argument('--no-imports', action='store_true', help='skip the -X importtime measurements')
+    parser.add_argument('--output', default=RESULTS_PATH)
+    parser.add_argument('--baseline', help='baseline results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slow down before flagging a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='also store the results as %s' % BASELINE_PATH)
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.sizes, args.months, args.repeat, args.only, not args.no_limits, not args.no_imports)
+    report['planar_accuracy'] = accuracy = planar_accuracy()
+    print('planar distances: max relative error %.5f, same %d nearest for %.1f%% of the travellers' % (
+        accuracy['max_relative_error'], 3, 100 * accuracy['same_nearest']))
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        report['regressions'] = len(regressions)
+        for r in regressions:
+            print('REGRESSION %-30s %9d  %.6fs -> %.6fs (x%.2f)' % (r['name'], r['size'], r['baseline_median_s'], r['median_s'], r['ratio']))
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 1 if regressions or accuracy['max_relative_error'] > PLANAR_TOLERANCE else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
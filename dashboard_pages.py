@@ -0,0 +1,874 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Pages of the dashboard for the logged in travellers.
+# Importing this module runs the recommendation pipeline: the datasets are read, the rainy days identified, the closest vehicles found and the maps built. When another worker has already run it for the same inputs, its snapshot is attached instead. The module then builds the layouts that depend on those results - side bars, weather cards, home, notification and profile pages.
+# app.py imports this module in a background thread at start up. The login page is served while the pipeline is still running, and the page call back waits for the import to finish before returning a page.
+# When the snapshot is out of date (snapshot_current() - an input changed or the hour turned), app.py runs this module again as a new module in the background and swaps it in once it is built; requests keep using the previous pages until then. The live fleet (live_fleet.py) is shared by every version of the pages.
+
+# In[1]:
+
+
+import pandas as pd
+import datetime
+import os
+
+from dash import dash_table
+from dash import dcc, html
+import dash_bootstrap_components as dbc
+
+from rain_alert_fn import rainy_days, rain_windows # function for checking inclement weather days
+from alert_scheduler import scheduler as alert_scheduler # rain alerts pushed to the browser ahead of the rain
+from rain_stats import load_rain_stats # probability of rain from the rolling weather history
+from prepare_map import map_html # function for building the map for dashboard
+from vehicle_recommendation import veh_rec # function for finding the closest vehicles available for the passenger
+from road_routing import load_graph # road graph for ranking vehicles by network distance
+from eta_cache import load_speed_table, SPEED_TABLE_PATH # per edge and hour speeds for estimated pickup time
+from emission_factors import load_emission_factors, attach_emission_factors, EMISSION_FACTORS_PATH # CO2 per km for emission-aware ranking
+from vehicle_index import VehicleIndex # live grid index of the vehicle positions
+from live_fleet import vehicle_index, fleet_feed, recommender, multimodal # live fleet of the worker, kept across snapshots
+from vehicle_table import prepare_table, PAGE_SIZE # server-side paging and sorting of the vehicle table
+from profile_store import open_profile_store, PROFILE_DB_PATH, USERNAMES # indexed traveller profiles
+from snapshot_store import snapshot_key, snapshot_lock, attach_snapshot, publish_snapshot # pipeline results shared by the workers
+from metrics import span # timing of the hot paths, exported on /metrics
+from static_assets import asset_url # fingerprinted URLs of the images, built with python static_assets.py
+from styles import SIDEBAR_STYLE, CONTENT_STYLE, BUTTON_STYLE, style_data_conditional
+
+
+# ###### Recommendation Pipeline
+
+# The pipeline runs in one worker only. Its results are published as a snapshot (snapshot_store.py) that the other gunicorn workers attach read-only, instead of each worker reading the datasets and building the maps again.
+# live_index - the vehicle index kept up to date by the fleet feed of this worker; the closest vehicles are looked up at their live positions. Without it (the first snapshot of a worker) the index is built from veh_.csv.
+def run_pipeline(live_index=None):
+
+    # ###### Processed Dataset
+
+    with span('build_graph'):
+        road_graph = load_graph('Most_edges.csv') #Road network built once from the edge geometry - None without it, vehicles are then ranked by straight-line distance
+    speed_table = load_speed_table() #Memory-mapped speed table, built offline with python eta_cache.py
+    profiles = open_profile_store() #Indexed traveller profiles, built offline with python profile_store.py
+    if profiles is not None:
+        with span('profile_load'):
+            ebike_travellers = profiles.segment(travel_mode='ebike')
+            travellers = {user: profiles.profile_for_user(user) for user in USERNAMES}
+    else:
+        with span('csv_load'):
+            pedestrian_preference = pd.read_csv('pedestrian_preference.csv', index_col=0)  #Pedestrian dataset
+        ebike_travellers = pedestrian_preference.loc[pedestrian_preference['travel_mode'] == 'ebike']  #Pedestrian dataset
+        travellers = {user: pedestrian_preference.loc[pedestrian_preference['traveller_name'] == name].reset_index().iloc[0].to_dict()
+                      for user, name in USERNAMES.items()}
+
+
+    with span('csv_load'):
+        veh_ = pd.read_csv('veh_.csv', index_col=0)  #Vehicle dataset to be considered for the passenger
+    veh_ = attach_emission_factors(veh_, load_emission_factors()) #CO2 per km, built offline with python emission_factors.py
+    co2_weight = None #Set to emission_factors.CO2_WEIGHT to rank vehicles by distance + CO2 per km
+    with span('csv_load'):
+        ex_vehicle_ = pd.read_csv('ex_vehicle_.csv', index_col=0) #Excluded vehicle dataset for map
+
+    # ###### Weather Info - Identifying Inclement Weather
+
+    #Invoking function to identify the days with inclement weather.
+    # Function is defined in rain_alert_fn.ipynb
+    # Function returns list of days when rain is expected, in the upcoming week (ie, 7 days from today)
+    with span('rainy_days'):
+        rainy_days_,wkday,temptre,wkdate = rainy_days()
+
+    # Periods of rain, for the alerts of the travellers
+    windows = rain_windows()
+
+    # Probability of rain of every period and of the first rainy day, from the weather history - only the rows added since the last run are read
+    with span('rain_stats'):
+        rain_stats = load_rain_stats()
+    rain_chances = [rain_stats.window_probability(start, end) for start, end in windows]
+    rain_chance = rain_stats.day_probability(rainy_days_[0]) if len(rainy_days_) > 0 else None
+
+
+    # ###### Identifying the closest vehicles
+
+    # Identifiying the closest vehicles to the pedestrian
+    # Implemented using the haversine formula. It determines the great-circle distance between two points on a sphere given their longitudes and latitudes. 
+    with span('veh_rec'):
+        electric_veh,gas_veh,p_points,p_name,gas_veh_dist,electric_veh_dist = veh_rec(ebike_travellers,veh_,rainy_days_,road_graph,
+                                                                                      speed_table,datetime.datetime.now().hour,co2_weight,
+                                                                                      live_index if live_index is not None else VehicleIndex.from_frame(veh_))
+
+
+    # Subset of dataframe to be passed to dashboard
+    electric_veh_subset = electric_veh[['driver_name','phnum','vehicle_type','fuel_type','lat','lon']]
+    electric_veh = electric_veh[['driver_name','phnum','vehicle_type','fuel_type']]
+    electric_veh = electric_veh.rename({'driver_name': 'Driver', 'phnum': 'Phone Number', 'vehicle_type': 'Type', 'fuel_type': 'Fuel'}, axis=1)  # new method
+
+
+
+    # Subset of dataframe to be passed to dashboard
+    gas_veh_subset = gas_veh[['driver_name','phnum','vehicle_type','fuel_type','lat','lon']]
+    gas_veh = gas_veh[['driver_name','phnum','vehicle_type','fuel_type']]
+    gas_veh = gas_veh.rename({'driver_name': 'Driver', 'phnum': 'Phone Number', 'vehicle_type': 'Type', 'fuel_type': 'Fuel'}, axis=1)  # new method
+
+
+
+
+    lat = p_points[0][0]
+    lng = p_points[0][1]
+    fuel_type = 'electric' 
+
+    with span('map_html'):
+        map_html(lat,lng,electric_veh_subset,fuel_type,p_name[0][0],electric_veh_dist,ex_vehicle_) # Map for Mary - who prefer electric
+
+
+
+
+    lat = p_points[1][0]
+    lng = p_points[1][1]
+    fuel_type = 'gas' 
+
+    with span('map_html'):
+        map_html(lat,lng,gas_veh_subset,fuel_type,p_name[1][0],gas_veh_dist,ex_vehicle_) # Map for Alex - who prefer Petrol/Diesel
+
+    frames = {'veh_': veh_, 'electric_veh': electric_veh, 'gas_veh': gas_veh, 'ex_vehicle_': ex_vehicle_}
+    values = {'rainy_days': rainy_days_, 'wkday': wkday, 'temptre': temptre, 'wkdate': wkdate, 'windows': windows,
+              'rain_chances': rain_chances, 'rain_chance': rain_chance, 'p_points': p_points, 'p_name': p_name, 'travellers': travellers}
+    files = {'avail_electric_veh.html': 'maps/avail_electric_veh.html', 'avail_gas_veh.html': 'maps/avail_gas_veh.html'}
+    return frames, values, files
+
+
+# A new snapshot is published when an input file changes, and every hour for the estimated pickup times
+snapshot_inputs = ['Most_edges.csv', 'pedestrian_preference.csv', PROFILE_DB_PATH, 'veh_.csv', 'ex_vehicle_.csv', 'WeeklyWeather.csv',
+                   EMISSION_FACTORS_PATH, SPEED_TABLE_PATH]
+
+def current_snapshot_key():
+    return snapshot_key(snapshot_inputs, datetime.datetime.now().strftime('%Y-%m-%d %H'))
+
+with snapshot_lock():
+    key = current_snapshot_key()
+    snapshot = attach_snapshot(key)
+    if snapshot is None:
+        snapshot = attach_snapshot(publish_snapshot(key, *run_pipeline(vehicle_index)))
+
+veh_ = snapshot.frames['veh_']
+electric_veh = snapshot.frames['electric_veh']
+gas_veh = snapshot.frames['gas_veh']
+ex_vehicle_ = snapshot.frames['ex_vehicle_']
+rainy_days = snapshot.values['rainy_days']
+wkday = snapshot.values['wkday']
+temptre = snapshot.values['temptre']
+wkdate = snapshot.values['wkdate']
+p_points = snapshot.values['p_points']
+p_name = snapshot.values['p_name']
+rain_chance = snapshot.values['rain_chance']
+travellers = snapshot.values['travellers'] #Profile of the traveller of every login user name
+# Maps are served from the snapshot by app.py, so the pages only carry their URL
+map_urls = {name: '/maps/%s/%s' % (snapshot.key, name) for name in snapshot.files}
+
+
+# Whether these pages are built from the snapshot of the current inputs and hour - app.py builds them again when they are not
+def snapshot_current():
+    return current_snapshot_key() == snapshot.key
+
+
+# Rows and sort orders of the tables, served one page at a time by the table call back in app.py
+vehicle_tables = {'/notification-1': prepare_table(electric_veh), '/notification-2': prepare_table(gas_veh)}
+
+# Scheduling an alert ahead of every period of rain for the travellers - delivered over /alerts/<user>
+# The alerts carry the probability of rain and its confidence
+windows = [(datetime.datetime.fromisoformat(start), datetime.datetime.fromisoformat(end), chance)
+           for (start, end), chance in zip(snapshot.values['windows'], snapshot.values['rain_chances'])]
+for user in ('mary', 'alex'):
+    alert_scheduler.subscribe(user, windows)
+# The badges of the side bars count the periods of rain that have not ended, as the alerts do (assets/alerts.js)
+
+
+# Chance of rain shown in the notifications
+rain_chance_text = " (%d%% chance of rain)" % round(100 * rain_chance['probability']) if rain_chance else ""
+
+
+# ###### Navigation Bar
+
+
+#Dashboard layout components - nav bar for Mary
+sidebar_mary = html.Div(
+[
+    html.Img(
+            src=asset_url('image.png'),   
+        style={
+        'vertical-align': 'middle',
+        'height': '60px',
+        'display': 'block',
+        'margin-left': 'auto',
+        'margin-right': 'auto',
+        'border-radius': '50%'
+    }),
+    html.H2("Hello", className="display-4"),
+    html.H4(travellers['mary']['traveller_name'], className="display-6"),
+    html.Hr(),
+    html.P(
+        "Welcome Back!", className="lead"
+    ),
+
+    dbc.Nav(
+        [
+            dbc.NavLink("Home", href="/next_page_1", active="exact"),
+            dbc.NavLink(["Notifications ",
+                        dbc.Badge(str(alert_scheduler.upcoming('mary')),color="danger",pill=True,text_color="white",className="me-1",id="alert-badge-mary"),
+], href="/notification-1", active="exact"),
+            dbc.NavLink("Profile", href="/profile-1", active="exact"),
+        ],
+        vertical=True,
+        pills=True,
+    ),
+],
+style=SIDEBAR_STYLE,
+)
+
+
+
+
+#Dashboard layout components - nav bar for Alex
+sidebar_alex = html.Div(
+[
+    html.Img(
+            src=asset_url('image_male.png'),   
+        style={
+        'vertical-align': 'middle',
+        'height': '60px',
+        'display': 'block',
+        'margin-left': 'auto',
+        'margin-right': 'auto',
+        'border-radius': '50%'
+    }),
+    html.H2("Hello", className="display-4"),
+    html.H4(travellers['alex']['traveller_name'], className="display-6"),
+    html.Hr(),
+    html.P(
+        "Welcome Back!", className="lead"
+    ),
+
+    dbc.Nav(
+        [
+            dbc.NavLink("Home", href="/next_page_2",  active="exact"),
+            dbc.NavLink(["Notifications ",
+                        dbc.Badge(str(alert_scheduler.upcoming('alex')),color="danger",pill=True,text_color="white",className="me-1",id="alert-badge-alex"),
+], href="/notification-2", active="exact"),
+            dbc.NavLink("Profile", href="/profile-2", active="exact"),
+        ],
+        vertical=True,
+        pills=True,
+    ),
+],
+style=SIDEBAR_STYLE,
+)
+
+
+# ###### Logout Button
+
+
+# Logout Button acessible across the pages, once user logs in
+logout_btn = dcc.Link('Log out', href='/',style=BUTTON_STYLE)
+
+
+# ###### Weather cards - Home Page
+
+
+
+# Weather cards to be displayed on Home page, once user logs in
+# Displays Day, Date anf average temperature of the day
+# Weather cards are displayed for 7 days from today
+weather_cards = dbc.Row(
+                [
+                dbc.Col(
+                  dbc.Card(
+                    [
+                    dbc.CardImg(
+                        src=asset_url('wkimg.jpg'),
+                        top=True,
+                        style={"opacity": 0.3},
+                        ),
+                        dbc.CardImgOverlay(
+                            dbc.CardBody(
+                                [
+                                    html.H4(wkday[0], className="card-title"),
+                                    html.P(
+                                        wkdate[0],
+                                        className="card-text",
+                                    ),
+                                    html.H4([
+                                        str(round(temptre[0],2)),html.Sup(" o "),"C"],
+                                        className="card-text",
+                                            ),
+                                ],
+                            ),
+                        ),
+                    ],
+                    style={"width": "18rem"},
+                    ),
+                     width={"size": 3, "order": 2},
+                ),
+                    dbc.Col(
+                    dbc.Card(
+                    [
+                    dbc.CardImg(
+                        src=asset_url('wkimg.jpg'),
+                        top=True,
+                        style={"opacity": 0.3},
+                        ),
+                        dbc.CardImgOverlay(
+                            dbc.CardBody(
+                                [
+                                    html.H4(wkday[1], className="card-title"),
+                                    html.P(
+                                        wkdate[1],
+                                        className="card-text",
+                                    ),
+                                    html.H4([
+                                        str(round(temptre[1],2)),html.Sup(" o "),"C"],
+                                        className="card-text",
+                                            ),
+                                ],
+                            ),
+                        ),
+                    ],
+                    style={"width": "18rem"},
+                    ),
+                         width={"size": 3, "order": 2},
+                    ),
+                    dbc.Col(
+                    dbc.Card(
+                    [
+                    dbc.CardImg(
+                        src=asset_url('wkimg.jpg'),
+                        top=True,
+                        style={"opacity": 0.3},
+                        ),
+                        dbc.CardImgOverlay(
+                            dbc.CardBody(
+                                [
+                                    html.H4(wkday[2], className="card-title"),
+                                    html.P(
+                                        wkdate[2],
+                                        className="card-text",
+                                    ),
+                                    html.H4([
+                                        str(round(temptre[2],2)),html.Sup(" o "),"C"],
+                                        className="card-text",
+                                            ),
+                                ],
+                            ),
+                        ),
+                    ],
+                    style={"width": "18rem"},
+                    ),
+                    width={"size": 3, "order": 2},
+                    ),
+                    dbc.Col(
+                    dbc.Card(
+                    [
+                    dbc.CardImg(
+                        src=asset_url('wkimg.jpg'),
+                        top=True,
+                        style={"opacity": 0.3},
+                        ),
+                        dbc.CardImgOverlay(
+                            dbc.CardBody(
+                                [
+                                    html.H4(wkday[3], className="card-title"),
+                                    html.P(
+                                        wkdate[3],
+                                        className="card-text",
+                                    ),
+                                    html.H4([
+                                        str(round(temptre[3],2)),html.Sup(" o "),"C"],
+                                        className="card-text",
+                                            ),
+                                ],
+                            ),
+                        ),
+                    ],
+                    style={"width": "18rem"},
+                    ),
+                        width={"size": 3, "order": 2},
+                    ),
+                    dbc.Col(
+                    dbc.Card(
+                    [
+                    dbc.CardImg(
+                        src=asset_url('wkimg.jpg'),
+                        top=True,
+                        style={"opacity": 0.3},
+                        ),
+                        dbc.CardImgOverlay(
+                            dbc.CardBody(
+                                [
+                                    html.H4(wkday[4], className="card-title"),
+                                    html.P(
+                                        wkdate[4],
+                                        className="card-text",
+                                    ),
+                                    html.H4([
+                                        str(round(temptre[4],2)),html.Sup(" o "),"C"],
+                                        className="card-text",
+                                            ),
+                                ],
+                            ),
+                        ),
+                    ],
+                    style={"width": "18rem"},
+                    ),
+                        width={"size": 3, "order": 2},
+                    ),
+                    dbc.Col(
+                    dbc.Card(
+                    [
+                    dbc.CardImg(
+                        src=asset_url('wkimg.jpg'),
+                        top=True,
+                        style={"opacity": 0.3},
+                        ),
+                        dbc.CardImgOverlay(
+                            dbc.CardBody(
+                                [
+                                    html.H4(wkday[5], className="card-title"),
+                                    html.P(
+                                        wkdate[5],
+                                        className="card-text",
+                                    ),
+                                    html.H4([
+                                        str(round(temptre[5],2)),html.Sup(" o "),"C"],
+                                        className="card-text",
+                                            ),
+                                ],
+                            ),
+                        ),
+                    ],
+                    style={"width": "18rem"},
+                    ),
+                        width={"size": 3, "order": 2},
+                    ),
+                    dbc.Col(
+                    dbc.Card(
+                    [
+                    dbc.CardImg(
+                        src=asset_url('wkimg.jpg'),
+                        top=True,
+                        style={"opacity": 0.3},
+                        ),
+                        dbc.CardImgOverlay(
+                            dbc.CardBody(
+                                [
+                                    html.H4(wkday[6], className="card-title"),
+                                    html.P(
+                                        wkdate[6],
+                                        className="card-text",
+                                    ),
+                                    html.H4([
+                                        str(round(temptre[6],2)),html.Sup(" o "),"C"],
+                                        className="card-text",
+                                            ),
+                                ],
+                            ),
+                        ),
+                    ],
+                    style={"width": "18rem"},
+                    ),
+                        width={"size": 3, "order": 2},
+                    ),
+                ],
+                style={"flex-wrap": "nowrap","overflow-x":"scroll"},
+            )
+
+
+# ###### Home Page
+
+
+# Home Page for Mary - Prefers electric Vehicle
+home_page_1 = html.Div([weather_cards,
+     html.Iframe(id= 'map',src= map_urls['avail_electric_veh.html'],
+                style={"height": "500px", "width": "100%"}),      
+                ], style=CONTENT_STYLE) 
+
+
+# Home Page for Alex - Prefers petrol/diesel Vehicle
+home_page_2 = html.Div([weather_cards,
+     html.Iframe(id= 'map',src= map_urls['avail_gas_veh.html'],
+                style={"height": "500px", "width": "100%"}),      
+                ], style=CONTENT_STYLE) 
+
+
+# ###### Notification Page
+
+
+
+# Notification tab content for Mary
+notification_1 = html.Div(
+[
+dbc.Alert(
+[
+    html.I(className="bi bi-exclamation-triangle-fill me-2"),
+    "Upcoming Weather Alert!!!! ",
+    ],
+    color="danger",
+    className="d-flex align-items-center",
+    ),
+    dbc.Row(dbc.Col(html.Div("We are expecting rain on "+rainy_days[0]+rain_chance_text+". Would you like to book a taxi for the day?"))),    
+    dash_table.DataTable(
+        columns=[{'id': c, 'name': c} for c in gas_veh.columns],
+        id='tbl',
+        page_current=0,
+        page_size=PAGE_SIZE,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='single',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        style_cell={'textAlign': 'left'},
+        style_data_conditional=style_data_conditional,
+    ),
+    dbc.Alert(id='tbl_out'),
+    dbc.Button("Book", id="open", n_clicks=0),
+    dbc.Modal(
+    [
+        dbc.ModalHeader(dbc.ModalTitle("Confirmation")),
+        dbc.ModalBody("You have successfully booked your ride for "+rainy_days[0]+ "."),
+        dbc.ModalFooter(
+            dbc.Button(
+                "Close", id="close", className="ms-auto", n_clicks=0
+            )
+        ),
+    ],
+    id="modal",
+    is_open=False,
+    ),
+], style=CONTENT_STYLE) 
+
+
+# ###### Notification Page
+
+
+
+# Notification tab content for Alex
+notification_2 = html.Div(
+[
+dbc.Alert(
+[
+    html.I(className="bi bi-exclamation-triangle-fill me-2"),
+    "Upcoming Weather Alert!!!! ",
+    ],
+    color="danger",
+    className="d-flex align-items-center",
+    ),
+    dbc.Row(dbc.Col(html.Div("We are expecting rain on "+rainy_days[0]+rain_chance_text+". Would you like to book a taxi for the day?"))),    
+    dash_table.DataTable(
+        columns=[{'id': c, 'name': c} for c in gas_veh.columns],
+        id='tbl',
+        page_current=0,
+        page_size=PAGE_SIZE,
+        page_action='custom',
+        sort_action='custom',
+        sort_mode='single',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        style_cell={'textAlign': 'left'},
+        style_data_conditional=style_data_conditional,
+    ),
+    dbc.Alert(id='tbl_out'),
+    dbc.Button("Book", id="open", n_clicks=0),
+    dbc.Modal(
+    [
+        dbc.ModalHeader(dbc.ModalTitle("Confirmation")),
+        dbc.ModalBody("You have successfully booked your ride for "+rainy_days[0]+ "."),
+        dbc.ModalFooter(
+            dbc.Button(
+                "Close", id="close", className="ms-auto", n_clicks=0
+            )
+        ),
+    ],
+    id="modal",
+    is_open=False,
+    ),
+], style=CONTENT_STYLE) 
+
+
+
+
+#When there is no Notification
+no_notification_pg = html.Div(
+[dbc.Alert(
+    [
+        html.I(className="bi bi-check-circle-fill me-2"),
+        "There is no new notification!!!",
+    ],
+    color="success",
+    style=CONTENT_STYLE,
+    className="d-flex align-items-center",
+),], style=CONTENT_STYLE) 
+#no_notification = html.Div([sidebar, no_notification_pg])
+
+
+# ###### Schedule Table Layout
+
+
+
+#Scheduler table structure for Profile Page
+table_header = [
+    html.Thead(html.Tr([html.Th("Weekday"), html.Th("Alternate Preference")]))
+]
+
+row1 = html.Tr([html.Td("Sunday"), html.Td("Taxi")])
+row2 = html.Tr([html.Td("Monday"), html.Td("Taxi")])
+row3 = html.Tr([html.Td("Tuesday"), html.Td("Taxi")])
+row4 = html.Tr([html.Td("Wednesday"), html.Td("Taxi")])
+row5 = html.Tr([html.Td("Thursday"), html.Td("Taxi")])
+row6 = html.Tr([html.Td("Friday"), html.Td("Taxi")])
+row7 = html.Tr([html.Td("Saturday"), html.Td("Taxi")])
+
+table_body = [html.Tbody([row1, row2, row3, row4, row5, row6, row7])]
+
+
+# ###### Profile page layout
+
+
+
+
+# Profile page for Mary
+profile_form_1 = html.Div(
+                [
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("First Name", html_for="example-email-grid"),
+                            dbc.Input(
+                                id="example-email-grid",
+                                value="Mary",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Last Name", html_for="example-password-grid"),
+                            dbc.Input(
+                                id="example-password-grid",
+                                value="Jane",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                ],
+                className="g-3",
+                ),
+
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("Email", html_for="example-email-grid"),
+                            dbc.Input(
+                                type="email",
+                                id="example-email-grid",
+                                value="maryjane@gmail.com",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Phone Number", html_for="example-password-grid"),
+                            dbc.Input(
+
+                                id="example-password-grid",
+                                value="902-222-1111",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                ],
+                className="g-3",
+                ),
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("Gender", html_for="example-email-grid"),
+                            dbc.Input(
+                                id="example-email-grid",
+                                value="Female",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Address", html_for="example-password-grid"),
+                            dbc.Input(
+
+                                id="example-password-grid",
+                                value="35 Av. Princesse Grace, 98000 Monaco",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                ],
+                className="g-3",
+                ),
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("Travel Mode", html_for="example-email-grid"),
+                            dbc.Input(
+                                id="example-email-grid",
+                                value="eBike",
+                                placeholder="Enter email",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Fuel Preference", html_for="example-password-grid"),
+                            dbc.Input(
+
+                                id="example-password-grid",
+                                value="Electric",
+                                readonly=True,
+                            ),
+                        ],
+                    ),
+                ],
+                className="g-3",
+                ),
+                dbc.Row(dbc.Col(html.H4("Scheduler"))), 
+                dbc.Table(table_header + table_body, bordered=True)
+                ], style=CONTENT_STYLE)
+
+
+
+# Profile page for Alex
+profile_form_2 = html.Div(
+                [
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("First Name", html_for="example-email-grid"),
+                            dbc.Input(
+                                id="example-email-grid",
+                                value="Alex",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Last Name", html_for="example-password-grid"),
+                            dbc.Input(
+                                id="example-password-grid",
+                                value="Joe",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                ],
+                className="g-3",
+                ),
+
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("Email", html_for="example-email-grid"),
+                            dbc.Input(
+                                type="email",
+                                id="example-email-grid",
+                                value="alexjoe@gmail.com",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Phone Number", html_for="example-password-grid"),
+                            dbc.Input(
+
+                                id="example-password-grid",
+                                value="902-222-2222",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                ],
+                className="g-3",
+                ),
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("Gender", html_for="example-email-grid"),
+                            dbc.Input(
+                                id="example-email-grid",
+                                value="Male",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Address", html_for="example-password-grid"),
+                            dbc.Input(
+
+                                id="example-password-grid",
+                                value="1 Av. Saint-Laurent, 98000 Monaco",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                ],
+                className="g-3",
+                ),
+                dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            dbc.Label("Travel Mode", html_for="example-email-grid"),
+                            dbc.Input(
+                                id="example-email-grid",
+                                value="eBike",
+                                placeholder="Enter email",
+                                readonly=True,
+                            ),
+                        ],
+                        width=6,
+                    ),
+                    dbc.Col(
+                        [
+                            dbc.Label("Fuel Preference", html_for="example-password-grid"),
+                            dbc.Input(
+
+                                id="example-password-grid",
+                                value="Petrol/Diesel",
+                                readonly=True,
+                            ),
+                        ],
+                    ),
+                ],
+                className="g-3",
+                ),
+                dbc.Row(dbc.Col(html.H4("Scheduler"))), 
+                dbc.Table(table_header + table_body, bordered=True)
+                ], style=CONTENT_STYLE)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Snapping of GPS positions to the SUMO road network: the nearest lane, and its edge, of a latitude and longitude, so that app users and vehicles that only send GPS get the edgeID the road network distances (road_routing.py) are computed from.
+# The lanes of Most_edges.csv are cut into segments between consecutive shape points, projected to meters (equirectangular around the mean latitude), and segments longer than 2 x HALF_LENGTH are split into equal pieces. The midpoints of the pieces are indexed in a k-d tree (scipy, as in recommend_api.py).
+# snap_many() snaps a batch of positions with one query of the tree for the K closest midpoints of every position, and the distance of every position to its K pieces computed in one vectorized pass. A piece is never closer than the distance to its midpoint minus HALF_LENGTH, so the closest of the K pieces is the closest of all whenever it is within the distance of the K-th midpoint minus HALF_LENGTH - which holds for nearly every position on or near a road. The other positions are checked against every piece whose midpoint is within reach (a ball query of the tree).
+# snap() snaps a single position the same way, in plain Python over its K pieces. FleetFeed (fleet_feed.py) snaps every batch of streamed vehicle updates with one snap_many() call.
+
+# In[1]:
+
+
+# Importing libraries
+import math
+import threading
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from flask import abort, jsonify, request
+
+from road_routing import clean_edge_id
+from vehicle_index import M_PER_DEG
+
+
+# In[2]:
+
+
+# Pieces of lanes are at most 2 x HALF_LENGTH meters long
+HALF_LENGTH = 10.0
+# Midpoints looked up for every position
+K = 8
+
+Snap = namedtuple('Snap', ['edgeID', 'laneID', 'dist', 'lat', 'lon'])
+
+
+class EdgeSnapper:
+    def __init__(self, edges_df, half_length=HALF_LENGTH):
+        from scipy.spatial import cKDTree
+        df = edges_df[['edgeID', 'laneID', 'lat', 'lon']].dropna()
+        lanes = clean_edge_id(df['laneID']).to_numpy()
+        edges = clean_edge_id(df['edgeID']).to_numpy()
+        self.half_length = half_length
+        self.ref_lat = float(df['lat'].mean()) if len(df) else 43.74
+        self._x_scale = M_PER_DEG * math.cos(math.radians(self.ref_lat))
+        x, y = self._project(df['lat'].to_numpy(dtype=np.float64), df['lon'].to_numpy(dtype=np.float64))
+
+        # Segments between consecutive shape points of a lane; a lane of a single point is a segment of length 0
+        same_lane = np.append(lanes[1:] == lanes[:-1], False)
+        first = np.append(True, ~same_lane[:-1])
+        a = np.flatnonzero(same_lane | first)
+        b = np.where(same_lane[a], a + 1, a)
+
+        # Segments split into pieces of equal length
+        pieces = np.maximum(1, np.ceil(np.hypot(x[b] - x[a], y[b] - y[a]) / (2 * half_length))).astype(np.int64)
+        segment = np.repeat(np.arange(len(a)), pieces)
+        step = np.arange(len(segment)) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+        t0, t1 = step / pieces[segment], (step + 1) / pieces[segment]
+        ax, ay, bx, by = x[a][segment], y[a][segment], x[b][segment], y[b][segment]
+        self.ax, self.ay = ax + t0 * (bx - ax), ay + t0 * (by - ay)
+        self.bx, self.by = ax + t1 * (bx - ax), ay + t1 * (by - ay)
+        self.lane = lanes[a][segment]
+        self.edge = edges[a][segment]
+        self._tree = cKDTree(np.column_stack([(self.ax + self.bx) / 2, (self.ay + self.by) / 2])) if len(segment) else None
+
+    @classmethod
+    def from_csv(cls, path='Most_edges.csv', half_length=HALF_LENGTH):
+        return cls(pd.read_csv(path, usecols=['edgeID', 'laneID', 'lat', 'lon']), half_length)
+
+    def __len__(self):
+        return len(self.lane)
+
+    def _project(self, lat, lon):
+        return np.asarray(lon, dtype=np.float64) * self._x_scale, np.asarray(lat, dtype=np.float64) * M_PER_DEG
+
+    # Distance from every point to its piece, and the closest point of the piece
+    def _distance(self, px, py, piece):
+        ax, ay, bx, by = self.ax[piece], self.ay[piece], self.bx[piece], self.by[piece]
+        dx, dy = bx - ax, by - ay
+        length2 = dx * dx + dy * dy
+        t = np.clip(((px - ax) * dx + (py - ay) * dy) / np.where(length2 > 0, length2, 1.0), 0.0, 1.0)
+        qx, qy = ax + t * dx, ay + t * dy
+        return np.hypot(px - qx, py - qy), qx, qy
+
+    # Nearest lane of every position, as arrays (edgeID, laneID, distance in meters, lat, lon of the snapped point)
+    def snap_many(self, lat, lon):
+        if self._tree is None:
+            raise ValueError('no road network to snap to')
+        px, py = self._project(np.atleast_1d(lat), np.atleast_1d(lon))
+        k = min(K, len(self))
+        mid_dist, found = self._tree.query(np.column_stack([px, py]), k=k)
+        mid_dist, found = mid_dist.reshape(len(px), k), found.reshape(len(px), k)
+        dist, _, _ = self._distance(px[:, None], py[:, None], found)
+        nearest = np.argmin(dist, axis=1)
+        best = found[np.arange(len(px)), nearest]
+        best_dist = dist[np.arange(len(px)), nearest]
+        # Pieces beyond the K-th midpoint are at least its distance minus half_length away
+        if k < len(self):
+            for i in np.flatnonzero(best_dist > mid_dist[:, -1] - self.half_length):
+                candidates = np.array(self._tree.query_ball_point([px[i], py[i]], best_dist[i] + self.half_length), dtype=np.int64)
+                candidate_dist, _, _ = self._distance(px[i], py[i], candidates)
+                best[i] = candidates[np.argmin(candidate_dist)]
+        dist, qx, qy = self._distance(px, py, best)
+        return self.edge[best], self.lane[best], dist, qy / M_PER_DEG, qx / self._x_scale
+
+    # Distance from a point to a piece, in plain floats - cheaper than numpy for the few pieces of a single position
+    def _piece_distance(self, px, py, piece):
+        ax, ay = float(self.ax[piece]), float(self.ay[piece])
+        dx, dy = float(self.bx[piece]) - ax, float(self.by[piece]) - ay
+        length2 = dx * dx + dy * dy
+        t = min(1.0, max(0.0, ((px - ax) * dx + (py - ay) * dy) / length2)) if length2 > 0 else 0.0
+        qx, qy = ax + t * dx, ay + t * dy
+        return math.hypot(px - qx, py - qy), qx, qy
+
+    def snap(self, lat, lon):
+        if self._tree is None:
+            raise ValueError('no road network to snap to')
+        px, py = float(lon) * self._x_scale, float(lat) * M_PER_DEG
+        k = min(K, len(self))
+        mid_dist, found = self._tree.query((px, py), k=k)
+        found = np.atleast_1d(found).tolist()
+        dist, piece = min((self._piece_distance(px, py, i)[0], i) for i in found)
+        if k < len(self) and dist > float(np.atleast_1d(mid_dist)[-1]) - self.half_length:
+            dist, piece = min((self._piece_distance(px, py, i)[0], i) for i in self._tree.query_ball_point((px, py), dist + self.half_length))
+        dist, qx, qy = self._piece_distance(px, py, piece)
+        return Snap(self.edge[piece], self.lane[piece], dist, qy / M_PER_DEG, qx / self._x_scale)
+
+    # Adds the edgeID, laneID and snap_dist (meters) columns to a frame of positions
+    def snap_frame(self, df, lat='lat', lon='lon'):
+        edge, lane, dist, _, _ = self.snap_many(df[lat].to_numpy(), df[lon].to_numpy())
+        return df.assign(edgeID=edge, laneID=lane, snap_dist=dist)
+
+
+# In[3]:
+
+
+_snapper = None
+_snapper_lock = threading.Lock()
+
+
+# Snapper of the worker, built from Most_edges.csv on first use
+def load_snapper(path='Most_edges.csv'):
+    global _snapper
+    with _snapper_lock:
+        if _snapper is None:
+            _snapper = EdgeSnapper.from_csv(path)
+        return _snapper
+
+
+# Answer of the /api/snap route of app.py: {"points": [[lat, lon], ...]} -> {"snapped": [{"edgeID", "laneID", "dist", "lat", "lon"}, ...]}
+def snap_view(snapper):
+    query = request.get_json(silent=True) or {}
+    try:
+        points = np.array(query['points'], dtype=np.float64).reshape(-1, 2)
+    except (KeyError, TypeError, ValueError):
+        abort(400)
+    if not len(points) or not np.isfinite(points).all():
+        abort(400)
+    edge, lane, dist, lat, lon = snapper.snap_many(points[:, 0], points[:, 1])
+    return jsonify(snapped=[{'edgeID': e, 'laneID': l, 'dist': d, 'lat': a, 'lon': o}
+                            for e, l, d, a, o in zip(edge.tolist(), lane.tolist(), dist.tolist(), lat.tolist(), lon.tolist())])
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# The build_emission_factors() reads the SUMO emission output (most.emissionTime.csv) in chunks and computes the CO2 emitted per kilometre for every vehicle. SUMO logs CO2 in mg per one second timestep along with the speed in m/s, so summing both over all timesteps of a vehicle gives mg per meter, which is the same as g/km. The mean factor of each emission class (vehicle_eclass) is also kept, to be used for vehicles that do not appear in the emission output. The table is small and is saved as emission_factors.csv.
+# The attach_emission_factors() adds a 'co2_g_km' column to the vehicle dataframe once, at start up, so that ranking never has to read the emission file. Electric vehicles are given a factor of 0.
+# The rank_by_emission() scores vehicles by distance to the traveller plus a weighted CO2 per km, and returns the vehicles sorted by the score. co2_weight is the extra distance (meters) that is accepted for every g/km of CO2 saved.
+
+# In[1]:
+
+
+# Importing libraries
+import os
+
+import numpy as np
+import pandas as pd
+
+from road_routing import haversine_m
+
+
+# In[2]:
+
+
+EMISSION_FACTORS_PATH = 'emission_factors.csv'
+# Extra pickup distance (meters) accepted per g/km of CO2 - 5 m makes a 200 g/km car 1 km "further" than an electric one
+CO2_WEIGHT = 5.0
+# Typical passenger car CO2 (g/km) used when neither the vehicle nor its emission class was observed
+DEFAULT_CO2_G_KM = 180.0
+
+
+def build_emission_factors(emission_path='most.emissionTime.csv', path=EMISSION_FACTORS_PATH, chunksize=1000000):
+    sums = None
+    reader = pd.read_csv(emission_path, usecols=['vehicle_id', 'vehicle_eclass', 'vehicle_CO2', 'vehicle_speed'], chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk.dropna()
+        grp = chunk.assign(vehicle_id=chunk['vehicle_id'].str.lower(), vehicle_eclass=chunk['vehicle_eclass'].str.lower()) \
+            .groupby(['vehicle_id', 'vehicle_eclass'])[['vehicle_CO2', 'vehicle_speed']].sum()
+        sums = grp if sums is None else sums.add(grp, fill_value=0)
+
+    sums = sums[sums['vehicle_speed'] > 0].reset_index()
+    sums['co2_g_km'] = sums['vehicle_CO2'] / sums['vehicle_speed']
+    factors = sums[['vehicle_id', 'vehicle_eclass', 'co2_g_km']]
+    factors.to_csv(path, index=False)
+    return factors
+
+
+def load_emission_factors(path=EMISSION_FACTORS_PATH):
+    if not os.path.exists(path):
+        return None
+    return pd.read_csv(path)
+
+
+# Vehicle factor, else the mean factor of its emission class, else the default
+def attach_emission_factors(veh_, factors):
+    veh_ = veh_.copy()
+    if factors is None:
+        co2 = pd.Series(DEFAULT_CO2_G_KM, index=veh_.index)
+    else:
+        by_vehicle = factors.set_index('vehicle_id')['co2_g_km']
+        by_class = factors.groupby('vehicle_eclass')['co2_g_km'].mean()
+        co2 = veh_['vehicle_id'].str.lower().map(by_vehicle)
+        co2 = co2.fillna(veh_['vehicle_eclass'].str.lower().map(by_class)).fillna(DEFAULT_CO2_G_KM)
+    if 'fuel_type' in veh_:
+        co2[veh_['fuel_type'] == 'electric'] = 0.0
+    veh_['co2_g_km'] = co2.astype(np.float32)
+    return veh_
+
+
+# In[3]:
+
+
+def rank_by_emission(veh_subset, lat, lon, co2_weight=CO2_WEIGHT):
+    veh_subset = veh_subset.copy()
+    dist = haversine_m(veh_subset['lat'].to_numpy(dtype=np.float64), veh_subset['lon'].to_numpy(dtype=np.float64), lat, lon)
+    veh_subset['score'] = dist + co2_weight * veh_subset['co2_g_km'].to_numpy()
+    return veh_subset.sort_values('score', kind='stable')
+
+
+# In[ ]:
+
+
+# Building the emission factor table once, offline: python emission_factors.py
+if __name__ == '__main__':
+    build_emission_factors()
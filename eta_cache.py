@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# The build_speed_table() reads the SUMO floating car data (most.fcdgeoTime.csv) in chunks and aggregates the mean vehicle speed for every edge and hour of the day. The file is too large to be read at once, so only the lane, speed and time columns are read and a running sum and count is kept per (edgeID, hour). The result is saved as a float32 numpy array of shape (number of edges, 24) along with the list of edge ids.
+# The load_speed_table() memory-maps the saved array, so the table is shared through the page cache and is not copied into every process.
+# The eta() takes a vehicle row and a traveller row (both with edgeID, lat/lon) and the hour of the day, and returns the estimated pickup time in seconds. The distance is the road network distance when the road graph is passed, else the haversine distance. The speed is looked up from the table for the vehicle and traveller edges at that hour; missing values fall back to the edge's daily mean and then to the overall mean speed.
+# The sort_by_eta() adds an 'eta' column (seconds) to a vehicle subset and sorts it by that column.
+
+# In[1]:
+
+
+# Importing libraries
+import os
+
+import numpy as np
+import pandas as pd
+
+from road_routing import edge_distances, haversine_m
+
+
+# In[2]:
+
+
+SPEED_TABLE_PATH = 'edge_speed.npy'
+# Speed used when neither edge has been observed (m/s, about 30 km/h)
+DEFAULT_SPEED = 8.33
+# Vehicles are not expected to crawl slower than this (m/s) - avoids infinite ETAs on congested edges
+MIN_SPEED = 1.0
+
+
+def _edges_path(path):
+    return path[:-len('.npy')] + '_edges.npy'
+
+
+# Lane ids in the FCD output are cleaned the same way as in the exploration notebook; the edge id is the lane id without its lane index
+def lane_to_edge(lanes):
+    lanes = lanes.astype(str).str.replace(':', '', regex=False).str.replace('#', '_', regex=False).str.replace('-', '', regex=False)
+    return lanes.str.rsplit('_', n=1).str[0]
+
+
+def build_speed_table(fcd_path='most.fcdgeoTime.csv', path=SPEED_TABLE_PATH, chunksize=1000000):
+    sums = None
+    reader = pd.read_csv(fcd_path, usecols=['vehicle_lane', 'vehicle_speed', 'Time_of_Day'], chunksize=chunksize)
+    for chunk in reader:
+        chunk = chunk.dropna()
+        if chunk.empty:
+            continue
+        grp = pd.DataFrame({
+            'edgeID': lane_to_edge(chunk['vehicle_lane']).to_numpy(),
+            'hour': pd.to_datetime(chunk['Time_of_Day']).dt.hour.to_numpy(),
+            'speed': chunk['vehicle_speed'].to_numpy(dtype=np.float64),
+        }).groupby(['edgeID', 'hour'])['speed'].agg(['sum', 'count'])
+        sums = grp if sums is None else sums.add(grp, fill_value=0)
+
+    mean = (sums['sum'] / sums['count']).unstack('hour').reindex(columns=range(24))
+    table = mean.to_numpy(dtype=np.float32)
+    np.save(path, table)
+    np.save(_edges_path(path), mean.index.to_numpy(dtype=str))
+    return load_speed_table(path)
+
+
+def load_speed_table(path=SPEED_TABLE_PATH):
+    if not os.path.exists(path):
+        return None
+    table = np.load(path, mmap_mode='r')
+    edges = np.load(_edges_path(path))
+    # Edge daily means and the overall mean are small and are computed once on load.
+    # Every edge in the table was observed at least once, so the daily mean is never empty.
+    daily = np.nanmean(table, axis=1)
+    overall = float(daily.mean()) if len(daily) else DEFAULT_SPEED
+    return {'table': table, 'row': {e: i for i, e in enumerate(edges.tolist())}, 'daily': daily, 'overall': overall}
+
+
+# In[3]:
+
+
+# Speed of each edge at the given hour, vectorized over a list of edges
+def edge_speeds(speed_table, edge_ids, hour):
+    rows = np.array([speed_table['row'].get(str(e), -1) for e in edge_ids])
+    speed = np.full(len(rows), np.nan)
+    known = rows >= 0
+    speed[known] = speed_table['table'][rows[known], int(hour) % 24]
+    missing = known & np.isnan(speed)
+    speed[missing] = speed_table['daily'][rows[missing]]
+    speed[np.isnan(speed)] = speed_table['overall']
+    return np.maximum(speed, MIN_SPEED)
+
+
+def _pickup_distances(veh_subset, traveller, graph):
+    dist = haversine_m(veh_subset['lat'].to_numpy(dtype=np.float64), veh_subset['lon'].to_numpy(dtype=np.float64),
+                       traveller.person_y, traveller.person_x)
+    if graph is not None:
+        network = np.array(edge_distances(graph, str(traveller.edgeID), veh_subset['edgeID'].astype(str).tolist()))
+        dist = np.where(np.isfinite(network), network, dist)
+    return dist
+
+
+def sort_by_eta(veh_subset, traveller, hour, speed_table, graph=None):
+    veh_subset = veh_subset.copy()
+    if speed_table is None:
+        # Speed table has not been built - ETA at the default speed
+        veh_subset['eta'] = _pickup_distances(veh_subset, traveller, graph) / DEFAULT_SPEED
+        return veh_subset.sort_values('eta', kind='stable')
+    speed = (edge_speeds(speed_table, veh_subset['edgeID'].tolist(), hour) +
+             edge_speeds(speed_table, [traveller.edgeID] * len(veh_subset), hour)) / 2
+    veh_subset['eta'] = _pickup_distances(veh_subset, traveller, graph) / speed
+    return veh_subset.sort_values('eta', kind='stable')
+
+
+_speed_table = None
+
+
+def default_speed_table():
+    global _speed_table
+    if _speed_table is None:
+        _speed_table = load_speed_table()
+    return _speed_table
+
+
+def eta(vehicle, traveller, hour, speed_table=None, graph=None):
+    if speed_table is None:
+        speed_table = default_speed_table()
+    veh_subset = pd.DataFrame([{'edgeID': vehicle.edgeID, 'lat': vehicle.lat, 'lon': vehicle.lon}])
+    return float(sort_by_eta(veh_subset, traveller, hour, speed_table, graph)['eta'].iloc[0])
+
+
+# In[ ]:
+
+
+# Building the speed table once, offline: python eta_cache.py
+if __name__ == '__main__':
+    build_speed_table()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Ingestion of live vehicle updates into the vehicle index (vehicle_index.py).
+# An update is a dictionary: {'op': 'move' | 'arrive' | 'depart', 'vehicle_id': ..., 'lat': ..., 'lon': ..., 'fuel_type': ...}. 'move' and 'arrive' need lat/lon ('arrive' also the fuel type); 'depart' only needs the vehicle id.
+# Anything else (not a dictionary, no vehicle id, missing or non-finite coordinates) is counted in rejected and skipped. Exceptions of the snapper and of the listeners are counted in errors, so the thread applying the updates never stops.
+# The FleetFeed keeps an in-process queue of updates and one thread that applies them to the index in small batches, so queries are only ever held up by one short batch, even during bursts of updates.
+# Listeners (e.g. RecommendationCache.on_update in recommendation_cache.py) are called with every update applied, while the index lock is held.
+# With an edge snapper (edge_snapping.py), the positions of every batch are snapped to the road network in one call before the lock is taken; the updates carry their edgeID and laneID, and edges holds the edge of every vehicle.
+# For testing, file_feed() replays updates written as JSON lines to a file (optionally following it as it grows) and socket_feed() accepts JSON lines on a local TCP port.
+
+# In[1]:
+
+
+# Importing libraries
+import json
+import math
+import queue
+import socketserver
+import threading
+import time
+
+
+# In[2]:
+
+
+# Updates applied per lock acquisition of the index
+BATCH = 256
+
+
+# An update is applied only when it is a dictionary with a vehicle id, and finite coordinates unless it is a departure
+def valid_update(update):
+    if not isinstance(update, dict) or not isinstance(update.get('vehicle_id'), (str, int)):
+        return False
+    op = update.get('op', 'move')
+    if op == 'depart':
+        return True
+    if op not in ('move', 'arrive'):
+        return False
+    try:
+        lat, lon = float(update['lat']), float(update['lon'])
+    except (KeyError, ValueError, TypeError):
+        return False
+    return math.isfinite(lat) and math.isfinite(lon) and -90 <= lat <= 90 and -180 <= lon <= 180
+
+
+def apply_update(index, update):
+    op = update.get('op', 'move')
+    if op == 'depart':
+        return index.remove(update['vehicle_id'])
+    return index.upsert(update['vehicle_id'], float(update['lat']), float(update['lon']), update.get('fuel_type'))
+
+
+class FleetFeed:
+    def __init__(self, index, maxsize=100000, listeners=(), snapper=None):
+        self.index = index
+        self.listeners = list(listeners)
+        self.snapper = snapper
+        self.edges = {}                # vehicle_id -> edgeID of its last snapped position
+        self.updates = queue.Queue(maxsize=maxsize)
+        self.applied = 0
+        self.rejected = 0
+        self.errors = 0                # failures of the snapper and of the listeners
+        self._thread = threading.Thread(target=self._run, name='fleet-feed', daemon=True)
+        self._thread.start()
+
+    def put(self, update, block=True):
+        self.updates.put(update, block)
+
+    def _run(self):
+        while True:
+            batch = [self.updates.get()]
+            while len(batch) < BATCH:
+                try:
+                    batch.append(self.updates.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._apply(batch)
+            finally:
+                for _ in batch:
+                    self.updates.task_done()
+
+    # Nothing raised by an update, the snapper or a listener stops the thread - the queue would fill and block the feeds
+    def _apply(self, batch):
+        valid = [update for update in batch if valid_update(update)]
+        self.rejected += len(batch) - len(valid)
+        if self.snapper is not None and valid:
+            try:
+                self._snap(valid)
+            except Exception:
+                self.errors += 1
+        with self.index.lock:
+            for update in valid:
+                try:
+                    apply_update(self.index, update)
+                    self.applied += 1
+                except (KeyError, ValueError, TypeError):
+                    self.rejected += 1
+                    continue
+                for listener in self.listeners:
+                    try:
+                        listener(update)
+                    except Exception:
+                        self.errors += 1
+
+    def _snap(self, batch):
+        moves = []
+        for update in batch:
+            if update.get('op', 'move') != 'depart':
+                moves.append((update, float(update['lat']), float(update['lon'])))
+            else:
+                self.edges.pop(update['vehicle_id'], None)
+        if not moves:
+            return
+        edges, lanes, _, _, _ = self.snapper.snap_many([m[1] for m in moves], [m[2] for m in moves])
+        for (update, _, _), edge, lane in zip(moves, edges.tolist(), lanes.tolist()):
+            update['edgeID'], update['laneID'] = edge, lane
+            self.edges[update['vehicle_id']] = edge
+
+    # Blocks until every queued update has been applied
+    def join(self):
+        self.updates.join()
+
+
+# In[3]:
+
+
+def _put_line(feed, line):
+    line = line.strip()
+    if not line:
+        return
+    try:
+        feed.put(json.loads(line))
+    except ValueError:
+        feed.rejected += 1
+
+
+def file_feed(feed, path, follow=False, interval=0.2):
+    def run():
+        with open(path) as f:
+            while True:
+                line = f.readline()
+                if line:
+                    _put_line(feed, line)
+                elif follow:
+                    time.sleep(interval)
+                else:
+                    return
+    thread = threading.Thread(target=run, name='fleet-file-feed', daemon=True)
+    thread.start()
+    return thread
+
+
+def socket_feed(feed, host='127.0.0.1', port=8765):
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                _put_line(feed, line.decode('utf-8'))
+
+    server = socketserver.ThreadingTCPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='fleet-socket-feed', daemon=True).start()
+    return server
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# The live fleet of a worker: the vehicle index, the fleet feed that keeps it up to date, and the engines of /api/recommend that query it.
+# They live for as long as the worker, while the pages (dashboard_pages.py) are built again for every new snapshot of the pipeline; the pipeline looks up the closest vehicles in this index, so the pages of a new snapshot carry the positions the worker has received.
+
+# In[1]:
+
+
+# Importing libraries
+import os
+
+import pandas as pd
+
+from vehicle_index import VehicleIndex # live grid index of the vehicle positions
+from fleet_feed import FleetFeed, file_feed, socket_feed # live vehicle updates applied to the index
+from edge_snapping import load_snapper # nearest road edge and lane of GPS positions
+from recommend_api import Recommender # micro-batched closest vehicles for /api/recommend
+from multimodal import MultiModalEngine # vehicles of every mode offered to a travel mode
+from metrics import span # timing of the hot paths, exported on /metrics
+
+
+# In[2]:
+
+
+with span('csv_load'):
+    veh_ = pd.read_csv('veh_.csv', index_col=0)  #Vehicle dataset
+    ex_vehicle_ = pd.read_csv('ex_vehicle_.csv', index_col=0) #Excluded vehicle dataset - the other modes
+
+# Live positions of the vehicles in this worker, kept up to date by the fleet feed
+vehicle_index = VehicleIndex.from_frame(veh_)
+# Streamed positions are snapped to the road network batch by batch when a feed is configured
+live_feed = bool(os.environ.get('FLEET_FEED_FILE') or os.environ.get('FLEET_FEED_PORT'))
+fleet_feed = FleetFeed(vehicle_index, snapper=load_snapper() if live_feed else None)
+if os.environ.get('FLEET_FEED_FILE'): #JSON lines of vehicle updates, followed as the file grows
+    file_feed(fleet_feed, os.environ['FLEET_FEED_FILE'], follow=True)
+if os.environ.get('FLEET_FEED_PORT'): #JSON lines of vehicle updates over a local TCP connection
+    socket_feed(fleet_feed, port=int(os.environ['FLEET_FEED_PORT']))
+
+# Closest vehicles for the JSON API, computed for the concurrent requests together
+recommender = Recommender(veh_, vehicle_index)
+# Mopeds, motorcycles, cars and coaches along with the fleet, for the travel mode of the traveller - the fleet is the live index above
+multimodal = MultiModalEngine.from_frames(veh_, ex_vehicle_, fleet_index=vehicle_index)
@@ -0,0 +1,240 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Load test of the dashboard, replaying a morning of the SUMO timeline against a local server.
+# Every row of the travellers file (pedestrian_preference.csv, or any file of the same shape) is a login. A session logs in with the user name of the traveller (profile_store.USERNAMES) and goes through the pages a traveller visits when rain is coming - home page and map, notifications and the vehicle table, profile - as a browser would: page routes with GET and call backs with POST /_dash-update-component.
+# Logins start at the Time_of_Day of the traveller when the file has one, or evenly spread over --duration seconds otherwise. Vehicle movements are read from the FCD time series (most.fcdgeoTime.csv) and sent as JSON lines to the fleet feed of the server (FLEET_FEED_PORT, see fleet_feed.py). Both timelines run on a clock accelerated --speed times.
+# Sessions run on a pool of --concurrency threads. When all of them are busy, the next logins wait, as they would behind a saturated server. The report gives the throughput and the p50/p95/p99 latency of every request, per call back and route.
+#
+# Usage:
+#   FLEET_FEED_PORT=8765 python app.py &
+#   python loadtest.py --logins 500 --concurrency 32 --speed 60 --feed-port 8765
+#   python loadtest.py --in-process --logins 100      # no server, Flask test client in this process
+
+# In[1]:
+
+
+# Importing libraries
+import argparse
+import http.client
+import json
+import re
+import socket
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from profile_store import USERNAMES
+
+
+# In[2]:
+
+
+URL = 'http://127.0.0.1:8050'
+PASSWORDS = {'mary': 'mary', 'alex': 'alex'}
+# Pages of the traveller of each login user name
+USER_PAGES = {'mary': 1, 'alex': 2}
+
+
+# (offset in seconds, user name) of every login, in order
+def load_logins(path='pedestrian_preference.csv', logins=None, duration=600.0, seed=0):
+    travellers = pd.read_csv(path)
+    users = {name: user for user, name in USERNAMES.items()}
+    travellers = travellers.loc[travellers['traveller_name'].isin(users)]
+    if travellers.empty:
+        raise ValueError('no traveller of %s has a login user name' % path)
+    rng = np.random.default_rng(seed)
+    if logins is not None:
+        travellers = travellers.iloc[rng.integers(0, len(travellers), logins)]
+    if 'Time_of_Day' in travellers:
+        times = pd.to_datetime(travellers['Time_of_Day'])
+        offsets = (times - times.min()).dt.total_seconds().to_numpy()
+    else:
+        offsets = np.linspace(0, duration, len(travellers), endpoint=False)
+    order = np.argsort(offsets, kind='stable')
+    return [(float(offsets[i]), users[travellers['traveller_name'].iloc[i]]) for i in order]
+
+
+# (offset in seconds, update) of every position of the known vehicles in the FCD time series, in order
+def load_movements(path='most.fcdgeoTime.csv', vehicle_ids=None, chunksize=1000000):
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=['Time_of_Day', 'vehicle_id', 'vehicle_x', 'vehicle_y'], chunksize=chunksize):
+        chunk = chunk.dropna()
+        if vehicle_ids is not None:
+            chunk = chunk.loc[chunk['vehicle_id'].isin(vehicle_ids)]
+        chunks.append(chunk)
+    fcd = pd.concat(chunks) if chunks else pd.DataFrame(columns=['Time_of_Day', 'vehicle_id', 'vehicle_x', 'vehicle_y'])
+    times = pd.to_datetime(fcd['Time_of_Day'])
+    fcd = fcd.assign(offset=(times - times.min()).dt.total_seconds()).sort_values('offset', kind='stable')
+    return [(offset, {'op': 'move', 'vehicle_id': vehicle_id, 'lat': lat, 'lon': lon})
+            for offset, vehicle_id, lon, lat in zip(fcd['offset'], fcd['vehicle_id'], fcd['vehicle_x'], fcd['vehicle_y'])]
+
+
+# In[3]:
+
+
+# Keep-alive HTTP connection per thread to a running server
+class HttpClient:
+    def __init__(self, url=URL):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            conn.request(method, path, body=None if body is None else json.dumps(body), headers=headers)
+            response = conn.getresponse()
+            return response.status, response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+
+
+# Flask test client, for a load test without a server
+class InProcessClient:
+    def __init__(self):
+        import app
+        self.server = app.server
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.server.test_client()
+        response = client.open(path, method=method, json=body)
+        return response.status_code, response.data
+
+
+def _callback(output, outputs, inputs, state=()):
+    return {'output': output, 'outputs': outputs, 'inputs': inputs, 'state': list(state),
+            'changedPropIds': ['%s.%s' % (inputs[0]['id'], inputs[0]['property'])]}
+
+
+def _page(pathname):
+    return _callback('page-content.children', {'id': 'page-content', 'property': 'children'},
+                     [{'id': 'url', 'property': 'pathname', 'value': pathname}])
+
+
+def _login(user):
+    return _callback('output1.children', {'id': 'output1', 'property': 'children'},
+                     [{'id': 'verify', 'property': 'n_clicks', 'value': 1}],
+                     [{'id': 'user', 'property': 'value', 'value': user}, {'id': 'passw', 'property': 'value', 'value': PASSWORDS[user]}])
+
+
+def _table(pathname):
+    return _callback('..tbl.data...tbl.page_count..', [{'id': 'tbl', 'property': 'data'}, {'id': 'tbl', 'property': 'page_count'}],
+                     [{'id': 'tbl', 'property': 'page_current', 'value': 0}, {'id': 'tbl', 'property': 'page_size', 'value': 10},
+                      {'id': 'tbl', 'property': 'sort_by', 'value': []}, {'id': 'tbl', 'property': 'filter_query', 'value': ''}],
+                     [{'id': 'url', 'property': 'pathname', 'value': pathname}])
+
+
+# In[4]:
+
+
+class LoadTest:
+    def __init__(self, client):
+        self.client = client
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+        self.updates_sent = 0
+
+    def _timed(self, name, method, path, body=None):
+        start = time.perf_counter()
+        try:
+            status, data = self.client.request(method, path, body)
+        except (OSError, http.client.HTTPException):
+            status, data = None, b''
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.latencies[name].append(elapsed)
+            if status != 200:
+                self.errors[name] += 1
+                return b''
+        return data
+
+    def session(self, user):
+        n = USER_PAGES[user]
+        self._timed('GET /', 'GET', '/')
+        self._timed('callback login', 'POST', '/_dash-update-component', _login(user))
+        home = self._timed('callback page /next_page', 'POST', '/_dash-update-component', _page('/next_page_%d' % n))
+        # Dash escapes '/' in its responses; the map of the page is the src of its Iframe
+        for url in set(re.findall(r'/maps/[\w.-]+/[\w.-]+', json.dumps(json.loads(home or '{}')))):
+            self._timed('GET /maps', 'GET', url)
+        self._timed('callback page /notification', 'POST', '/_dash-update-component', _page('/notification-%d' % n))
+        self._timed('callback table', 'POST', '/_dash-update-component', _table('/notification-%d' % n))
+        self._timed('callback page /profile', 'POST', '/_dash-update-component', _page('/profile-%d' % n))
+
+    def replay_movements(self, movements, speed, start, host, port):
+        with socket.create_connection((host, port)) as sock:
+            for offset, update in movements:
+                delay = start + offset / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                sock.sendall((json.dumps(update) + '\n').encode())
+                self.updates_sent += 1
+
+    def run(self, logins, concurrency=16, speed=60.0, movements=None, feed=None):
+        start = time.perf_counter()
+        if movements and feed:
+            threading.Thread(target=self.replay_movements, args=(movements, speed, start) + feed, daemon=True).start()
+        with ThreadPoolExecutor(concurrency) as pool:
+            for offset, user in logins:
+                delay = start + offset / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.session, user)
+        self.wall = time.perf_counter() - start
+        return self.report()
+
+    def report(self):
+        rows = []
+        for name, values in self.latencies.items():
+            ms = np.asarray(values) * 1000
+            rows.append({'request': name, 'count': len(ms), 'errors': self.errors[name], 'per_s': len(ms) / self.wall,
+                         'p50_ms': np.percentile(ms, 50), 'p95_ms': np.percentile(ms, 95), 'p99_ms': np.percentile(ms, 99),
+                         'max_ms': ms.max()})
+        return pd.DataFrame(rows).set_index('request')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay traveller logins and vehicle movements against the dashboard')
+    parser.add_argument('--url', default=URL, help='local server to load')
+    parser.add_argument('--in-process', action='store_true', help='load app.py in this process instead of a server')
+    parser.add_argument('--travellers', default='pedestrian_preference.csv', help='travellers file (one login per row)')
+    parser.add_argument('--logins', type=int, help='number of logins, drawn from the travellers file')
+    parser.add_argument('--duration', type=float, default=600.0, help='seconds of timeline the logins are spread over without Time_of_Day')
+    parser.add_argument('--fcd', default='most.fcdgeoTime.csv', help='FCD time series of the vehicle movements')
+    parser.add_argument('--feed-port', type=int, help='fleet feed port of the server (FLEET_FEED_PORT); movements are not replayed without it')
+    parser.add_argument('--speed', type=float, default=60.0, help='timeline seconds per second of the test')
+    parser.add_argument('--concurrency', type=int, default=16, help='sessions running at the same time')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args()
+
+    logins = load_logins(args.travellers, args.logins, args.duration)
+    movements, feed = None, None
+    if args.feed_port:
+        movements = load_movements(args.fcd, set(pd.read_csv('veh_.csv')['vehicle_id']))
+        feed = (urllib.parse.urlsplit(args.url).hostname, args.feed_port)
+    client = InProcessClient() if args.in_process else HttpClient(args.url)
+    test = LoadTest(client)
+    report = test.run(logins, args.concurrency, args.speed, movements, feed)
+    pd.set_option('display.width', 200)
+    print(report.round(1).to_string())
+    print('%d sessions in %.1fs, %.1f requests/s, %d vehicle updates sent' % (len(logins), test.wall, report['count'].sum() / test.wall, test.updates_sent))
+    if args.output:
+        report.reset_index().to_json(args.output, orient='records', indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,27 +2,96 @@
 # coding: utf-8
 
 # The function is used to identify clusters of locations in the dataset. The dataframe with the location details is passed as an input to the function, along with the column range of the dataframe to be considered and the number of clusters. KMeans clustering method will compute the clusters and will add a column called 'cluster_label' to the data frame. The dataframe with cluster labels is returned as the output.
+# With score='auto' the number of clusters is chosen by select_k(). Every K of the range is fitted on a random sample of the rows, in parallel in a process pool, and scored by its inertia (elbow) and its silhouette on a smaller sample. The chosen K is then fitted once on all the rows, starting from the centres found on the sample, so the whole selection takes about as long as a single fit.
 
 # In[7]:
 
 
 # Importing libraries
+# sklearn is imported inside cluster_fn(), so importing this module stays cheap for the dashboard
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
 import pandas as pd
-import sklearn
-from sklearn.cluster import KMeans
 
 
 # In[8]:
 
 
-def cluster_fn(df,col_beg,col_end,score):
+K_RANGE = range(2, 13)
+# Rows the K of the range are fitted on, and rows the silhouette is computed on (its cost grows with the square of the rows)
+FIT_SAMPLE = 20000
+SILHOUETTE_SAMPLE = 2000
+
+
+# random_state seeds KMeans for this call only (as in select_k), so concurrent callers do not share the global numpy seed
+def cluster_fn(df,col_beg,col_end,score,random_state=None):
+    from sklearn.cluster import KMeans
+    if score == 'auto':
+        kmeans, _ = select_k(df, col_beg, col_end, seed=0 if random_state is None else random_state)
+        df['cluster_label'] = kmeans.labels_
+        return df
     # Clustering using K = 7 and assigning Clusters to the dataset
-    kmeans = KMeans(n_clusters = score, init ='k-means++')
-    kmeans.fit(df[df.columns[col_beg:col_end]]) # Compute k-means clustering.
-    df['cluster_label'] = kmeans.fit_predict(df[df.columns[col_beg:col_end]])
+    kmeans = KMeans(n_clusters = score, init ='k-means++', random_state=random_state)
+    df['cluster_label'] = kmeans.fit_predict(df[df.columns[col_beg:col_end]]) # Compute k-means clustering.
     return df
 
 
+def _score_k(args):
+    from sklearn.cluster import KMeans
+    from sklearn.metrics import silhouette_score
+    k, fit_rows, silhouette_rows, seed = args
+    kmeans = KMeans(n_clusters=k, init='k-means++', random_state=seed).fit(fit_rows)
+    silhouette = silhouette_score(silhouette_rows, kmeans.predict(silhouette_rows)) if k < len(silhouette_rows) else np.nan
+    return k, kmeans.inertia_, silhouette, kmeans.cluster_centers_
+
+
+# Knee of the inertia curve - the K farthest below the straight line between the first and the last K, on a log scale of the inertia
+# With a single K that K is returned, and a flat curve gives the first K
+def elbow(ks, inertia):
+    ks = np.asarray(ks, dtype=float)
+    if len(ks) == 0:
+        raise ValueError('elbow() needs the inertia of at least one K')
+    # An inertia of 0 (as many clusters as distinct rows) is floored, so that its log stays finite
+    inertia = np.log(np.maximum(np.asarray(inertia, dtype=float), np.finfo(float).tiny))
+    if len(ks) == 1 or inertia[0] == inertia[-1]:
+        return int(ks[0])
+    x = (ks - ks[0]) / (ks[-1] - ks[0])
+    y = (inertia - inertia[-1]) / (inertia[0] - inertia[-1])
+    return int(ks[np.argmax((1 - x) - y)])
+
+
+# Chooses the number of clusters - method is 'elbow' (inertia) or 'silhouette'.
+# Returns the KMeans model fitted on all the rows with the chosen K, and a dataframe of the inertia and silhouette of every K.
+def select_k(df, col_beg, col_end, k_range=K_RANGE, method='elbow', fit_sample=FIT_SAMPLE, silhouette_sample=SILHOUETTE_SAMPLE, n_jobs=None, seed=0):
+    from sklearn.cluster import KMeans
+    rows = df[df.columns[col_beg:col_end]].to_numpy(dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    fit_rows = rows[rng.choice(len(rows), fit_sample, replace=False)] if len(rows) > fit_sample else rows
+    silhouette_rows = fit_rows[rng.choice(len(fit_rows), silhouette_sample, replace=False)] if len(fit_rows) > silhouette_sample else fit_rows
+    ks = [k for k in k_range if k < len(fit_rows)]
+    if not ks:
+        raise ValueError('select_k() needs more rows than the smallest K of %r, got %d rows' % (k_range, len(fit_rows)))
+    tasks = [(k, fit_rows, silhouette_rows, seed) for k in ks]
+    n_jobs = n_jobs or min(len(ks), os.cpu_count() or 1)
+    if n_jobs > 1:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            results = list(pool.map(_score_k, tasks))
+    else:
+        results = [_score_k(task) for task in tasks]
+    diagnostics = pd.DataFrame([r[:3] for r in results], columns=['k', 'inertia', 'silhouette']).set_index('k')
+    # The silhouette is not defined when every K has as many clusters as the silhouette rows - the elbow is used then
+    if method == 'silhouette' and diagnostics['silhouette'].notna().any():
+        k = int(diagnostics['silhouette'].idxmax())
+    else:
+        k = elbow(diagnostics.index, diagnostics['inertia'])
+    diagnostics['chosen'] = diagnostics.index == k
+    centres = dict((r[0], r[3]) for r in results)[k]
+    kmeans = KMeans(n_clusters=k, init=centres, n_init=1).fit(rows)
+    return kmeans, diagnostics
+
+
 # In[ ]:
 
 
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Lightweight timing of the hot paths of the dashboard.
+# The span() context manager and the timed() decorator measure the wall time of a block or function and record it in a latency histogram, keyed by the span name. Counters of calls and errors are kept for every span as well.
+# The register_metrics_route() adds a /metrics route to the Flask server that returns all the histograms and counters in the Prometheus text format, so they can be scraped without any extra dependency.
+# The enable_profiler() is opt-in. While a request is being served a background thread samples the request thread's stack every few milliseconds; when the request takes longer than the threshold, the samples are written as collapsed stacks ("frame;frame;frame count"), which can be turned into a flame graph with flamegraph.pl or speedscope. Sampling stops when the view returns its response: the body of a streamed response is not profiled.
+
+# In[1]:
+
+
+# Importing libraries
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from flask import Response, g, request
+
+
+# In[2]:
+
+
+# Histogram bucket upper bounds in seconds
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_lock = threading.Lock()
+_histograms = {}  # span -> [bucket counts..., +Inf count, sum]
+_errors = Counter()
+
+
+def observe(name, seconds):
+    with _lock:
+        hist = _histograms.get(name)
+        if hist is None:
+            hist = _histograms[name] = [0] * (len(BUCKETS) + 1) + [0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist[i] += 1
+                break
+        else:
+            hist[len(BUCKETS)] += 1
+        hist[-1] += seconds
+
+
+@contextmanager
+def span(name):
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        with _lock:
+            _errors[name] += 1
+        raise
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed(name):
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# In[3]:
+
+
+def render_metrics():
+    lines = ['# HELP app_span_seconds Wall time of instrumented code paths.', '# TYPE app_span_seconds histogram']
+    with _lock:
+        snapshot = {name: list(hist) for name, hist in _histograms.items()}
+        errors = dict(_errors)
+    for name in sorted(snapshot):
+        hist = snapshot[name]
+        cumulative = 0
+        for bound, count in zip(BUCKETS, hist):
+            cumulative += count
+            lines.append('app_span_seconds_bucket{span="%s",le="%g"} %d' % (name, bound, cumulative))
+        cumulative += hist[len(BUCKETS)]
+        lines.append('app_span_seconds_bucket{span="%s",le="+Inf"} %d' % (name, cumulative))
+        lines.append('app_span_seconds_sum{span="%s"} %.6f' % (name, hist[-1]))
+        lines.append('app_span_seconds_count{span="%s"} %d' % (name, cumulative))
+    lines += ['# HELP app_span_errors_total Exceptions raised inside instrumented code paths.', '# TYPE app_span_errors_total counter']
+    for name in sorted(errors):
+        lines.append('app_span_errors_total{span="%s"} %d' % (name, errors[name]))
+    return '\n'.join(lines) + '\n'
+
+
+def register_metrics_route(server, path='/metrics'):
+    server.add_url_rule(path, 'metrics', lambda: Response(render_metrics(), mimetype='text/plain; version=0.0.4'))
+
+
+# In[4]:
+
+
+# Sampling profiler for slow requests
+
+def _collapse(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append('%s (%s:%d)' % (code.co_name, os.path.basename(code.co_filename), code.co_firstlineno))
+        frame = frame.f_back
+    return ';'.join(reversed(stack))
+
+
+class _Sampler(threading.Thread):
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[_collapse(frame)] += 1
+
+
+def enable_profiler(server, threshold=1.0, interval=0.005, out_dir='profiles'):
+    os.makedirs(out_dir, exist_ok=True)
+
+    @server.before_request
+    def _start_sampler():
+        g.profile_start = time.perf_counter()
+        g.profile_sampler = _Sampler(threading.get_ident(), interval)
+        g.profile_sampler.start()
+
+    def _stop_sampler():
+        sampler = g.pop('profile_sampler', None)
+        if sampler is None:
+            return
+        sampler.stopped.set()
+        sampler.join()
+        elapsed = time.perf_counter() - g.pop('profile_start')
+        if elapsed < threshold or not sampler.samples:
+            return
+        name = '%s_%s_%dms.collapsed' % (time.strftime('%Y%m%d-%H%M%S'), request.path.strip('/').replace('/', '_') or 'index', elapsed * 1000)
+        with open(os.path.join(out_dir, name), 'w') as f:
+            for stack, count in sampler.samples.most_common():
+                f.write('%s %d\n' % (stack, count))
+
+    # The sampler stops as soon as the view has returned its response, before the body is sent, so a streamed body is not sampled and a long-lived stream never dumps a profile
+    @server.after_request
+    def _stop_on_response(response):
+        _stop_sampler()
+        return response
+
+    # Requests that ended without a response - an exception escaped the error handlers
+    @server.teardown_request
+    def _stop_on_teardown(exc):
+        _stop_sampler()
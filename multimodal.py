@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Multi-modal recommendations: the taxis and ubers of veh_.csv, and the mopeds, motorcycles, cars and coaches of ex_vehicle_.csv, which the dashboard only draws on the maps.
+# Every mode (MODES) has its own live vehicle index (vehicle_index.py). The ride hailing mode shares the index of the fleet, so it follows the fleet feed; the others are built from ex_vehicle_.csv. A query is sent to the index of every mode offered to the travel mode of the traveller at once, on a thread pool, and the k best vehicles of every mode are merged by score - the distance times the weight of the mode for that travel mode (TRAVEL_MODES), so that an ebike traveller is offered two-wheelers before a taxi a little closer.
+# Each index only holds the vehicles of its mode, so the grid search of a mode stops after the rings around the traveller that hold its own k closest vehicles, and a mode with a few vehicles is measured in one pass. The cost of a query is that of one search over the whole fleet, split across the modes, rather than one search per mode over the whole fleet.
+
+# In[1]:
+
+
+# Importing libraries
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from vehicle_index import CELL_SIZE, VehicleIndex
+
+
+# In[2]:
+
+
+# Vehicle types of every mode
+MODES = {
+    'ride_hailing': ['taxi', 'uber'],
+    'moped': ['moped'],
+    'motorcycle': ['motorcycle'],
+    'car': ['passenger1', 'passenger2a', 'passenger2b', 'passenger3', 'passenger4'],
+    'coach': ['coach'],
+}
+# Modes offered to every travel mode, with the weight their distance is multiplied by when ranking
+TRAVEL_MODES = {
+    'ebike': {'moped': 1.0, 'motorcycle': 1.0, 'ride_hailing': 1.3, 'car': 1.5},
+    'walk': {'ride_hailing': 1.0, 'car': 1.2, 'moped': 1.5, 'motorcycle': 1.5},
+    'car': {'ride_hailing': 1.0, 'car': 1.0},
+    'group': {'coach': 1.0, 'car': 1.3, 'ride_hailing': 1.5},
+}
+DEFAULT_MODES = {'ride_hailing': 1.0}
+COLUMNS = ['vehicle_id', 'vehicle_type', 'fuel_type', 'driver_name', 'phnum']
+
+
+class MultiModalEngine:
+    def __init__(self, indexes, records, travel_modes=TRAVEL_MODES):
+        self.indexes = indexes              # mode -> VehicleIndex
+        self.records = records              # vehicle_id -> row of the vehicle
+        self.travel_modes = travel_modes
+        self._executor = ThreadPoolExecutor(max(1, len(indexes)), thread_name_prefix='multimodal')
+
+    # fleet_index - live index of veh_ (the ride hailing mode), shared with the fleet feed
+    @classmethod
+    def from_frames(cls, veh_, ex_vehicle_, fleet_index=None, cell_size=CELL_SIZE, travel_modes=TRAVEL_MODES):
+        vehicles = pd.concat([veh_, ex_vehicle_], ignore_index=True)
+        mode_of = {vehicle_type: mode for mode, vehicle_types in MODES.items() for vehicle_type in vehicle_types}
+        vehicles = vehicles.assign(mode=vehicles['vehicle_type'].astype(object).map(mode_of))
+        vehicles = vehicles.dropna(subset=['mode'])
+        # Vehicles of ex_vehicle_.csv have no fuel type
+        fuel = vehicles['fuel_type'].astype(object).fillna('unknown') if 'fuel_type' in vehicles else pd.Series('unknown', index=vehicles.index)
+        vehicles = vehicles.assign(fuel_type=fuel).drop_duplicates('vehicle_id')
+        ref_lat = float(vehicles['lat'].mean()) if len(vehicles) else 43.74
+        ref_lon = float(vehicles['lon'].mean()) if len(vehicles) else 7.42
+        # Every mode is measured like the fleet
+        metric = fleet_index.metric if fleet_index is not None else None
+        indexes = {}
+        for mode, group in vehicles.groupby('mode'):
+            if mode == 'ride_hailing' and fleet_index is not None:
+                indexes[mode] = fleet_index
+                continue
+            index = VehicleIndex(cell_size, ref_lat, metric, ref_lon)
+            for vehicle_id, lat, lon, fuel_type in zip(group['vehicle_id'], group['lat'], group['lon'], group['fuel_type']):
+                index.upsert(vehicle_id, lat, lon, fuel_type)
+            indexes[mode] = index
+        columns = [c for c in COLUMNS if c in vehicles] + ['mode']
+        records = {record['vehicle_id']: {c: v for c, v in record.items() if pd.notna(v)} for record in vehicles[columns].to_dict('records')}
+        return cls(indexes, records, travel_modes)
+
+    def modes(self, travel_mode):
+        weights = self.travel_modes.get(travel_mode, DEFAULT_MODES)
+        return {mode: weight for mode, weight in weights.items() if mode in self.indexes}
+
+    # k best vehicles for the travel mode, as (score, distance in meters, mode, vehicle_id), best first
+    def nearest(self, lat, lon, travel_mode, k=5, fuel_types=None):
+        weights = self.modes(travel_mode)
+        futures = {mode: self._executor.submit(self.indexes[mode].nearest, lat, lon, k, fuel_types) for mode in weights}
+        ranked = ([(dist * weights[mode], dist, mode, vehicle_id) for dist, vehicle_id in futures[mode].result()] for mode in weights)
+        return heapq.nsmallest(k, heapq.merge(*ranked))
+
+    # Rows of the k best vehicles, with their mode, current position, distance in meters and score
+    def recommend(self, lat, lon, travel_mode, k=5, fuel_types=None):
+        vehicles = []
+        for score, dist, mode, vehicle_id in self.nearest(lat, lon, travel_mode, k, fuel_types):
+            record = dict(self.records.get(vehicle_id, {'vehicle_id': vehicle_id}), mode=mode)
+            try:
+                record['lat'], record['lon'] = self.indexes[mode].position(vehicle_id)[:2]
+            except KeyError:  # departed since the query
+                continue
+            record['dist'] = dist
+            record['score'] = score
+            vehicles.append(record)
+        return vehicles
@@ -2,18 +2,21 @@
 # coding: utf-8
 
 # The map_html() function takes latitude and longitude of traveller, a subset of vehicles recommended for the passenger, preferred fuel type of passenger and passenger name as inputs. The function uses folium module to build a map which plots user location in blue marker point and vehicle locations in red marker points. The output ie, the map is stored as a HTML file, which is later used in the dashboard in an iframe. In order to ensure personalization, the HTML file is saved by appending the preferred fuel type to the filename.
+# A path may be given instead (the region shards draw the maps of concurrent requests each to a file of its own); the default stays maps/avail_<fuel_type>_veh.html.
 
 # In[1]:
 
 
 # Importing libraries
-import folium
-from folium.plugins import MarkerCluster
+# folium is imported inside map_html(), so it is only loaded by the process that builds the maps
 
 # In[2]:
 
 
-def map_html(lat,lng,gas_veh_subset,fuel_type,p_name,dist,ex_veh_set):
+def map_html(lat,lng,gas_veh_subset,fuel_type,p_name,dist,ex_veh_set,path=None):
+    import folium
+    from folium.plugins import MarkerCluster
+
     m = folium.Map(location=[lat, lng], zoom_start=15)
 
     
@@ -53,5 +56,5 @@ def map_html(lat,lng,gas_veh_subset,fuel_type,p_name,dist,ex_veh_set):
                   popup=str(p_name),
                       icon= folium.Icon(icon="glyphicon-user",color="blue", icon_color='lightblue')).add_to(m)
 
-    m.save('maps/avail_'+fuel_type+'_veh.html')   
+    m.save(path or 'maps/avail_'+fuel_type+'_veh.html')   
     return
@@ -0,0 +1,387 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Preprocessing of the SUMO scenario into the datasets of the dashboard, as a graph of stages in place of the exploration notebook.
+# The stages follow the notebook: clean the edges and cluster their lanes (cluster_fn), keep the first record of every vehicle on a lane (most.emissionTime.csv) and of every pedestrian on an edge (most.fcdgeoTime.csv), merge them with the lanes of the cluster, create the traveller profiles, and split the vehicles into the fleet (taxis and ubers, with a fuel type, a phone number and a driver from names) and the excluded vehicles. The rain windows of WeeklyWeather.csv and the rebalancing plan (rebalancing.py) are stages as well.
+# A stage is declared with the stages it depends on, the files it reads, its parameters and its helpers - the functions of this module and the modules it calls. Its output is cached in pipeline_cache/ under a hash of the source of its function and of its helpers, its parameters, the content of its files and the hash of the outputs of its dependencies. A stage is only run when that hash changes, so a change to WeeklyWeather.csv or to one SUMO file reruns the stages downstream of it and nothing else, and a stage whose output did not change stops the rerun there.
+# Stages whose dependencies are ready run in parallel in a thread pool, so random draws use a generator of the stage (default_rng(seed)) and never the global seed of numpy or random; outputs are only loaded from the cache when a stage that needs them has to run.
+# The outputs are written to pedestrian_preference.csv, veh_.csv, ex_vehicle_.csv and rebalancing_plan.csv when their stage ran:
+#     python preprocess.py
+#     python preprocess.py --force clustered_edges     # rerun a stage and everything downstream of it
+#     python preprocess.py --now 2022-06-27T08:00       # plan the rain windows that end after that time instead of the current hour
+
+# In[1]:
+
+
+# Importing libraries
+import argparse
+import datetime
+import hashlib
+import importlib.util
+import inspect
+import json
+import os
+import pickle
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+
+# In[2]:
+
+
+CACHE_DIR = 'pipeline_cache'
+FILE_HASHES = 'files.json'
+CHUNKSIZE = 1000000
+
+# name, function, stages it depends on, files it reads, parameters - fn(*dependency outputs, *files, **params) - and helpers, functions or module names whose source is part of the cache key
+Stage = namedtuple('Stage', ['name', 'fn', 'deps', 'files', 'params', 'helpers'], defaults=[()])
+# Result of a stage: hash of its output, and whether it ran or was found in the cache
+StageResult = namedtuple('StageResult', ['name', 'key', 'digest', 'ran', 'seconds'])
+
+
+# Ids are cleaned of special characters as in the notebook; lane ids of the time series also lose their dashes
+def _clean(ids, dashes=False):
+    ids = ids.astype(str).str.replace(':', '', regex=False).str.replace('#', '_', regex=False)
+    return ids.str.replace('-', '', regex=False) if dashes else ids
+
+
+def clean_edges(path):
+    edges_df = pd.read_csv(path, index_col=0)
+    edges_df['edgeID'] = _clean(edges_df['edgeID'])
+    edges_df['laneID'] = _clean(edges_df['laneID'])
+    return edges_df
+
+
+# Cluster of every lane (cluster_fn, K clusters); KMeans is seeded so that the labels are the same on every run
+def cluster_edges(edges_df, k=7, seed=0):
+    from loc_clustering import cluster_fn
+    edges_subset_df = cluster_fn(edges_df.loc[:, ['laneID', 'lat', 'lon']].copy(), 1, 3, k, random_state=seed)
+    return pd.merge(edges_df, edges_subset_df, on=['laneID', 'lat', 'lon'], how='outer')
+
+
+def cluster_lanes(clustered_edges_df, cluster=1):
+    return clustered_edges_df[clustered_edges_df['cluster_label'].isin([cluster])].drop_duplicates(subset=['laneID'])
+
+
+# First record of every vehicle on every lane, read in chunks - the rest of the time series is not used
+def vehicle_records(path, chunksize=CHUNKSIZE):
+    columns = ['vehicle_id', 'vehicle_eclass', 'vehicle_fuel', 'vehicle_lane', 'vehicle_type', 'vehicle_x', 'vehicle_y']
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize):
+        chunk = chunk.rename(columns={'vehicle_lane': 'laneID'})
+        for col in ['vehicle_id', 'vehicle_eclass', 'laneID', 'vehicle_type']:
+            chunk[col] = chunk[col].str.lower()
+        chunk['laneID'] = _clean(chunk['laneID'], dashes=True)
+        chunks.append(chunk.drop_duplicates(['vehicle_id', 'laneID']))
+    return pd.concat(chunks, ignore_index=True).drop_duplicates(['vehicle_id', 'laneID'], ignore_index=True)
+
+
+# First record of every pedestrian (vehicle_type 0) on every edge, read in chunks
+def pedestrian_records(path, chunksize=CHUNKSIZE):
+    columns = ['Time_of_Day', 'vehicle_type', 'person_id', 'person_x', 'person_y', 'person_edge']
+    chunks = []
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=chunksize, dtype={'vehicle_type': str}):
+        chunk = chunk.loc[chunk['vehicle_type'] == '0', columns[:1] + columns[2:]].dropna(subset=['person_id'])
+        chunk['person_id'] = chunk['person_id'].str.lower()
+        chunk['edgeID'] = _clean(chunk.pop('person_edge').str.lower(), dashes=True)
+        chunks.append(chunk.drop_duplicates(['person_id', 'edgeID']))
+    return pd.concat(chunks, ignore_index=True).drop_duplicates(['person_id', 'edgeID'], ignore_index=True)
+
+
+def cluster_vehicles(vehicles_df, cluster_lanes_df):
+    return pd.merge(vehicles_df, cluster_lanes_df, on='laneID', how='inner')
+
+
+# In[3]:
+
+
+TRAVELLER_PROFILES = [('Mary Jane', 'electric', 'ebike'), ('Alex Joe', 'petrol/diesel', 'ebike')]
+
+
+# The `candidates` travellers first seen in the cluster, and the lanes of their edges, where vehicles are looked for; the first of them by person_id get the profiles
+def travellers(pedestrians_df, cluster_lanes_df, edges_df, candidates=3, profiles=TRAVELLER_PROFILES):
+    pedest_fchr_df = pd.merge(pedestrians_df, cluster_lanes_df, on='edgeID', how='inner')
+    pedst_subset = pedest_fchr_df.groupby('person_id', as_index=False).first().sort_values(by='Time_of_Day')
+    peds_list = pedst_subset['person_id'].tolist()[:candidates]
+    pedst_subset = pedest_fchr_df[pedest_fchr_df['person_id'].isin(peds_list)]
+    edges_list = pedst_subset['edgeID'].unique().tolist()
+    lanes = edges_df[edges_df['edgeID'].isin(edges_list)]['laneID'].unique().tolist()
+    pedestrian_preference = pedst_subset[['person_id', 'person_x', 'person_y', 'edgeID', 'laneID', 'cluster_label']]
+    pedestrian_preference = pedestrian_preference.groupby('person_id').first().head(len(profiles))
+    names, fuels, modes = zip(*profiles[:len(pedestrian_preference)]) if len(pedestrian_preference) else ((), (), ())
+    pedestrian_preference = pedestrian_preference.assign(traveller_name=list(names), fuel_preference=list(fuels), travel_mode=list(modes))
+    return {'pedestrian_preference': pedestrian_preference, 'lanes': lanes}
+
+
+# Full names drawn as names.get_full_name() draws them, from the name files of the names package, but with the generator of the stage instead of the global random module
+def _full_names(rng, n):
+    import names
+    tables = {}
+    for key, path in names.FILES.items():
+        table = pd.read_csv(path, sep=r'\s+', header=None, usecols=[0, 2], names=['name', 'cumulative'], keep_default_na=False)
+        tables[key] = (table['name'].str.capitalize().to_numpy(), table['cumulative'].to_numpy())
+
+    def draw(key, count):
+        found, cumulative = tables[key]
+        at = np.searchsorted(cumulative, rng.random(count) * 90, side='right')
+        return np.where(at < len(found), found[np.minimum(at, len(found) - 1)], '')
+
+    male = rng.random(n) < 0.5
+    first = np.where(male, draw('first:male', n), draw('first:female', n))
+    return [first_name + ' ' + last_name for first_name, last_name in zip(first, draw('last', n))]
+
+
+# Vehicles on the lanes of the travellers: the fleet (taxis and ubers, with a fuel type, phone number and driver) and the excluded vehicles
+def fleet(cluster_vehicles_df, travellers_, vehicle_types=('taxi', 'uber'), fuel_types=('electric', 'petrol', 'diesel'), seed=0):
+    columns = ['vehicle_id', 'vehicle_eclass', 'vehicle_fuel', 'laneID', 'vehicle_type', 'vehicle_x', 'vehicle_y', 'edgeID', 'lon', 'lat', 'cluster_label']
+    vehicle_cluster_df = cluster_vehicles_df[cluster_vehicles_df['laneID'].isin(travellers_['lanes'])]
+    in_fleet = vehicle_cluster_df['vehicle_type'].isin(vehicle_types)
+    veh_ = vehicle_cluster_df[in_fleet].groupby('vehicle_id').first().reset_index()[columns]
+    ex_vehicle_ = vehicle_cluster_df[~in_fleet].groupby('vehicle_id').first().reset_index()[columns]
+    rng = np.random.default_rng(seed)
+    veh_['fuel_type'] = rng.choice(list(fuel_types), len(veh_))
+    veh_['phnum'] = ['902' + ''.join(map(str, digits)) for digits in rng.integers(0, 10, (len(veh_), 7))]
+    veh_['driver_name'] = _full_names(rng, len(veh_))
+    return {'veh_': veh_, 'ex_vehicle_': ex_vehicle_}
+
+
+def weather_windows(path):
+    from rain_alert_fn import rain_windows
+    return rain_windows(pd.read_csv(path))
+
+
+# Only the windows that end after now are planned; now is a parameter, so the stage reruns when it changes (every hour by default - see main())
+def rebalancing(fleet_, travellers_, windows, now=None):
+    from rebalancing import rebalancing_plan
+    return rebalancing_plan(fleet_['veh_'], travellers_['pedestrian_preference'], windows,
+                            now=datetime.datetime.fromisoformat(now) if now else None)
+
+
+STAGES = [
+    Stage('edges', clean_edges, [], ['Most_edges.csv'], {}, [_clean]),
+    Stage('clustered_edges', cluster_edges, ['edges'], [], {'k': 7, 'seed': 0}, ['loc_clustering']),
+    Stage('cluster_lanes', cluster_lanes, ['clustered_edges'], [], {'cluster': 1}),
+    Stage('vehicles', vehicle_records, [], ['most.emissionTime.csv'], {}, [_clean]),
+    Stage('pedestrians', pedestrian_records, [], ['most.fcdgeoTime.csv'], {}, [_clean]),
+    Stage('cluster_vehicles', cluster_vehicles, ['vehicles', 'cluster_lanes'], [], {}),
+    Stage('travellers', travellers, ['pedestrians', 'cluster_lanes', 'edges'], [], {'candidates': 3, 'profiles': TRAVELLER_PROFILES}),
+    Stage('fleet', fleet, ['cluster_vehicles', 'travellers'], [], {'seed': 0}, [_full_names, 'names']),
+    Stage('rain_windows', weather_windows, [], ['WeeklyWeather.csv'], {}, ['rain_alert_fn']),
+    Stage('rebalancing', rebalancing, ['fleet', 'travellers', 'rain_windows'], [], {'now': None}, ['rebalancing', 'road_routing']),
+]
+
+# File -> (stage, item of its output, whether the index is written) written after a run
+EXPORTS = {
+    'pedestrian_preference.csv': ('travellers', 'pedestrian_preference', True),
+    'veh_.csv': ('fleet', 'veh_', True),
+    'ex_vehicle_.csv': ('fleet', 'ex_vehicle_', True),
+    'rebalancing_plan.csv': ('rebalancing', None, False),
+}
+
+
+# In[4]:
+
+
+# Content hash of a stage output - frames are hashed with pandas, so that the hash does not depend on how they are pickled
+def digest(value, h=None):
+    top = h is None
+    h = hashlib.sha256() if top else h
+    if isinstance(value, pd.DataFrame):
+        h.update(repr((list(value.columns), [str(t) for t in value.dtypes], value.index.name)).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif isinstance(value, dict):
+        for key in sorted(value):
+            h.update(repr(key).encode())
+            digest(value[key], h)
+    elif isinstance(value, (list, tuple)):
+        h.update(b'[%d' % len(value))
+        for item in value:
+            digest(item, h)
+    else:
+        h.update(repr(value).encode())
+    return h.hexdigest() if top else h
+
+
+# Content hash of a file, kept in the cache by size and modification time so that unchanged files are not read again
+class FileHashes:
+    def __init__(self, cache_dir=CACHE_DIR):
+        self.path = os.path.join(cache_dir, FILE_HASHES)
+        self.lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.known = json.load(f)
+        except FileNotFoundError:
+            self.known = {}
+
+    def __call__(self, path):
+        if not os.path.exists(path):
+            return 'missing'
+        stat = os.stat(path)
+        stamp = '%d:%d' % (stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            entry = self.known.get(path)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        h = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+        with self.lock:
+            self.known[path] = [stamp, h.hexdigest()]
+        return h.hexdigest()
+
+    def save(self):
+        with self.lock:
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.known, f, indent=1)
+            os.replace(tmp, self.path)
+
+
+# Source of a helper: a function, or a module by name, read from its file without importing it
+def helper_source(helper):
+    if callable(helper):
+        return inspect.getsource(helper).encode()
+    spec = importlib.util.find_spec(helper)
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        return ('missing %s' % helper).encode()
+    with open(spec.origin, 'rb') as f:
+        return f.read()
+
+
+def stage_key(stage, dep_digests, file_digests):
+    h = hashlib.sha256()
+    h.update(stage.name.encode())
+    h.update(inspect.getsource(stage.fn).encode())
+    for helper in stage.helpers:
+        h.update(helper_source(helper))
+    h.update(json.dumps(stage.params, sort_keys=True, default=repr).encode())
+    for value in list(dep_digests) + list(file_digests):
+        h.update(value.encode())
+    return h.hexdigest()[:16]
+
+
+# In[5]:
+
+
+class Pipeline:
+    def __init__(self, stages=STAGES, cache_dir=CACHE_DIR):
+        self.stages = {stage.name: stage for stage in stages}
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.file_hashes = FileHashes(cache_dir)
+        self.outputs = {}
+        self.results = {}
+        self._lock = threading.Lock()
+
+    def _path(self, name, key, ext):
+        return os.path.join(self.cache_dir, '%s-%s.%s' % (name, key, ext))
+
+    def output(self, name):
+        with self._lock:
+            if name in self.outputs:
+                return self.outputs[name]
+        result = self.results[name]
+        with open(self._path(name, result.key, 'pkl'), 'rb') as f:
+            value = pickle.load(f)
+        with self._lock:
+            self.outputs[name] = value
+        return value
+
+    def _run_stage(self, stage, force):
+        start = time.perf_counter()
+        files = [self.file_hashes(path) for path in stage.files]
+        key = stage_key(stage, [self.results[dep].digest for dep in stage.deps], files)
+        meta = self._path(stage.name, key, 'json')
+        if not force and os.path.exists(meta) and os.path.exists(self._path(stage.name, key, 'pkl')):
+            with open(meta) as f:
+                return StageResult(stage.name, key, json.load(f)['digest'], False, time.perf_counter() - start)
+        value = stage.fn(*[self.output(dep) for dep in stage.deps], *stage.files, **stage.params)
+        value_digest = digest(value)
+        tmp = self._path(stage.name, key, 'pkl.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self._path(stage.name, key, 'pkl'))
+        with open(meta, 'w') as f:
+            json.dump({'digest': value_digest, 'deps': stage.deps, 'files': stage.files, 'params': stage.params}, f, default=repr)
+        self._prune(stage.name, key)
+        with self._lock:
+            self.outputs[stage.name] = value
+        return StageResult(stage.name, key, value_digest, True, time.perf_counter() - start)
+
+    # Only the latest output of a stage is kept
+    def _prune(self, name, key):
+        for entry in os.listdir(self.cache_dir):
+            stem = entry.split('.')[0].rsplit('-', 1)
+            if stem[0] == name and stem[-1] != key:
+                os.remove(os.path.join(self.cache_dir, entry))
+
+    def _downstream(self, names):
+        found = set(names)
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in found and found.intersection(stage.deps):
+                    found.add(stage.name)
+                    changed = True
+        return found
+
+    def run(self, force=(), workers=4):
+        force = self._downstream(force)
+        pending = dict(self.stages)
+        running = {}
+        with ThreadPoolExecutor(workers) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    if all(dep in self.results for dep in stage.deps):
+                        running[pool.submit(self._run_stage, stage, name in force)] = name
+                        del pending[name]
+                if not running:
+                    raise ValueError('stages with missing dependencies: %s' % ', '.join(pending))
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    del running[future]
+                    result = future.result()
+                    self.results[result.name] = result
+        self.file_hashes.save()
+        return [self.results[name] for name in self.stages]
+
+    # Writes the outputs of the stages that ran (or every output, with all=True)
+    def export(self, exports=EXPORTS, out_dir='.', all=False):
+        written = []
+        for path, (name, item, index) in exports.items():
+            if name not in self.results or not (all or self.results[name].ran):
+                continue
+            value = self.output(name)
+            value = value if item is None else value[item]
+            value.to_csv(os.path.join(out_dir, path), index=index)
+            written.append(path)
+        return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the datasets of the dashboard from the SUMO scenario')
+    parser.add_argument('--force', nargs='*', default=[], help='stages to rerun, with everything downstream of them')
+    parser.add_argument('--workers', type=int, default=4, help='stages run in parallel')
+    parser.add_argument('--out-dir', default='.', help='directory the datasets are written to')
+    parser.add_argument('--export-all', action='store_true', help='write every dataset, not only those of the stages that ran')
+    parser.add_argument('--now', default=datetime.datetime.now().strftime('%Y-%m-%dT%H:00'),
+                        help='the rebalancing plan covers the rain windows that end after this time (default the current hour)')
+    args = parser.parse_args()
+
+    stages = [stage._replace(params={'now': args.now}) if stage.name == 'rebalancing' else stage for stage in STAGES]
+    pipeline = Pipeline(stages)
+    for result in pipeline.run(args.force, args.workers):
+        print('%-18s %-8s %7.2fs  %s' % (result.name, 'ran' if result.ran else 'cached', result.seconds, result.digest[:12]))
+    for path in pipeline.export(out_dir=args.out_dir, all=args.export_all):
+        print('wrote', path)
+
+
+if __name__ == '__main__':
+    main()
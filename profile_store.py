@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Traveller profiles in an indexed SQLite database, in place of reading pedestrian_preference.csv into a frame.
+# The travellers table is keyed on person_id, with indexes on travel_mode, fuel_preference and cluster_label, and on the login user name. profile() and profile_for_user() are point lookups on the primary key or the user name index; segment() reads the travellers of a segment (travel mode, fuel preference, cluster) through the indexes, and iter_segment() reads them in chunks, so memory stays bounded with millions of travellers.
+# The database is built once from the CSV file, which is read in chunks:
+#     python profile_store.py
+# The dashboard falls back to pedestrian_preference.csv when the database has not been built.
+
+# In[1]:
+
+
+# Importing libraries
+import os
+import sqlite3
+import threading
+
+import pandas as pd
+
+
+# In[2]:
+
+
+PROFILE_DB_PATH = 'travellers.db'
+COLUMNS = ['person_id', 'person_x', 'person_y', 'edgeID', 'laneID', 'cluster_label', 'traveller_name', 'fuel_preference', 'travel_mode']
+# Login user name -> traveller (see the login call back in app.py)
+USERNAMES = {'mary': 'Mary Jane', 'alex': 'Alex Joe'}
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS travellers (
+    person_id TEXT PRIMARY KEY,
+    person_x REAL,
+    person_y REAL,
+    edgeID TEXT,
+    laneID TEXT,
+    cluster_label INTEGER,
+    traveller_name TEXT,
+    fuel_preference TEXT,
+    travel_mode TEXT,
+    username TEXT
+) WITHOUT ROWID;
+'''
+# Created after the bulk load, which is faster than keeping them up to date row by row
+INDEXES = '''
+CREATE INDEX IF NOT EXISTS travellers_travel_mode ON travellers (travel_mode, fuel_preference);
+CREATE INDEX IF NOT EXISTS travellers_fuel_preference ON travellers (fuel_preference);
+CREATE INDEX IF NOT EXISTS travellers_cluster_label ON travellers (cluster_label);
+CREATE INDEX IF NOT EXISTS travellers_username ON travellers (username);
+'''
+
+
+def build_profile_store(csv_path='pedestrian_preference.csv', path=PROFILE_DB_PATH, usernames=USERNAMES, chunksize=100000):
+    names = {name: user for user, name in usernames.items()}
+    tmp = path + '.tmp'
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    conn = sqlite3.connect(tmp)
+    # The database is written to a temporary file and renamed into place, so the journal is not needed
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.executescript(SCHEMA)
+    for chunk in pd.read_csv(csv_path, usecols=COLUMNS, chunksize=chunksize):
+        chunk = chunk[COLUMNS].astype(object).where(chunk[COLUMNS].notna(), None)
+        chunk['username'] = chunk['traveller_name'].map(names)
+        conn.executemany('INSERT OR REPLACE INTO travellers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                         chunk.itertuples(index=False, name=None))
+        conn.commit()
+    conn.executescript(INDEXES)
+    conn.execute('ANALYZE')
+    conn.commit()
+    conn.close()
+    os.replace(tmp, path)
+
+
+# In[3]:
+
+
+class ProfileStore:
+    def __init__(self, path=PROFILE_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+
+    # One read-only connection per thread - sqlite3 connections cannot be shared between the request threads
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect('file:%s?mode=ro' % self.path, uri=True)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def profile(self, person_id):
+        row = self._conn().execute('SELECT * FROM travellers WHERE person_id = ?', (person_id,)).fetchone()
+        return None if row is None else dict(row)
+
+    def profile_for_user(self, username):
+        row = self._conn().execute('SELECT * FROM travellers WHERE username = ? ORDER BY person_id LIMIT 1', (username,)).fetchone()
+        return None if row is None else dict(row)
+
+    def _segment_query(self, travel_mode, fuel_preference, cluster_label):
+        where, params = [], []
+        for column, value in (('travel_mode', travel_mode), ('fuel_preference', fuel_preference), ('cluster_label', cluster_label)):
+            if value is not None:
+                where.append('%s = ?' % column)
+                params.append(value)
+        sql = 'SELECT %s FROM travellers' % ', '.join(COLUMNS)
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return sql, params
+
+    # Travellers of a segment, in frames of at most chunksize rows, indexed on person_id like pd.read_csv(..., index_col=0)
+    def iter_segment(self, travel_mode=None, fuel_preference=None, cluster_label=None, chunksize=100000):
+        sql, params = self._segment_query(travel_mode, fuel_preference, cluster_label)
+        for chunk in pd.read_sql_query(sql, self._conn(), params=params, index_col='person_id', chunksize=chunksize):
+            yield chunk
+
+    def segment(self, travel_mode=None, fuel_preference=None, cluster_label=None):
+        sql, params = self._segment_query(travel_mode, fuel_preference, cluster_label)
+        return pd.read_sql_query(sql, self._conn(), params=params, index_col='person_id')
+
+    def count(self, travel_mode=None, fuel_preference=None, cluster_label=None):
+        sql, params = self._segment_query(travel_mode, fuel_preference, cluster_label)
+        return self._conn().execute('SELECT COUNT(*) FROM (%s)' % sql, params).fetchone()[0]
+
+
+# The profile store, or None when the database has not been built
+def open_profile_store(path=PROFILE_DB_PATH):
+    if not os.path.exists(path):
+        return None
+    return ProfileStore(path)
+
+
+if __name__ == '__main__':
+    build_profile_store()
+    print('%d travellers in %s' % (ProfileStore().count(), PROFILE_DB_PATH))
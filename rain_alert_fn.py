@@ -1,26 +1,29 @@
 #!/usr/bin/env python
 # coding: utf-8
 
-# The rainy_days() doesnot require any inputs. When invoked, the function will read the weather dataset and will identify days in the week with any probability of rain. Inorder to display the weekly weather data on the dashboard, we also identify the 7 day range from today; and store date, average temperature of the day, day also in list. Also a list with rainy days of the week is defined. The function returns rainy day names,week days,average temperatures of the weekdays and dates of the week from today.
+# The rainy_days() doesnot require any inputs. When invoked, the function will read the weather dataset and will identify days in the week with any probability of rain. Inorder to display the weekly weather data on the dashboard, we also identify the 7 day range from today; and store date, average temperature of the day, day also in list. Also a list with rainy days of the week is defined. The function returns rainy day names,week days,average temperatures of the weekdays and dates of the week from today (or from the date passed as today).
+
+# The rain_windows() reads the same hourly weather dataset and returns the periods of consecutive rainy hours as (start, end) datetimes. These are used to schedule the rain alerts (alert_scheduler.py) ahead of each period of rain.
 
 # In[2]:
 
 
 # Importing libraries
 import pandas as pd
+import numpy as np
 import datetime
 
 
 #Creating a column to identify chance of rain
 def rain_(row):  
-    if  'rain' in row['Weather']:
+    if  'rain' in str(row['Weather']).lower():
         return 1
     else:
         return 0
 
 
 
-def rainy_days():
+def rainy_days(today=None):
     # File contains information about week's weather - hourly data
     weather_df = pd.read_csv('WeeklyWeather.csv') 
     weather_df['Date'] =  pd.to_datetime(weather_df['Date'])
@@ -30,14 +33,14 @@ def rainy_days():
     weather_df['rain'] = weather_df.apply(lambda row: rain_(row), axis=1)
     # Identify days in the week with probability of rain
     day_delta = datetime.timedelta(days=1)
-    start_date = datetime.date.today()
+    start_date = today or datetime.date.today()
     end_date = start_date + 7*day_delta
 
     start_date = pd.to_datetime(start_date)
     end_date = pd.to_datetime(end_date)
     weekly_weather = weather_df[weather_df['Date'].between(start_date, end_date)]
     #Reseting indexes to display in Weather card in dashboard
-    grpWkday = weekly_weather.groupby([weekly_weather['Date'].dt.date]).mean().reset_index()
+    grpWkday = weekly_weather.groupby([weekly_weather['Date'].dt.date]).mean(numeric_only=True).reset_index()
     grpWkday['Date'] = pd.to_datetime(grpWkday['Date'])
     grpWkday['Weekday'] = grpWkday['Date'].dt.day_name()
     # Identify days in the week with probability of rain
@@ -59,4 +62,18 @@ def rainy_days():
     return rainy_days,wkday,temptre,wkdate
 
 
-
+def rain_windows(weather_df=None):
+    if weather_df is None:
+        weather_df = pd.read_csv('WeeklyWeather.csv')
+    weather_df = weather_df[['Date', 'Weather']].copy()
+    weather_df['Date'] = pd.to_datetime(weather_df['Date'])
+    weather_df = weather_df.sort_values('Date')
+    rain = weather_df['Weather'].str.lower().str.contains('rain').to_numpy()
+    dates = weather_df['Date'].to_numpy()
+    # A new window starts at every rainy hour that does not directly follow another rainy hour
+    hour = np.timedelta64(1, 'h')
+    follows = np.zeros(len(rain), dtype=bool)
+    follows[1:] = rain[1:] & rain[:-1] & (dates[1:] - dates[:-1] <= hour)
+    starts = np.flatnonzero(rain & ~follows)
+    ends = np.flatnonzero(rain & np.append(~follows[1:], True))
+    return [(pd.Timestamp(dates[s]).to_pydatetime(), pd.Timestamp(dates[e] + hour).to_pydatetime()) for s, e in zip(starts, ends)]
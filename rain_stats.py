@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Rolling statistics of the hourly weather history, so that rain alerts carry a probability instead of a yes or no.
+# RainStats keeps counts of rainy hours and observed hours by weekday x hour and by month, and a histogram of the temperatures of every month (TEMP_STEP degree bins). Every hour of history is added once (add()). Only the last WINDOW_DAYS days are counted: each day keeps its own rain flags and temperature bins, and when it falls out of the window they are subtracted again, so the statistics follow the climate of the last year without being rebuilt.
+# The probability of rain at a given time is the frequency of rain on that weekday and hour, blended with the frequency of the month with PRIOR pseudo-observations, so that sparse weekday x hour cells lean on the month. The confidence is the share of the estimate that comes from observations of the weekday and hour.
+# The statistics are saved to rain_stats.npz together with the byte offset of WeeklyWeather.csv read so far and the identity of the file: its inode and a hash of its header and of the last row read. update_from_csv() only parses the rows appended to the file since then, up to the current time - rows further ahead are forecasts, not history. The full history is only read again when the file has been rewritten - replaced by another file, or its header or the row at the offset changed, whatever its new size:
+#     python rain_stats.py
+
+# In[1]:
+
+
+# Importing libraries
+import calendar
+import csv
+import datetime
+import hashlib
+import io
+import os
+from collections import deque
+
+import numpy as np
+
+
+# In[2]:
+
+
+STATS_PATH = 'rain_stats.npz'
+WEATHER_PATH = 'WeeklyWeather.csv'
+WINDOW_DAYS = 365
+# Observations of the month frequency blended into every weekday x hour frequency
+PRIOR = 8.0
+TEMP_MIN, TEMP_MAX, TEMP_STEP = -30.0, 50.0, 0.5
+N_BINS = int((TEMP_MAX - TEMP_MIN) / TEMP_STEP) + 1
+
+
+def _temp_bin(temp):
+    return int(np.clip(round((temp - TEMP_MIN) / TEMP_STEP), 0, N_BINS - 1))
+
+
+class RainStats:
+    def __init__(self, window_days=WINDOW_DAYS):
+        self.window_days = window_days
+        self.rain_wh = np.zeros((7, 24), dtype=np.int64)
+        self.seen_wh = np.zeros((7, 24), dtype=np.int64)
+        self.rain_month = np.zeros(12, dtype=np.int64)
+        self.seen_month = np.zeros(12, dtype=np.int64)
+        self.temp_month = np.zeros((12, N_BINS), dtype=np.int64)
+        # Days in the window, oldest first: [ordinal, rain flags (24), temperature bins (24, -1 when not observed)]
+        self.days = deque()
+        self.last = None        # last hour added
+        self.offset = 0         # bytes of the weather file read so far
+        self.inode = None       # identity of the weather file: its inode, and the hash of its header and of the last row read
+        self.tail_len = 0       # bytes of the last row read
+        self.tail = None
+
+    def _count(self, ordinal, hour, rain, temp_bin, sign):
+        day = datetime.date.fromordinal(ordinal)
+        w, m = day.weekday(), day.month - 1
+        self.rain_wh[w, hour] += sign * rain
+        self.seen_wh[w, hour] += sign
+        self.rain_month[m] += sign * rain
+        self.seen_month[m] += sign
+        self.temp_month[m, temp_bin] += sign
+
+    # One hour of history; hours already counted are skipped
+    def add(self, when, weather, temp):
+        when = when.replace(minute=0, second=0, microsecond=0)
+        if self.last is not None and when <= self.last:
+            return False
+        ordinal, hour = when.toordinal(), when.hour
+        rain = int('rain' in str(weather).lower())
+        temp_bin = _temp_bin(float(temp))
+        if not self.days or self.days[-1][0] != ordinal:
+            self.days.append([ordinal, np.zeros(24, dtype=np.int8), np.full(24, -1, dtype=np.int16)])
+        day = self.days[-1]
+        day[1][hour] = rain
+        day[2][hour] = temp_bin
+        self._count(ordinal, hour, rain, temp_bin, 1)
+        self.last = when
+        # Days that left the window are subtracted again
+        while self.days and self.days[0][0] <= ordinal - self.window_days:
+            old, rains, bins = self.days.popleft()
+            for h in np.flatnonzero(bins >= 0):
+                self._count(old, int(h), int(rains[h]), int(bins[h]), -1)
+        return True
+
+    # Hash of the header line and of the last row read, which ends at the offset
+    def _digest(self, f, header_line):
+        f.seek(max(self.offset - self.tail_len, 0))
+        return hashlib.sha256(header_line + f.read(self.tail_len)).hexdigest()
+
+    # Reads the rows appended to the weather file since the last call, up to `until` (default now)
+    def update_from_csv(self, path=WEATHER_PATH, until=None):
+        until = until or datetime.datetime.now()
+        added = 0
+        with open(path, 'rb') as f:
+            inode = os.fstat(f.fileno()).st_ino
+            header_line = f.readline()
+            if self.offset and (inode != self.inode or self._digest(f, header_line) != self.tail):
+                # The file was rewritten - start again from its first row
+                self.__init__(self.window_days)
+            self.inode = inode
+            header = header_line.decode('utf-8-sig').strip().split(',')
+            if self.offset < len(header_line):
+                self.offset = len(header_line)
+            f.seek(self.offset)
+            while True:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    break   # the last row may still be being written
+                row = dict(zip(header, next(csv.reader(io.StringIO(line.decode('utf-8'))))))
+                when = datetime.datetime.fromisoformat(_iso(row['Date']))
+                if when > until:
+                    break
+                added += self.add(when, row['Weather'], row['Temp'])
+                self.offset = f.tell()
+                self.tail_len = len(line)
+            self.tail = self._digest(f, header_line)
+        return added
+
+    # Probability of rain at a time, and the confidence of the estimate
+    def probability(self, when):
+        w, h, m = when.weekday(), when.hour, when.month - 1
+        p_month = (self.rain_month[m] + 1) / (self.seen_month[m] + 2)
+        seen = self.seen_wh[w, h]
+        p = (self.rain_wh[w, h] + PRIOR * p_month) / (seen + PRIOR)
+        return {'probability': round(float(p), 3), 'confidence': round(float(seen / (seen + PRIOR)), 3), 'observations': int(seen)}
+
+    # Probability of a period of rain: that of its likeliest hour
+    def window_probability(self, start, end):
+        hours = [start + datetime.timedelta(hours=i) for i in range(max(1, int((end - start).total_seconds() // 3600)))]
+        return max((self.probability(when) for when in hours), key=lambda stats: stats['probability'])
+
+    # Probability of rain on the next day with that name ('Monday', ...)
+    def day_probability(self, weekday, today=None):
+        today = today or datetime.date.today()
+        days = (list(calendar.day_name).index(weekday.capitalize()) - today.weekday()) % 7
+        start = datetime.datetime.combine(today + datetime.timedelta(days=days), datetime.time())
+        return self.window_probability(start, start + datetime.timedelta(days=1))
+
+    def temperature_percentiles(self, month, q=(10, 50, 90)):
+        counts = self.temp_month[month - 1]
+        if counts.sum() == 0:
+            return [None] * len(q)
+        cumulative = np.cumsum(counts) / counts.sum()
+        return [TEMP_MIN + TEMP_STEP * int(np.searchsorted(cumulative, p / 100)) for p in q]
+
+    def save(self, path=STATS_PATH):
+        days = np.array([d[0] for d in self.days], dtype=np.int64)
+        rains = np.array([d[1] for d in self.days], dtype=np.int8).reshape(-1, 24)
+        bins = np.array([d[2] for d in self.days], dtype=np.int16).reshape(-1, 24)
+        tmp = path + '.tmp.npz'
+        np.savez(tmp, rain_wh=self.rain_wh, seen_wh=self.seen_wh, rain_month=self.rain_month, seen_month=self.seen_month,
+                 temp_month=self.temp_month, days=days, rains=rains, bins=bins, window_days=self.window_days, offset=self.offset,
+                 inode=self.inode or 0, tail_len=self.tail_len, tail=np.array(self.tail or ''), last=np.array('' if self.last is None else self.last.isoformat()))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=STATS_PATH):
+        with np.load(path) as data:
+            stats = cls(int(data['window_days']))
+            for name in ['rain_wh', 'seen_wh', 'rain_month', 'seen_month', 'temp_month']:
+                setattr(stats, name, data[name].copy())
+            stats.days = deque([int(d), r.copy(), b.copy()] for d, r, b in zip(data['days'], data['rains'], data['bins']))
+            stats.offset = int(data['offset'])
+            # Statistics saved without the identity of the file are read again from its first row
+            if 'tail' in data.files:
+                stats.inode, stats.tail_len, stats.tail = int(data['inode']), int(data['tail_len']), str(data['tail'])
+            last = str(data['last'])
+            stats.last = datetime.datetime.fromisoformat(last) if last else None
+        return stats
+
+
+# Dates of the weather file are written without a leading zero on the hour ('2022-06-26 0:00')
+def _iso(date):
+    day, _, time = date.strip().partition(' ')
+    hour, _, minute = time.partition(':')
+    return '%s %02d:%s' % (day, int(hour or 0), minute or '00')
+
+
+# The saved statistics, brought up to date with the rows appended to the weather file
+def load_rain_stats(path=STATS_PATH, weather_path=WEATHER_PATH, save=True):
+    stats = RainStats.load(path) if os.path.exists(path) else RainStats()
+    if os.path.exists(weather_path) and stats.update_from_csv(weather_path) and save:
+        stats.save(path)
+    return stats
+
+
+if __name__ == '__main__':
+    stats = load_rain_stats()
+    print('%d days of history up to %s' % (len(stats.days), stats.last))
+    for month in range(1, 13):
+        if stats.seen_month[month - 1]:
+            print('%-9s rain %4.1f%% of hours, temperature p10/p50/p90 %s' % (
+                calendar.month_name[month], 100 * stats.rain_month[month - 1] / stats.seen_month[month - 1],
+                '/'.join('%.1f' % t for t in stats.temperature_percentiles(month))))
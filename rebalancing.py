@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Offline fleet rebalancing ahead of the rain.
+# For every upcoming period of rain (rain_alert_fn.rain_windows, those that end after now - upcoming_windows) the expected demand of every cluster (cluster_label) is the number of travellers in the cluster, per fuel preference, times RAIN_UPTAKE. When the travellers carry a Time_of_Day, only the travellers seen during the hours of the window are counted. Without it, every traveller counts in every window, so the demand - and the moves - are the same for every window.
+# The supply is the idle vehicles of the cluster with a matching fuel type.
+# Clusters with more vehicles than demand send their surplus to clusters short of vehicles. The moves between clusters minimise the total distance between the cluster centres: a transportation problem solved with successive shortest paths (min_cost_transport). Every shortest path is a dense Dijkstra over the clusters with reduced costs, vectorized with numpy, so a plan for thousands of vehicles and hundreds of clusters takes seconds.
+# The surplus vehicles closest to the destination are the ones moved. The plan is written to rebalancing_plan.csv, one row per suggested move:
+#     python rebalancing.py
+#     python rebalancing.py --now 2022-06-27T08:00     # plan the windows of the weather file that end after that time
+
+# In[1]:
+
+
+# Importing libraries
+import argparse
+import datetime
+
+import numpy as np
+import pandas as pd
+
+from road_routing import haversine_m
+
+
+# In[2]:
+
+
+REBALANCING_PLAN_PATH = 'rebalancing_plan.csv'
+# Share of the travellers of a cluster expected to need a vehicle when it rains
+RAIN_UPTAKE = 1.0
+# Fuel preference of the travellers -> fuel types of the vehicles that serve them
+FUEL_GROUPS = {'electric': ['electric'], 'petrol/diesel': ['petrol', 'diesel']}
+
+
+# Mean location of the vehicles and travellers of every cluster - (labels, lat, lon)
+def cluster_centres(veh_, travellers):
+    points = pd.concat([
+        pd.DataFrame({'cluster_label': veh_['cluster_label'], 'lat': veh_['lat'], 'lon': veh_['lon']}),
+        pd.DataFrame({'cluster_label': travellers['cluster_label'], 'lat': travellers['person_y'], 'lon': travellers['person_x']}),
+    ])
+    centres = points.groupby('cluster_label')[['lat', 'lon']].mean()
+    return centres.index.to_numpy(), centres['lat'].to_numpy(), centres['lon'].to_numpy()
+
+
+def expected_demand(travellers, labels, fuel_preference, window=None, uptake=RAIN_UPTAKE):
+    travellers = travellers.loc[travellers['fuel_preference'] == fuel_preference]
+    if window is not None and 'Time_of_Day' in travellers:
+        hours = pd.date_range(window[0], window[1], freq='h', inclusive='left').hour
+        travellers = travellers.loc[pd.to_datetime(travellers['Time_of_Day']).dt.hour.isin(hours)]
+        travellers = travellers.reset_index().drop_duplicates('person_id')
+    counts = travellers['cluster_label'].value_counts().reindex(labels, fill_value=0).to_numpy()
+    return np.ceil(counts * uptake).astype(np.int64)
+
+
+def idle_supply(veh_, labels, fuel_types):
+    veh_ = veh_.loc[veh_['fuel_type'].isin(fuel_types)]
+    if 'idle' in veh_:
+        veh_ = veh_.loc[veh_['idle'].astype(bool)]
+    return veh_, veh_['cluster_label'].value_counts().reindex(labels, fill_value=0).to_numpy().astype(np.int64)
+
+
+# In[3]:
+
+
+# Minimum cost transportation of supply (S,) to demand (D,) with cost (S, D) per unit; returns the flow (S, D).
+# Successive shortest paths: every round runs Dijkstra on the residual graph - forward arcs source -> sink, and reverse arcs sink -> source where flow was sent - with costs reduced by the node potentials, so that they stay non-negative, and sends as much as the path allows.
+def min_cost_transport(supply, demand, cost):
+    supply = np.asarray(supply, dtype=np.int64).copy()
+    demand = np.asarray(demand, dtype=np.int64).copy()
+    cost = np.asarray(cost, dtype=np.float64)
+    n_src, n_dst = cost.shape
+    flow = np.zeros((n_src, n_dst), dtype=np.int64)
+    pot_src = np.zeros(n_src)
+    pot_dst = np.zeros(n_dst)
+    while supply.sum() > 0 and demand.sum() > 0:
+        dist_src = np.where(supply > 0, 0.0, np.inf)
+        dist_dst = np.full(n_dst, np.inf)
+        prev_src = np.full(n_src, -1)   # sink the source was reached from, over a reverse arc
+        prev_dst = np.full(n_dst, -1)   # source the sink was reached from
+        done_src = np.zeros(n_src, dtype=bool)
+        done_dst = np.zeros(n_dst, dtype=bool)
+        target = -1
+        while True:
+            open_src = np.where(done_src, np.inf, dist_src)
+            open_dst = np.where(done_dst, np.inf, dist_dst)
+            i = int(np.argmin(open_src))
+            j = int(np.argmin(open_dst))
+            if open_src[i] <= open_dst[j]:
+                if np.isinf(open_src[i]):
+                    break
+                done_src[i] = True
+                reach = dist_src[i] + cost[i] + pot_src[i] - pot_dst
+                better = (reach < dist_dst) & ~done_dst
+                dist_dst[better] = reach[better]
+                prev_dst[better] = i
+            else:
+                if np.isinf(open_dst[j]):
+                    break
+                done_dst[j] = True
+                if demand[j] > 0:
+                    target = j
+                    break
+                reach = dist_dst[j] - cost[:, j] + pot_dst[j] - pot_src
+                better = (flow[:, j] > 0) & (reach < dist_src) & ~done_src
+                dist_src[better] = reach[better]
+                prev_src[better] = j
+        if target < 0:
+            break
+        # Potentials of the settled nodes move by their distance, the others by the distance of the target
+        pot_src += np.minimum(dist_src, dist_dst[target])
+        pot_dst += np.minimum(dist_dst, dist_dst[target])
+        forward, backward = [], []
+        j = target
+        while True:
+            i = prev_dst[j]
+            forward.append((i, j))
+            if prev_src[i] < 0:
+                break
+            j = prev_src[i]
+            backward.append((i, j))
+        amount = min(supply[i], demand[target], min((flow[b] for b in backward), default=supply[i]))
+        for arc in forward:
+            flow[arc] += amount
+        for arc in backward:
+            flow[arc] -= amount
+        supply[i] -= amount
+        demand[target] -= amount
+    return flow
+
+
+# In[4]:
+
+
+# Suggested moves of one fuel group, for one window
+def plan_moves(veh_, travellers, fuel_preference, window=None, uptake=RAIN_UPTAKE):
+    labels, lat, lon = cluster_centres(veh_, travellers)
+    demand = expected_demand(travellers, labels, fuel_preference, window, uptake)
+    vehicles, supply = idle_supply(veh_, labels, FUEL_GROUPS[fuel_preference])
+    surplus = np.maximum(supply - demand, 0)
+    deficit = np.maximum(demand - supply, 0)
+    src = np.flatnonzero(surplus)
+    dst = np.flatnonzero(deficit)
+    moves = []
+    if len(src) == 0 or len(dst) == 0:
+        return moves
+    cost = haversine_m(lat[src][:, None], lon[src][:, None], lat[dst][None, :], lon[dst][None, :])
+    flow = min_cost_transport(surplus[src], deficit[dst], cost)
+    by_cluster = {label: grp for label, grp in vehicles.groupby('cluster_label')}
+    for a, b in zip(*np.nonzero(flow)):
+        from_label, to_label = labels[src[a]], labels[dst[b]]
+        grp = by_cluster[from_label]
+        dist = haversine_m(grp['lat'].to_numpy(), grp['lon'].to_numpy(), lat[dst[b]], lon[dst[b]])
+        picked = np.argsort(dist, kind='stable')[:flow[a, b]]
+        for k in picked:
+            row = grp.iloc[k]
+            moves.append((row['vehicle_id'], row['fuel_type'], from_label, to_label, row['lat'], row['lon'],
+                          lat[dst[b]], lon[dst[b]], dist[k]))
+        by_cluster[from_label] = grp.drop(grp.index[picked])
+    return moves
+
+
+# Windows that have not ended yet at now (default the current time) - past periods of rain need no vehicles
+def upcoming_windows(windows, now=None):
+    now = now or datetime.datetime.now()
+    return [(start, end) for start, end in windows if end > now]
+
+
+def rebalancing_plan(veh_, travellers, windows, uptake=RAIN_UPTAKE, now=None):
+    rows = []
+    for start, end in upcoming_windows(windows, now):
+        for fuel_preference in FUEL_GROUPS:
+            for move in plan_moves(veh_, travellers, fuel_preference, (start, end), uptake):
+                rows.append((start, end, fuel_preference) + move)
+    return pd.DataFrame(rows, columns=['window_start', 'window_end', 'fuel_preference', 'vehicle_id', 'fuel_type', 'from_cluster',
+                                       'to_cluster', 'lat', 'lon', 'to_lat', 'to_lon', 'distance_m'])
+
+
+if __name__ == '__main__':
+    from rain_alert_fn import rain_windows
+    parser = argparse.ArgumentParser(description='Suggest vehicle moves ahead of the upcoming periods of rain')
+    parser.add_argument('--now', type=datetime.datetime.fromisoformat, default=None, help='time the windows must end after (default now)')
+    args = parser.parse_args()
+    plan = rebalancing_plan(pd.read_csv('veh_.csv', index_col=0), pd.read_csv('pedestrian_preference.csv', index_col=0), rain_windows(),
+                            now=args.now)
+    plan.to_csv(REBALANCING_PLAN_PATH, index=False)
+    print('%d moves over %d rain windows, %.1f km in total' % (len(plan), plan['window_start'].nunique(), plan['distance_m'].sum() / 1000))
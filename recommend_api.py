@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# JSON recommendation API for partner apps, without the Dash pages:
+#     POST /api/recommend {"lat": 43.75, "lon": 7.43, "fuel_preference": "electric", "k": 3}
+#     -> {"vehicles": [{"vehicle_id": ..., "driver_name": ..., "phnum": ..., "vehicle_type": ..., "fuel_type": ..., "lat": ..., "lon": ..., "dist": ...}, ...]}
+# fuel_preference is a traveller preference ('electric', 'petrol/diesel') or a list of fuel types; without it every vehicle is considered.
+# Every vehicle within a radius, closest first, is answered by the range query of the vehicle index (VehicleIndex.within), without batching:
+#     POST /api/within {"lat": 43.75, "lon": 7.43, "radius": 500, "fuel_preference": "electric", "limit": 20}
+#     -> {"vehicles": [...]} - the same fields; radius is in meters, up to MAX_RADIUS, and limit (default and at most MAX_LIMIT) caps the number of vehicles
+# With a travel_mode ("ebike", "walk", ...), the vehicles of every mode offered to it (multimodal.py) are ranked together instead of the fleet alone, and every vehicle carries its mode and score.
+# Requests are micro-batched. Every request thread hands its query to an asyncio event loop running in a background thread (MicroBatcher). The loop waits WINDOW seconds after the first query of a batch, takes every query that arrived meanwhile (up to MAX_BATCH), and answers them with one vectorized nearest neighbour call over the fleet (FleetArrays.nearest), in a worker thread. Queries arriving while a batch is computed make up the next one, so under bursts the cost of a query falls to a share of one numpy call instead of one search each.
+# The batch is answered by k-d trees (scipy, pinned in requirements.txt) over the positions of the fleet projected to meters, one per fuel group, queried for all the points of the batch at once. The few closest candidates of every query are ranked again by the distance of the vehicle index (haversine, or planar meters with DISTANCE_METRIC=planar).
+# The positions are taken from the live vehicle index (vehicle_index.py). The trees are rebuilt when the index has changed, at most once every REFRESH seconds while the fleet keeps moving, so positions lag the feed by at most REFRESH seconds; the returned positions are the current ones.
+
+# In[1]:
+
+
+# Importing libraries
+import asyncio
+import itertools
+import math
+import numbers
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from flask import abort, jsonify, request
+
+from vehicle_index import M_PER_DEG
+
+
+# In[2]:
+
+
+# Seconds a batch stays open after its first query
+WINDOW = 0.002
+MAX_BATCH = 256
+# Candidates taken from the planar tree beyond k, ranked again by the distance of the index
+EXTRA = 4
+# Seconds between two rebuilds of the trees while the fleet keeps moving
+REFRESH = 1.0
+# Seconds a request waits for its batch
+TIMEOUT = 10.0
+FUEL_PREFERENCES = {'electric': ['electric'], 'petrol/diesel': ['petrol', 'diesel']}
+# Widest radius in meters, and most vehicles, of /api/within
+MAX_RADIUS = 10000.0
+MAX_LIMIT = 100
+COLUMNS = ['vehicle_id', 'driver_name', 'phnum', 'vehicle_type', 'fuel_type']
+
+
+class FleetArrays:
+    def __init__(self, index, refresh=REFRESH):
+        self.index = index
+        self.refresh = refresh
+        self.version = None
+        self.built = -math.inf
+        self._x_scale = M_PER_DEG * math.cos(math.radians(index.ref_lat))
+        self._lock = threading.Lock()
+
+    def _project(self, lat, lon):
+        return np.column_stack([np.asarray(lon) * self._x_scale, np.asarray(lat) * M_PER_DEG])
+
+    def _refresh(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.version != self.index.version and now - self.built >= self.refresh:
+                self.ids, self.lat, self.lon, self.fuels, self.version = self.index.arrays()
+                self.built = now
+                self._trees = {}
+            return self.ids, self.lat, self.lon, self.fuels, self._trees
+
+    # k closest vehicles for every query (lat, lon, fuel types or None), as lists of (distance in meters, vehicle_id), closest first
+    def nearest(self, queries, k=3):
+        from scipy.spatial import cKDTree
+        ids, lat, lon, fuels, trees = self._refresh()
+        results = [None] * len(queries)
+        groups = {}
+        for i, (_, _, fuel_types) in enumerate(queries):
+            groups.setdefault(None if fuel_types is None else tuple(sorted(fuel_types)), []).append(i)
+        for group, rows in groups.items():
+            if group not in trees:
+                members = np.flatnonzero(np.isin(fuels, group)) if group is not None else np.arange(len(ids))
+                trees[group] = (members, cKDTree(self._project(lat[members], lon[members])) if len(members) else None)
+            members, tree = trees[group]
+            kk = min(k + EXTRA, len(members))
+            if kk == 0:
+                for i in rows:
+                    results[i] = []
+                continue
+            q_lat = np.array([queries[i][0] for i in rows])
+            q_lon = np.array([queries[i][1] for i in rows])
+            _, found = tree.query(self._project(q_lat, q_lon), k=kk, workers=-1)
+            found = members[np.asarray(found).reshape(len(rows), kk)]
+            # Planar candidates ranked again by the distance of the index (haversine unless DISTANCE_METRIC=planar)
+            dist = self.index.distance(q_lat[:, None], q_lon[:, None], lat[found], lon[found])
+            order = np.argsort(dist, axis=1, kind='stable')[:, :k]
+            best = np.take_along_axis(found, order, axis=1)
+            best_dist = np.take_along_axis(dist, order, axis=1)
+            for row, i in enumerate(rows):
+                results[i] = list(zip(best_dist[row].tolist(), ids[best[row]].tolist()))
+        return results
+
+
+# In[3]:
+
+
+# Coalesces the queries of concurrent requests into batches for fn(list of queries) -> list of results
+# A result that is an exception fails only the request of that query; an exception raised by fn fails the whole batch
+class MicroBatcher:
+    def __init__(self, fn, window=WINDOW, max_batch=MAX_BATCH):
+        self.fn = fn
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.queries = 0
+        self.loop = asyncio.new_event_loop()
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix='recommend-batch')
+        threading.Thread(target=self.loop.run_forever, name='recommend-batcher', daemon=True).start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    async def _start(self):
+        self._queue = asyncio.Queue()
+        self.loop.create_task(self._collect())
+
+    async def submit(self, query):
+        future = self.loop.create_future()
+        await self._queue.put((query, future))
+        return await future
+
+    # Called from the request threads
+    def __call__(self, query, timeout=TIMEOUT):
+        return asyncio.run_coroutine_threadsafe(self.submit(query), self.loop).result(timeout)
+
+    async def _collect(self):
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(self.window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                results = await self.loop.run_in_executor(self._executor, self.fn, [query for query, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.queries += len(batch)
+            for (_, future), result in zip(batch, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+class Recommender:
+    def __init__(self, veh_, index, window=WINDOW, max_batch=MAX_BATCH):
+        columns = [c for c in COLUMNS if c in veh_]
+        self.records = {record['vehicle_id']: record for record in veh_[columns].to_dict('records')}
+        self.index = index
+        self.fleet = FleetArrays(index)
+        self.batcher = MicroBatcher(self._batch, window, max_batch)
+
+    def _batch(self, queries):
+        by_k = {}
+        for i, (lat, lon, fuel_types, k) in enumerate(queries):
+            by_k.setdefault(k, []).append(i)
+        results = [None] * len(queries)
+        for k, rows in by_k.items():
+            try:
+                found = self.fleet.nearest([queries[i][:3] for i in rows], k)
+            except Exception:
+                # One query at a time, so that a bad query only fails its own request
+                found = []
+                for i in rows:
+                    try:
+                        found.append(self.fleet.nearest([queries[i][:3]], k)[0])
+                    except Exception as e:
+                        found.append(e)
+            for i, result in zip(rows, found):
+                results[i] = result
+        return results
+
+    def recommend(self, lat, lon, fuel_types=None, k=3):
+        return self._vehicles(self.batcher((lat, lon, fuel_types, k)))
+
+    # Every vehicle within radius meters, closest first, at most limit of them
+    def within(self, lat, lon, radius, fuel_types=None, limit=MAX_LIMIT):
+        return self._vehicles(list(itertools.islice(self.index.within(lat, lon, radius, fuel_types), limit)))
+
+    def _vehicles(self, found):
+        vehicles = []
+        for dist, vehicle_id in found:
+            record = dict(self.records.get(vehicle_id, {'vehicle_id': vehicle_id}))
+            try:
+                record['lat'], record['lon'] = self.index.position(vehicle_id)[:2]
+            except KeyError:  # departed since the batch
+                continue
+            record['dist'] = dist
+            vehicles.append(record)
+        return vehicles
+
+
+# Numbers only - no strings such as "nan", and no booleans
+def _real(value):
+    return isinstance(value, numbers.Real) and not isinstance(value, bool) and math.isfinite(value)
+
+
+# Position and fuel types of a JSON query - 400 when they are missing or not valid
+def _position_query():
+    query = request.get_json(silent=True) or {}
+    try:
+        lat, lon = query['lat'], query['lon']
+    except (KeyError, TypeError, AttributeError):
+        abort(400)
+    if not _real(lat) or not _real(lon):
+        abort(400)
+    fuel_types = query.get('fuel_preference')
+    if isinstance(fuel_types, str):
+        fuel_types = FUEL_PREFERENCES.get(fuel_types, [fuel_types])
+    elif fuel_types is not None and not (isinstance(fuel_types, list) and all(isinstance(f, str) for f in fuel_types)):
+        abort(400)
+    return query, float(lat), float(lon), fuel_types
+
+
+# Answer of the /api/recommend route of app.py
+def recommend_view(recommender, multimodal=None):
+    query, lat, lon, fuel_types = _position_query()
+    k = query.get('k', 3)
+    if not isinstance(k, int) or isinstance(k, bool) or not 0 < k <= 100:
+        abort(400)
+    travel_mode = query.get('travel_mode')
+    if travel_mode is not None and multimodal is not None:
+        return jsonify(vehicles=multimodal.recommend(lat, lon, str(travel_mode), k, fuel_types))
+    return jsonify(vehicles=recommender.recommend(lat, lon, fuel_types, k))
+
+
+# Answer of the /api/within route of app.py
+def within_view(recommender):
+    query, lat, lon, fuel_types = _position_query()
+    radius, limit = query.get('radius'), query.get('limit', MAX_LIMIT)
+    if not _real(radius) or not 0 < radius <= MAX_RADIUS:
+        abort(400)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 0 < limit <= MAX_LIMIT:
+        abort(400)
+    return jsonify(vehicles=recommender.within(lat, lon, float(radius), fuel_types, limit))
@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Cache of the closest vehicles for travellers requesting rides from the same place, in front of the live vehicle index (vehicle_index.py).
+# Entries are keyed on a grid cell of the traveller (cell_size meters, about 100 m by default), the fuel types, k and the forecast version, so that a new forecast never serves results of the previous one. The cache is bounded: the least recently used entry is dropped beyond maxsize entries, and entries expire ttl seconds after they were computed.
+# An entry holds the candidates of its cell rather than one answer: every vehicle within d + 2h of the centre of the cell, where d is the distance of the k-th closest vehicle to the centre and h the half diagonal of the cell. By the triangle inequality the k closest vehicles of any point of the cell are among them, so a hit only measures the distances to a handful of candidates and still returns the exact k closest.
+# Entries are invalidated through two reverse indexes, so a change of the fleet only drops the entries it affects: vehicle -> entries it is a candidate of (a vehicle that moves away, departs or is booked), and index cell -> entries whose circle covers the cell (a vehicle that moves or arrives into the circle of an entry).
+# on_update() is registered as a listener of the fleet feed (fleet_feed.py) and runs while the feed holds the index lock, so an entry is never computed from a fleet that is half updated.
+
+# In[1]:
+
+
+# Importing libraries
+import math
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from vehicle_index import M_PER_DEG
+
+
+# In[2]:
+
+
+CELL_SIZE = 100.0
+MAXSIZE = 10000
+# Seconds an entry is served for
+TTL = 60.0
+# Slack on the half diagonal of a cell - the grid is equirectangular, the distances haversine
+SLACK = 1.01
+
+
+class RecommendationCache:
+    def __init__(self, index, cell_size=CELL_SIZE, maxsize=MAXSIZE, ttl=TTL, version=None):
+        self.index = index
+        self.cell_size = cell_size
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version
+        self._x_scale = M_PER_DEG * math.cos(math.radians(index.ref_lat)) / cell_size
+        self._y_scale = M_PER_DEG / cell_size
+        self._half_diagonal = cell_size * math.sqrt(2) / 2 * SLACK
+        self._entries = OrderedDict()           # key -> (expires, ids, lats, lons, covered cells, vehicles)
+        self._by_vehicle = defaultdict(set)     # vehicle_id -> keys
+        self._by_cell = defaultdict(set)        # index cell (cx, cy) -> keys; None for entries covering every cell
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _key(self, lat, lon, fuel_types, k, version):
+        fuels = None if fuel_types is None else tuple(sorted(fuel_types))
+        return (int(math.floor(lon * self._x_scale)), int(math.floor(lat * self._y_scale)), fuels, k, version)
+
+    def _centre(self, key):
+        return (key[1] + 0.5) / self._y_scale, (key[0] + 0.5) / self._x_scale
+
+    # k closest vehicles of the given fuel types, as a list of (distance in meters, vehicle_id), closest first - like VehicleIndex.nearest()
+    def nearest(self, lat, lon, k=3, fuel_types=None, version=None):
+        key = self._key(lat, lon, fuel_types, k, self.version if version is None else version)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if entry is None:
+            with self.index.lock:
+                entry = self._compute(key, fuel_types, k, now)
+                with self._lock:
+                    self.misses += 1
+                    self._insert(key, entry)
+        _, ids, lats, lons = entry[:4]
+        if len(ids) == 0:
+            return []
+        dist = self.index.distance(lat, lon, lats, lons)
+        order = np.argsort(dist, kind='stable')[:k]
+        return [(float(dist[i]), ids[i]) for i in order]
+
+    def _compute(self, key, fuel_types, k, now):
+        lat, lon = self._centre(key)
+        found = self.index.nearest(lat, lon, k, fuel_types)
+        if len(found) < k:
+            # Fewer vehicles than k - every vehicle is a candidate and any arrival invalidates the entry
+            candidates, cells = found, None
+        else:
+            radius = found[-1][0] + 2 * self._half_diagonal
+            candidates = list(self.index.within(lat, lon, radius, fuel_types))
+            cells = self._covered(lat, lon, radius)
+        ids = [vehicle_id for _, vehicle_id in candidates]
+        positions = np.array([self.index.position(v)[:2] for v in ids], dtype=np.float64).reshape(-1, 2)
+        return now + self.ttl, ids, positions[:, 0], positions[:, 1], cells
+
+    # Index cells overlapping the bounding box of the circle
+    def _covered(self, lat, lon, radius):
+        dlat = radius / M_PER_DEG
+        dlon = radius / (M_PER_DEG * math.cos(math.radians(lat)))
+        x0, y0 = self.index.cell(lat - dlat, lon - dlon)
+        x1, y1 = self.index.cell(lat + dlat, lon + dlon)
+        return [(x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+    def _insert(self, key, entry):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = entry
+        for vehicle_id in entry[1]:
+            self._by_vehicle[vehicle_id].add(key)
+        for cell in entry[4] if entry[4] is not None else [None]:
+            self._by_cell[cell].add(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for vehicle_id in entry[1]:
+            keys = self._by_vehicle.get(vehicle_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_vehicle[vehicle_id]
+        for cell in entry[4] if entry[4] is not None else [None]:
+            keys = self._by_cell.get(cell)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_cell[cell]
+
+    # Drops the entries a vehicle is a candidate of, and those whose circle covers its new position (lat, lon)
+    def invalidate(self, vehicle_id, lat=None, lon=None):
+        with self._lock:
+            keys = set(self._by_vehicle.get(vehicle_id, ()))
+            keys |= self._by_cell.get(None, set())
+            if lat is not None:
+                keys |= self._by_cell.get(self.index.cell(lat, lon), set())
+            for key in keys:
+                self._drop(key)
+            self.invalidated += len(keys)
+        return len(keys)
+
+    # Listener of the fleet feed, called with every update applied to the index
+    def on_update(self, update):
+        if update.get('op', 'move') == 'depart':
+            self.invalidate(update['vehicle_id'])
+        else:
+            self.invalidate(update['vehicle_id'], float(update['lat']), float(update['lon']))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_vehicle.clear()
+            self._by_cell.clear()
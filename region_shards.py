@@ -0,0 +1,393 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Regions served by their own shard processes, for deployments over more than one city or scenario.
+# Regions are declared in regions.json: a name, the URL of the shard, and either a bounding box [lat_min, lon_min, lat_max, lon_max] or the cluster labels it covers (its box is then the extent of its vehicles and travellers). A region may name its own vehicles, travellers and weather files; they default to the files of the repository.
+#     {"monaco": {"url": "http://127.0.0.1:8101", "bbox": [43.72, 7.40, 43.77, 7.46]},
+#      "nice":   {"url": "http://127.0.0.1:8102", "bbox": [43.65, 7.20, 43.73, 7.30], "vehicles": "nice/veh_.csv", "weather": "nice/WeeklyWeather.csv"}}
+# A shard loads only the vehicles, excluded vehicles and travellers of its region into its own live vehicle index and recommendation cache, and its own forecast:
+#     python region_shards.py monaco          # one shard
+#     python region_shards.py --all           # every shard of regions.json, one process each
+# The router runs in the dashboard server when REGIONS_FILE is set. It sends every request to the shard that owns the position:
+#     POST /regions/nearest {lat, lon, k, fuel_types} - closest vehicles. When the k-th vehicle is farther than the border of the region, the regions within that distance are asked as well, in parallel, and the results merged.
+#     GET /regions/map?lat=&lon=&fuel=&name= - map of the closest vehicles, drawn by the shard
+#     GET /regions/rain_windows?lat=&lon= - periods of rain of the region
+#     POST /regions/update {updates: [...]} - fleet updates (fleet_feed.py format). A vehicle that crosses a border departs from its old shard and arrives at the new one, with its row (driver, phone number, type...) - a shard answers from the rows of the vehicles it holds now, not only those of its vehicles file.
+# Adding a city adds a shard; queries inside a region never touch the other shards.
+# Malformed bodies and positions (missing or non-finite coordinates, k outside 1-100, fuel types that are not a list of strings, no list of updates) are answered 400. Updates that fleet_feed.valid_update() refuses are skipped and counted in rejected.
+
+# In[1]:
+
+
+# Importing libraries
+import argparse
+import http.client
+import json
+import math
+import numbers
+import os
+import threading
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, Response, abort, jsonify, request
+
+
+# In[2]:
+
+
+REGIONS_PATH = 'regions.json'
+DEFAULT_FILES = {'vehicles': 'veh_.csv', 'ex_vehicles': 'ex_vehicle_.csv', 'travellers': 'pedestrian_preference.csv', 'weather': 'WeeklyWeather.csv'}
+# Dashboard fuel preference -> fuel types of the vehicles
+FUEL_GROUPS = {'electric': ['electric'], 'gas': ['petrol', 'diesel']}
+# Meters per degree of latitude
+M_PER_DEG = 111320.0
+
+
+class Region:
+    def __init__(self, name, url, bbox=None, clusters=None, **files):
+        self.name = name
+        self.url = url
+        self.bbox = None if bbox is None else tuple(float(v) for v in bbox)
+        self.clusters = None if clusters is None else [int(c) for c in clusters]
+        self.files = dict(DEFAULT_FILES, **files)
+
+    def contains(self, lat, lon):
+        lat0, lon0, lat1, lon1 = self.bbox
+        return lat0 <= lat < lat1 and lon0 <= lon < lon1
+
+    # Distance in meters from a point outside the box to the box (0 inside)
+    def distance_to(self, lat, lon):
+        lat0, lon0, lat1, lon1 = self.bbox
+        dlat = max(lat0 - lat, 0.0, lat - lat1)
+        dlon = max(lon0 - lon, 0.0, lon - lon1)
+        return math.hypot(dlat * M_PER_DEG, dlon * M_PER_DEG * math.cos(math.radians(lat)))
+
+    # Distance in meters from a point inside the box to its border
+    def border_distance(self, lat, lon):
+        lat0, lon0, lat1, lon1 = self.bbox
+        x_scale = M_PER_DEG * math.cos(math.radians(lat))
+        return min((lat - lat0) * M_PER_DEG, (lat1 - lat) * M_PER_DEG, (lon - lon0) * x_scale, (lon1 - lon) * x_scale)
+
+    # Rows of a frame that belong to the region, by cluster label or by position
+    def rows(self, df, lat_col='lat', lon_col='lon'):
+        if self.clusters is not None:
+            return df.loc[df['cluster_label'].isin(self.clusters)]
+        lat0, lon0, lat1, lon1 = self.bbox
+        return df.loc[(df[lat_col] >= lat0) & (df[lat_col] < lat1) & (df[lon_col] >= lon0) & (df[lon_col] < lon1)]
+
+
+def load_regions(path=REGIONS_PATH):
+    with open(path) as f:
+        spec = json.load(f)
+    return [Region(name, **entry) for name, entry in spec.items()]
+
+
+# lat, lon, k and fuel types of a /nearest body, or 400
+def nearest_query(query):
+    if not isinstance(query, dict):
+        abort(400)
+    lat, lon, k, fuel_types = query.get('lat'), query.get('lon'), query.get('k', 3), query.get('fuel_types')
+    if not all(isinstance(v, numbers.Real) and not isinstance(v, bool) and math.isfinite(v) for v in (lat, lon)):
+        abort(400)
+    if not isinstance(k, int) or isinstance(k, bool) or not 0 < k <= 100:
+        abort(400)
+    if fuel_types is not None and not (isinstance(fuel_types, list) and all(isinstance(f, str) for f in fuel_types)):
+        abort(400)
+    return float(lat), float(lon), k, fuel_types
+
+
+# lat and lon of the query string, or 400
+def position_args():
+    lat, lon = request.args.get('lat', type=float), request.args.get('lon', type=float)
+    if lat is None or lon is None or not math.isfinite(lat) or not math.isfinite(lon):
+        abort(400)
+    return lat, lon
+
+
+# Updates of an /update body, as (valid updates, number rejected), or 400 when there is no list of updates
+def update_body(body):
+    from fleet_feed import valid_update
+    updates = body.get('updates') if isinstance(body, dict) else None
+    if not isinstance(updates, list):
+        abort(400)
+    valid = [item for item in updates if valid_update(item)]
+    return valid, len(updates) - len(valid)
+
+
+# In[3]:
+
+
+# Shard: the vehicles, travellers and forecast of one region, served over HTTP
+def create_shard_app(region, workdir=None):
+    import tempfile
+
+    import pandas as pd
+
+    from fleet_feed import apply_update
+    from prepare_map import map_html
+    from rain_alert_fn import rain_windows
+    from recommendation_cache import RecommendationCache
+    from vehicle_index import VehicleIndex
+    from vehicle_recommendation import live_rows
+
+    veh_ = region.rows(pd.read_csv(region.files['vehicles'], index_col=0)).reset_index(drop=True)
+    ex_vehicle_ = region.rows(pd.read_csv(region.files['ex_vehicles'], index_col=0))
+    travellers = region.rows(pd.read_csv(region.files['travellers'], index_col=0), 'person_y', 'person_x')
+    windows = rain_windows(pd.read_csv(region.files['weather']))
+    if region.bbox is None:
+        lats = pd.concat([veh_['lat'], travellers['person_y']])
+        lons = pd.concat([veh_['lon'], travellers['person_x']])
+        region.bbox = (float(lats.min()), float(lons.min()), float(lats.max()) + 1e-9, float(lons.max()) + 1e-9)
+    index = VehicleIndex.from_frame(veh_)
+    cache = RecommendationCache(index)
+    # Row of every vehicle of the shard, including those handed over by other shards - vehicle_id -> row
+    records = {record['vehicle_id']: record for record in json.loads(veh_.to_json(orient='records'))}
+    columns = list(veh_.columns)
+
+    # Rows of the (distance, vehicle_id) pairs found in the index, and the distance to the farthest of them
+    def nearest_rows(lat, lon, fuel_types, k=3):
+        found = cache.nearest(lat, lon, k, fuel_types)
+        frame = pd.DataFrame([records.get(vehicle_id, {'vehicle_id': vehicle_id}) for _, vehicle_id in found], columns=columns)
+        return live_rows(frame, index, found), (found[-1][0] if found else 0.0)
+    # Every shard draws its maps in a directory of its own, every request thread to a file of its own
+    workdir = workdir or tempfile.mkdtemp(prefix='shard-%s-' % region.name)
+    os.makedirs(workdir, exist_ok=True)
+
+    app = Flask('shard-%s' % region.name)
+
+    @app.route('/health')
+    def health():
+        return jsonify(region=region.name, bbox=region.bbox, vehicles=len(index), travellers=len(travellers),
+                       cache={'entries': len(cache), 'hits': cache.hits, 'misses': cache.misses})
+
+    @app.route('/nearest', methods=['POST'])
+    def nearest():
+        lat, lon, k, fuel_types = nearest_query(request.get_json(silent=True))
+        rows, _ = nearest_rows(lat, lon, fuel_types, k)
+        return jsonify(vehicles=json.loads(rows.to_json(orient='records')))
+
+    @app.route('/map')
+    def map_():
+        lat, lon = position_args()
+        fuel = request.args.get('fuel', 'electric')
+        if fuel not in FUEL_GROUPS:
+            abort(400)
+        rows, dist = nearest_rows(lat, lon, FUEL_GROUPS[fuel])
+        path = os.path.join(workdir, 'avail_%s_veh-%d.html' % (fuel, threading.get_ident()))
+        try:
+            map_html(lat, lon, rows, fuel, request.args.get('name', ''), dist, ex_vehicle_, path)
+            with open(path) as f:
+                html = f.read()
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+        return Response(html, mimetype='text/html')
+
+    @app.route('/rain_windows')
+    def rain_windows_():
+        return jsonify(windows=[(start.isoformat(), end.isoformat()) for start, end in windows])
+
+    # Updates are applied before answering, so the router knows the fuel type and the row of the vehicles that departed
+    # An arrival may carry the row of the vehicle (record), taken from the shard it departed from
+    @app.route('/update', methods=['POST'])
+    def update():
+        updates, rejected = update_body(request.get_json(silent=True))
+        applied, departed, moved, unknown = 0, {}, {}, []
+        with index.lock:
+            for item in updates:
+                vehicle_id = item['vehicle_id']
+                if item.get('op', 'move') != 'depart' and vehicle_id not in index and item.get('fuel_type') is None:
+                    unknown.append(vehicle_id)
+                    continue
+                try:
+                    old = apply_update(index, item)
+                except (KeyError, ValueError, TypeError):
+                    unknown.append(vehicle_id)
+                    continue
+                cache.on_update(item)
+                applied += 1
+                if item.get('op') == 'depart' and old is not None:
+                    departed[vehicle_id] = old[2]
+                    if vehicle_id in records:
+                        moved[vehicle_id] = records.pop(vehicle_id)
+                elif isinstance(item.get('record'), dict):
+                    records[vehicle_id] = dict(item['record'], vehicle_id=vehicle_id)
+        return jsonify(applied=applied, departed=departed, records=moved, unknown=unknown, rejected=rejected)
+
+    return app
+
+
+def serve_shard(region, host='127.0.0.1'):
+    parts = urllib.parse.urlsplit(region.url)
+    create_shard_app(region).run(host=parts.hostname or host, port=parts.port, threaded=True)
+
+
+# In[4]:
+
+
+# Keep-alive connection per thread and shard
+class ShardClient:
+    def __init__(self, url, timeout=30):
+        parts = urllib.parse.urlsplit(url)
+        self.host, self.port, self.timeout = parts.hostname, parts.port or 80, timeout
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        headers = {'Content-Type': 'application/json'} if body is not None else {}
+        try:
+            conn.request(method, path, body=None if body is None else json.dumps(body), headers=headers)
+            response = conn.getresponse()
+            data = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            self._local.conn = None
+            raise
+        if response.status != 200:
+            raise http.client.HTTPException('%s %s: %d' % (method, path, response.status))
+        return data
+
+    def json(self, method, path, body=None):
+        return json.loads(self.request(method, path, body))
+
+
+class ShardRouter:
+    def __init__(self, regions, workers=8):
+        self.regions = {region.name: region for region in regions}
+        self.clients = {region.name: ShardClient(region.url) for region in regions}
+        self.pool = ThreadPoolExecutor(workers)
+        self._owners = {}       # vehicle_id -> region name, for vehicles that crossed a border
+        self._lock = threading.Lock()
+
+    # Regions keyed by cluster get their box from their shard
+    def _boxed(self):
+        for name, region in self.regions.items():
+            if region.bbox is None:
+                region.bbox = tuple(self.clients[name].json('GET', '/health')['bbox'])
+        return self.regions.values()
+
+    def owner(self, lat, lon):
+        regions = list(self._boxed())
+        for region in regions:
+            if region.contains(lat, lon):
+                return region
+        return min(regions, key=lambda region: region.distance_to(lat, lon))
+
+    def nearest(self, lat, lon, k=3, fuel_types=None):
+        query = {'lat': lat, 'lon': lon, 'k': k, 'fuel_types': fuel_types}
+        home = self.owner(lat, lon)
+        found = self.clients[home.name].json('POST', '/nearest', query)['vehicles']
+        reach = found[-1]['dist'] if len(found) >= k else math.inf
+        if not home.contains(lat, lon) or reach > home.border_distance(lat, lon):
+            others = [name for name, region in self.regions.items() if name != home.name and region.distance_to(lat, lon) < reach]
+            for result in self.pool.map(lambda name: self.clients[name].json('POST', '/nearest', query)['vehicles'], others):
+                found += result
+        merged = {}
+        for vehicle in sorted(found, key=lambda vehicle: vehicle['dist']):
+            merged.setdefault(vehicle['vehicle_id'], vehicle)
+        return list(merged.values())[:k]
+
+    def map(self, lat, lon, fuel, name=''):
+        query = urllib.parse.urlencode({'lat': lat, 'lon': lon, 'fuel': fuel, 'name': name})
+        return self.clients[self.owner(lat, lon).name].request('GET', '/map?' + query)
+
+    def rain_windows(self, lat, lon):
+        return self.clients[self.owner(lat, lon).name].json('GET', '/rain_windows')['windows']
+
+    def _send(self, name, updates):
+        return self.clients[name].json('POST', '/update', {'updates': updates})
+
+    def update(self, updates):
+        by_region = {}
+        crossing = []
+        with self._lock:
+            for item in updates:
+                vehicle_id = item['vehicle_id']
+                if item.get('op', 'move') == 'depart':
+                    name = self._owners.pop(vehicle_id, None)
+                    for target in [name] if name else list(self.regions):
+                        by_region.setdefault(target, []).append(item)
+                    continue
+                name = self.owner(float(item['lat']), float(item['lon'])).name
+                previous = self._owners.get(vehicle_id)
+                self._owners[vehicle_id] = name
+                if previous is not None and previous != name:
+                    crossing.append((previous, name, item))
+                else:
+                    by_region.setdefault(name, []).append(item)
+        applied = 0
+        unknown = []
+        for name, result in zip(by_region, self.pool.map(lambda name: self._send(name, by_region[name]), list(by_region))):
+            applied += result['applied']
+            # A move to a shard that does not know the vehicle yet: it crossed a border the router had not seen
+            unknown += [(name, item) for item in by_region[name] if item['vehicle_id'] in result['unknown'] and item.get('op') != 'depart']
+        for previous, name, item in crossing + [(None, name, item) for name, item in unknown]:
+            sources = [previous] if previous else [other for other in self.regions if other != name]
+            fuel_type = item.get('fuel_type')
+            record = None
+            for source in sources:
+                result = self._send(source, [{'op': 'depart', 'vehicle_id': item['vehicle_id']}])
+                fuel_type = fuel_type or result['departed'].get(item['vehicle_id'])
+                record = record or result.get('records', {}).get(item['vehicle_id'])
+            if fuel_type is not None:
+                arrival = dict(item, op='arrive', fuel_type=fuel_type)
+                if record is not None:
+                    arrival['record'] = record
+                applied += self._send(name, [arrival])['applied']
+        return applied
+
+    def health(self):
+        return {name: client.json('GET', '/health') for name, client in self.clients.items()}
+
+
+def register_region_routes(server, router, prefix='/regions'):
+    def nearest():
+        lat, lon, k, fuel_types = nearest_query(request.get_json(silent=True))
+        return jsonify(vehicles=router.nearest(lat, lon, k, fuel_types))
+
+    def map_():
+        lat, lon = position_args()
+        fuel = request.args.get('fuel', 'electric')
+        if fuel not in FUEL_GROUPS:
+            abort(400)
+        html = router.map(lat, lon, fuel, request.args.get('name', ''))
+        return Response(html, mimetype='text/html')
+
+    def rain_windows_():
+        return jsonify(windows=router.rain_windows(*position_args()))
+
+    def update():
+        updates, rejected = update_body(request.get_json(silent=True))
+        return jsonify(applied=router.update(updates), rejected=rejected)
+
+    server.add_url_rule(prefix, 'regions', lambda: jsonify(router.health()))
+    server.add_url_rule(prefix + '/nearest', 'regions_nearest', nearest, methods=['POST'])
+    server.add_url_rule(prefix + '/map', 'regions_map', map_)
+    server.add_url_rule(prefix + '/rain_windows', 'regions_rain_windows', rain_windows_)
+    server.add_url_rule(prefix + '/update', 'regions_update', update, methods=['POST'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the shards of the regions')
+    parser.add_argument('regions', nargs='*', help='regions to serve')
+    parser.add_argument('--all', action='store_true', help='serve every region, one process each')
+    parser.add_argument('--regions-file', default=REGIONS_PATH)
+    args = parser.parse_args()
+    regions = {region.name: region for region in load_regions(args.regions_file)}
+    names = list(regions) if args.all else args.regions
+    if len(names) == 1:
+        serve_shard(regions[names[0]])
+        return
+    import multiprocessing
+    processes = [multiprocessing.Process(target=serve_shard, args=(regions[name],), name='shard-%s' % name) for name in names]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# The build_graph() takes the SUMO edge geometry (Most_edges.csv) as input and converts it to a road graph. Every lane shape point becomes a graph node (points closer than about a metre are merged so that lanes meeting at a junction share a node) and every pair of consecutive shape points of a lane becomes an arc weighted by its length in meters. The graph is stored in a compact CSR (compressed sparse row) layout - indptr, indices and weights arrays - so that it is loaded once and the neighbours of a node are a single array slice.
+# The network_distances() runs Dijkstra's shortest path from the traveller's edge and stops as soon as all the requested vehicle edges are settled, or once the search goes beyond max_dist meters (MAX_DIST by default) - targets further away are reported at infinity. The search of every source node is kept on the graph - the settled nodes and the frontier - in a least recently used cache of CACHE_SIZE sources, so a repeated query for the same traveller is a dictionary lookup and a query for further vehicles resumes the search where it stopped. Once the search has covered the whole component of the source, unreachable targets are answered at infinity without searching again.
+# The load_graph() reads the edge file and builds the graph, or returns None when the file is missing or carries no edge geometry (a git-lfs pointer checked out in place of the data) - veh_rec() then keeps the straight-line ranking, as it does without a speed table.
+# The rerank_by_network() takes the nearest vehicles found by the haversine ranking and re-orders them by the road network distance to the traveller. A 'network_dist' column (meters) is added to the vehicle subset.
+
+# In[1]:
+
+
+# Importing libraries
+import heapq
+import logging
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+import pandas as pd
+
+
+# In[2]:
+
+
+# Shape points are merged into one node when they round to the same 1e-5 degree (about 1 meter)
+COORD_SCALE = 100000
+# Road distance (meters) beyond which vehicles are not worth routing to
+MAX_DIST = 20000.0
+# Source nodes whose search is kept on the graph
+CACHE_SIZE = 1024
+
+EDGES_PATH = 'Most_edges.csv'
+GRAPH_COLUMNS = ['edgeID', 'laneID', 'lat', 'lon']
+
+RoadGraph = namedtuple('RoadGraph', ['indptr', 'indices', 'weights', 'node_lat', 'node_lon', 'edge_node', 'cache'])
+
+
+# Edge and lane ids are cleaned the same way as in the exploration notebook, so they match veh_.csv and pedestrian_preference.csv
+def clean_edge_id(ids):
+    return ids.astype(str).str.replace(':', '', regex=False).str.replace('#', '_', regex=False)
+
+
+# Vectorized haversine - distance in meters between two arrays of points
+def haversine_m(lat1, lon1, lat2, lon2):
+    p = 0.017453292519943295
+    hav = 0.5 - np.cos((lat2-lat1)*p)/2 + np.cos(lat1*p)*np.cos(lat2*p) * (1-np.cos((lon2-lon1)*p)) / 2
+    return 12742000 * np.arcsin(np.sqrt(hav))
+
+
+def build_graph(edges_df):
+    df = edges_df[GRAPH_COLUMNS].dropna()
+    edge_ids = clean_edge_id(df['edgeID']).to_numpy()
+    lane_ids = clean_edge_id(df['laneID']).to_numpy()
+    lat = df['lat'].to_numpy(dtype=np.float64)
+    lon = df['lon'].to_numpy(dtype=np.float64)
+
+    # Node id for every shape point
+    key = np.round(lat * COORD_SCALE).astype(np.int64) * (360 * COORD_SCALE) + np.round(lon * COORD_SCALE).astype(np.int64)
+    keys, node = np.unique(key, return_inverse=True)
+    node = node.astype(np.int32)
+    n_nodes = len(keys)
+    node_lat = np.zeros(n_nodes)
+    node_lon = np.zeros(n_nodes)
+    node_lat[node] = lat
+    node_lon[node] = lon
+
+    # Arcs between consecutive shape points of the same lane - travellers can be picked up in either direction
+    same_lane = lane_ids[1:] == lane_ids[:-1]
+    src = node[:-1][same_lane]
+    dst = node[1:][same_lane]
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    w = haversine_m(node_lat[src], node_lon[src], node_lat[dst], node_lon[dst]).astype(np.float32)
+    src, dst, w = np.concatenate([src, dst]), np.concatenate([dst, src]), np.concatenate([w, w])
+
+    order = np.argsort(src, kind='stable')
+    indices = dst[order]
+    weights = w[order]
+    indptr = np.zeros(n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=n_nodes), out=indptr[1:])
+
+    # An edge is located at its first shape point - the same point the vehicle and traveller lat/lon were taken from
+    first = pd.Series(node).groupby(edge_ids, sort=False).first()
+    edge_node = dict(zip(first.index, first.to_numpy().tolist()))
+    return RoadGraph(indptr, indices, weights, node_lat, node_lon, edge_node, OrderedDict())
+
+
+# Road graph of the edge file, or None when the file cannot be read or has no edge geometry
+def load_graph(path=EDGES_PATH):
+    try:
+        edges_df = pd.read_csv(path, index_col=0)
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).warning('No road graph, %s could not be read (%s) - vehicles are ranked by straight-line distance', path, e)
+        return None
+    missing = [c for c in GRAPH_COLUMNS if c not in edges_df]
+    if missing:
+        logging.getLogger(__name__).warning('No road graph, %s has no %s column - vehicles are ranked by straight-line distance', path, ', '.join(missing))
+        return None
+    return build_graph(edges_df)
+
+
+# In[3]:
+
+
+# Single source Dijkstra, stopping once every target node is settled or max_dist (meters) is exceeded
+# The settled nodes and the frontier (heap) of every source are cached, so later queries resume the search instead of starting over
+def network_distances(graph, source, targets, max_dist=MAX_DIST):
+    cache = graph.cache
+    search = cache.get(source)
+    if search is None:
+        search = cache[source] = ({}, [(0.0, source)])
+        while len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(source)
+    settled, heap = search
+
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    remaining = {t for t in targets if t not in settled}
+    # An empty frontier means the whole component is settled - the remaining targets are unreachable
+    while heap and remaining:
+        d, u = heap[0]
+        if d > max_dist:
+            break
+        heapq.heappop(heap)
+        if u in settled:
+            continue
+        settled[u] = d
+        remaining.discard(u)
+        a, b = indptr[u], indptr[u + 1]
+        for v, w in zip(indices[a:b].tolist(), weights[a:b].tolist()):
+            if v not in settled:
+                heapq.heappush(heap, (d + w, v))
+    found = {t: settled.get(t, np.inf) for t in targets}
+    return {t: (d if d <= max_dist else np.inf) for t, d in found.items()}
+
+
+def edge_distances(graph, from_edge, to_edges, max_dist=MAX_DIST):
+    source = graph.edge_node.get(from_edge)
+    nodes = [graph.edge_node.get(e) for e in to_edges]
+    if source is None:
+        return [np.inf] * len(nodes)
+    dist = network_distances(graph, source, [n for n in nodes if n is not None], max_dist)
+    return [dist[n] if n is not None else np.inf for n in nodes]
+
+
+# Re-ordering the nearest vehicles by road distance. Vehicles whose edge is not reachable keep their haversine order at the end.
+def rerank_by_network(graph, traveller_edge, veh_subset, max_dist=MAX_DIST):
+    veh_subset = veh_subset.copy()
+    veh_subset['network_dist'] = edge_distances(graph, str(traveller_edge), veh_subset['edgeID'].astype(str).tolist(), max_dist)
+    return veh_subset.sort_values('network_dist', kind='stable')
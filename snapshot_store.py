@@ -0,0 +1,226 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Snapshots of the results of the recommendation pipeline, shared by the gunicorn workers.
+# The first worker to start runs the pipeline and publishes its frames, small values and the rendered maps into snapshots/<key>/. The other workers find the snapshot and attach it instead of running the pipeline again.
+# Frames are stored column by column as .npy files and attached with np.load(mmap_mode='r'), so every worker maps the same pages of the OS page cache. Text columns are stored as integer codes plus their categories and attached as pandas Categoricals.
+# A snapshot is written to a temporary directory, renamed into place, and then made current by replacing the CURRENT file. Both steps are atomic, so a worker never sees a half-written snapshot.
+# Every worker holds a lease on the snapshot its pages are built from (a .lease.<pid> file naming the key). Old snapshots are only deleted once no live worker holds a lease on them, and the last KEEP snapshots always stay on disk.
+# app.py builds the pages again when a new snapshot is due, and serves the maps of every snapshot still on disk (snapshot_file), so a page built by another worker, or before the refresh, still finds its maps.
+# The key of a snapshot is a hash of the input files (size and modification time) and the hour, so changing the data or the hour publishes a new snapshot.
+
+# In[1]:
+
+
+# Importing libraries
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows - workers then run the pipeline concurrently
+    fcntl = None
+
+
+# In[2]:
+
+
+SNAPSHOT_DIR = 'snapshots'
+CURRENT = 'CURRENT'
+META = 'meta.json'
+LEASE = '.lease.'
+# Snapshots kept on disk, the current one included
+KEEP = 2
+
+Snapshot = namedtuple('Snapshot', ['key', 'path', 'frames', 'values', 'files'])
+
+
+def snapshot_key(paths, *extra):
+    digest = hashlib.sha256()
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            digest.update(('%s:%d:%d;' % (path, stat.st_size, stat.st_mtime_ns)).encode())
+        else:
+            digest.update(('%s:missing;' % path).encode())
+    for value in extra:
+        digest.update(('%s;' % value).encode())
+    return digest.hexdigest()[:16]
+
+
+# Only one worker runs the pipeline; the others wait here and attach the snapshot it publishes
+@contextmanager
+def snapshot_lock(root=SNAPSHOT_DIR):
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.lock'), 'w') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+# In[3]:
+
+
+def _write_frame(path, df):
+    os.makedirs(path)
+    columns = []
+    for i, (name, col) in enumerate([('__index__', df.index.to_series())] + list(df.items())):
+        entry = {'name': str(name) if name != '__index__' else None, 'file': '%d.npy' % i}
+        values = col.to_numpy()
+        if values.dtype.kind in 'biuf':
+            np.save(os.path.join(path, entry['file']), values)
+        else:
+            # Codes are saved in the dtype pandas picks for them, so that attaching does not copy them
+            categorical = pd.Categorical(col)
+            np.save(os.path.join(path, entry['file']), categorical.codes)
+            entry['categories'] = categorical.categories.astype(str).tolist()
+        columns.append(entry)
+    with open(os.path.join(path, META), 'w') as f:
+        json.dump({'index_name': df.index.name, 'columns': columns}, f)
+
+
+def _read_frame(path):
+    with open(os.path.join(path, META)) as f:
+        meta = json.load(f)
+    data = {}
+    for entry in meta['columns']:
+        values = np.load(os.path.join(path, entry['file']), mmap_mode='r')
+        if 'categories' in entry:
+            values = pd.Categorical.from_codes(values, entry['categories'])
+        data[entry['name']] = values
+    index = pd.Index(data.pop(None), name=meta['index_name'])
+    return pd.DataFrame(data, index=index, copy=False)
+
+
+def _json_default(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('%r cannot be stored in a snapshot' % (value,))
+
+
+# frames - name -> DataFrame; values - name -> JSON serialisable value (dates are stored as ISO strings); files - name -> path of a file to copy
+def publish_snapshot(key, frames, values, files, root=SNAPSHOT_DIR):
+    final = os.path.join(root, key)
+    if not os.path.isdir(final):
+        os.makedirs(root, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix='.tmp-', dir=root)
+        try:
+            for name, df in frames.items():
+                _write_frame(os.path.join(tmp, 'frames', name), df)
+            os.makedirs(os.path.join(tmp, 'files'))
+            for name, src in files.items():
+                shutil.copyfile(src, os.path.join(tmp, 'files', name))
+            with open(os.path.join(tmp, META), 'w') as f:
+                json.dump({'frames': list(frames), 'files': list(files), 'values': values}, f, default=_json_default)
+            os.rename(tmp, final)
+        except BaseException:
+            shutil.rmtree(tmp, ignore_errors=True)
+            raise
+    pointer = os.path.join(root, '.%s.%d' % (CURRENT, os.getpid()))
+    with open(pointer, 'w') as f:
+        f.write(key)
+    os.replace(pointer, os.path.join(root, CURRENT))
+    _prune(root, key)
+    return key
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        pass  # a process of another user, or no signals (Windows) - assumed alive
+    return True
+
+
+# Marks the snapshot as used by this worker, so that it is not pruned while the worker runs
+def _lease(root, key):
+    pointer = os.path.join(root, '.%s%d.tmp' % (LEASE, os.getpid()))
+    with open(pointer, 'w') as f:
+        f.write(key)
+    os.replace(pointer, os.path.join(root, '%s%d' % (LEASE, os.getpid())))
+
+
+# Keys leased by live workers; leases of workers that have exited are removed
+def _leased(root):
+    keys = set()
+    for name in os.listdir(root):
+        if not name.startswith(LEASE) or not name[len(LEASE):].isdigit():
+            continue
+        path = os.path.join(root, name)
+        if not _alive(int(name[len(LEASE):])):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                keys.add(f.read().strip())
+        except FileNotFoundError:
+            pass
+    return keys
+
+
+def _prune(root, current, keep=KEEP):
+    versions = [d for d in os.listdir(root) if not d.startswith('.') and os.path.isdir(os.path.join(root, d))]
+    versions.sort(key=lambda d: os.path.getmtime(os.path.join(root, d)), reverse=True)
+    leased = _leased(root)
+    for old in [d for d in versions if d != current][keep - 1:]:
+        if old not in leased:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def current_key(root=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(root, CURRENT)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+# Attaches the current snapshot - or None when there is none, or when it does not match the key
+def attach_snapshot(key=None, root=SNAPSHOT_DIR):
+    current = current_key(root)
+    if current is None or (key is not None and current != key):
+        return None
+    path = os.path.join(root, current)
+    try:
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    _lease(root, current)
+    frames = {name: _read_frame(os.path.join(path, 'frames', name)) for name in meta['frames']}
+    files = {name: os.path.join(path, 'files', name) for name in meta['files']}
+    return Snapshot(current, path, frames, meta['values'], files)
+
+
+# Absolute path of a file of any snapshot on disk (send_file resolves relative paths against the app, not the working directory) - or None when the snapshot has been pruned or has no such file
+def snapshot_file(key, name, root=SNAPSHOT_DIR):
+    if not key.isalnum():
+        return None
+    path = os.path.join(root, key)
+    try:
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+    except FileNotFoundError:
+        return None
+    if name not in meta['files']:
+        return None
+    return os.path.abspath(os.path.join(path, 'files', name))
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Build step for the images of the dashboard.
+# The images used by the pages are copied from assets/ to static/ under a fingerprinted name (name.<content hash>.ext), resized to twice their displayed size and, when Pillow is installed, converted to WebP as well. Brotli (.br) and gzip (.gz) copies are written for files that compress by more than MIN_SAVING. static/manifest.json maps every image to its built files.
+# register_static_assets() serves static/ on STATIC_URL with a one year immutable Cache-Control - the name changes whenever the content does - picking the WebP and precompressed variants the browser accepts. It is a route of its own, next to Flask's /static route, which is left as it is. asset_url() returns the fingerprinted URL of an image, or its assets/ URL when static/ cannot be built.
+# Flask-Compress is enabled for the other responses of the server (layout, call backs, scripts) when it is installed.
+# static/ is not checked in: it is built when this module is imported and the manifest is missing or older than one of the images (ensure_assets()), so a fresh checkout or deploy serves the fingerprinted images from its first request. Every file is written under a temporary name and renamed into place, so workers building at the same time never serve a half-written file. The build can also be run by hand:
+#     python static_assets.py
+
+# In[1]:
+
+
+# Importing libraries
+import gzip
+import hashlib
+import io
+import json
+import logging
+import mimetypes
+import os
+
+from flask import abort, request, send_file
+from werkzeug.security import safe_join
+
+mimetypes.add_type('image/webp', '.webp')
+
+
+# In[2]:
+
+
+ASSETS_DIR = 'assets'
+STATIC_DIR = 'static'
+STATIC_URL = '/static-assets/'
+MANIFEST_NAME = 'manifest.json'
+# Images used by the pages, with the width they are resized to (twice the displayed width)
+PAGE_IMAGES = {
+    'bkgrnd.jpg': 1920,
+    'wkimg.jpg': 600,
+    'image.png': 240,
+    'image_male.png': 240,
+}
+WEBP_QUALITY = 80
+# Precompressed copies are only kept when they are at least this much smaller
+MIN_SAVING = 0.1
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def fingerprint(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def _resize(data, ext, width):
+    try:
+        from PIL import Image
+    except ImportError:
+        return data, None
+    image = Image.open(io.BytesIO(data))
+    if image.width > width:
+        image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format='JPEG' if ext in ('.jpg', '.jpeg') else 'PNG', optimize=True)
+        data = out.getvalue()
+    webp = io.BytesIO()
+    image.save(webp, format='WEBP', quality=WEBP_QUALITY)
+    return data, webp.getvalue()
+
+
+def _precompress(path, data):
+    encodings = {'gz': gzip.compress(data, 9)}
+    try:
+        import brotli
+        encodings['br'] = brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    for suffix, compressed in encodings.items():
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            _replace('%s.%s' % (path, suffix), compressed)
+
+
+def _replace(path, data):
+    tmp = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _write(out_dir, name, data):
+    _replace(os.path.join(out_dir, name), data)
+    _precompress(os.path.join(out_dir, name), data)
+
+
+def build_assets(assets_dir=ASSETS_DIR, out_dir=STATIC_DIR, images=PAGE_IMAGES):
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for name, width in images.items():
+        with open(os.path.join(assets_dir, name), 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        data, webp = _resize(data, ext.lower(), width)
+        built = '%s.%s%s' % (stem, fingerprint(data), ext)
+        _write(out_dir, built, data)
+        manifest[name] = {'path': built}
+        if webp is not None and len(webp) < len(data):
+            manifest[name]['webp'] = '%s.%s.webp' % (stem, fingerprint(webp))
+            _write(out_dir, manifest[name]['webp'], webp)
+    _replace(os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=1).encode())
+    return manifest
+
+
+# In[3]:
+
+
+def load_manifest(out_dir=STATIC_DIR):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_NAME)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+# The manifest of static/, built first when it is missing or older than one of the images
+def ensure_assets(assets_dir=ASSETS_DIR, out_dir=STATIC_DIR, images=PAGE_IMAGES):
+    manifest = load_manifest(out_dir)
+    try:
+        built = os.path.getmtime(os.path.join(out_dir, MANIFEST_NAME)) if manifest else 0
+        if set(images) <= set(manifest) and all(os.path.getmtime(os.path.join(assets_dir, name)) <= built for name in images):
+            return manifest
+        return build_assets(assets_dir, out_dir, images)
+    except OSError as e:
+        # A read-only checkout, or images missing - the pages use assets/
+        logging.getLogger(__name__).warning('static/ not built (%s) - images are served from assets/', e)
+        return manifest
+
+
+_manifest = ensure_assets()
+
+
+def asset_url(name):
+    if name in _manifest:
+        return STATIC_URL + _manifest[name]['path']
+    return '/assets/' + name
+
+
+def register_static_assets(server, out_dir=STATIC_DIR):
+    out_dir = os.path.abspath(out_dir)
+    webp = {entry['path']: entry['webp'] for entry in _manifest.values() if 'webp' in entry}
+
+    def serve(filename):
+        if filename in webp and 'image/webp' in request.headers.get('Accept', ''):
+            filename = webp[filename]
+        path = safe_join(out_dir, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        mimetype = mimetypes.guess_type(filename)[0]
+        encoding = None
+        accepted = request.headers.get('Accept-Encoding', '')
+        for suffix, name in (('br', 'br'), ('gz', 'gzip')):
+            if name in accepted and os.path.isfile('%s.%s' % (path, suffix)):
+                path, encoding = '%s.%s' % (path, suffix), name
+                break
+        response = send_file(path, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Cache-Control'] = CACHE_CONTROL
+        response.headers['Vary'] = 'Accept, Accept-Encoding'
+        return response
+
+    server.add_url_rule(STATIC_URL + '<path:filename>', 'static_assets', serve)
+
+    try:
+        from flask_compress import Compress
+        Compress(server)
+    except ImportError:
+        pass
+
+
+if __name__ == '__main__':
+    for name, entry in build_assets().items():
+        print(name, '->', ', '.join(entry.values()))
@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Style variables shared by the login page (app.py) and the pages of the logged in travellers (dashboard_pages.py).
+
+# In[1]:
+
+
+# ##### Styling dashboard components
+
+from static_assets import asset_url # fingerprinted URL of the background image
+
+
+
+# Dashboard style variables
+colors = {
+    'background': '#FFFFFF',
+    'text': '#000000'
+}
+# the style arguments for the sidebar. We use position:fixed and a fixed width
+SIDEBAR_STYLE = {
+    "position": "fixed",
+    "top": 0,
+    "left": 0,
+    "bottom": 0,
+    "width": "16rem",
+    "padding": "2rem 1rem",
+    "background-color": "#f8f9fa",
+    "text-align": "center"
+}
+
+# the styles for the main content position it to the right of the sidebar and
+# add some padding.
+CONTENT_STYLE = {
+    "margin-left": "18rem",
+    "margin-right": "2rem",
+    "padding": "1rem 1rem",
+}
+
+PAGE_STYLE = {
+    "padding": "16.15rem 16.15rem",
+    "-webkit-background-size": "cover",
+    "background-image": "url('%s')" % asset_url('bkgrnd.jpg')
+}
+
+BUTTON_STYLE = {
+    "color": "white",
+    "text-align": "center",
+    "text-decoration": "none",
+    "background-color": "rgb(13, 110, 253)",
+    "padding": "1px",
+    "display": "inline-block",
+    'font-size':'16px',
+    "height": "32px",
+    "width":"65px",
+    "border-radius": "9px",
+}
+
+# Dash DataTable: press on cell should highlight row
+style_data_conditional = [
+    {
+        "if": {"state": "active"},
+        "backgroundColor": "rgba(150, 180, 225, 0.2)",
+        "border": "1px solid blue",
+    },
+    {
+        "if": {"state": "selected"},
+        "backgroundColor": "rgba(0, 116, 217, .03)",
+        "border": "1px solid blue",
+    },
+]
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that the rain alerts (alert_scheduler.py) are polled by the logged in traveller only, and that the badge counts periods of rain both before and after an alert.
+#     python -m pytest test_alert_scheduler.py
+
+# In[1]:
+
+
+# Importing libraries
+import datetime
+import time
+
+from flask import Flask
+
+from alert_scheduler import AlertScheduler, register_alert_route
+
+HOUR = datetime.timedelta(hours=1)
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_poll_of_the_logged_in_traveller():
+    now = datetime.datetime.now()
+    # The first period of rain is due (lead time of an hour), the second one is not
+    windows = [(now + HOUR / 2, now + 2 * HOUR), (now + 5 * HOUR, now + 6 * HOUR)]
+    alerts = AlertScheduler(lead_time=3600)
+    alerts.subscribe('mary', windows)
+    server = Flask(__name__)
+    server.secret_key = 'test'
+    register_alert_route(server, alerts)
+    client = server.test_client()
+    assert client.get('/alerts/mary').status_code == 403
+    with client.session_transaction() as session:
+        session['user'] = 'alex'
+    assert client.get('/alerts/mary').status_code == 403
+    with client.session_transaction() as session:
+        session['user'] = 'mary'
+    assert wait_for(lambda: alerts.latest('mary') is not None)
+    response = client.get('/alerts/mary')
+    assert response.status_code == 200 and response.headers['Cache-Control'] == 'no-store'
+    alert = response.get_json()
+    # Periods of rain, on the badge of the page as in the alert
+    assert alert['upcoming'] == 2 == alerts.upcoming('mary')
+    assert client.get('/alerts/mary?since=%d' % alert['id']).status_code == 204
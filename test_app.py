@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that the style and text call backs of app.py stay in the browser: only the table, the output text and the page router are answered by the server.
+# Checks that the pages (dashboard_pages.py) are built from the data of the repository as it is checked out - Most_edges.csv may be a git-lfs pointer.
+# Checks that the maps of every snapshot on disk are served, and that the pages are built again when a new snapshot is due.
+#     python -m pytest test_app.py
+
+# In[1]:
+
+
+# Importing libraries
+import datetime
+import functools
+import importlib
+import os
+import shutil
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# Call backs answered by the server: update_table, update_output and display_page
+SERVER_CALLBACKS = 3
+CLIENTSIDE_CALLBACKS = 3
+# WeeklyWeather.csv covers 2022-06-26 to 2023-03-25; the pages are built for a week of it with rain
+RAINY_WEEK = datetime.date(2022, 6, 27)
+
+
+def load_app(monkeypatch, directory=HERE):
+    # app.py reads its datasets from the working directory; the pages are not imported in the background
+    monkeypatch.chdir(directory)
+    monkeypatch.setenv('PRELOAD_PAGES', '0')
+    monkeypatch.syspath_prepend(HERE)
+    sys.modules.pop('app', None)
+    return importlib.import_module('app')
+
+
+def test_callbacks(monkeypatch):
+    app = load_app(monkeypatch)
+    response = app.server.test_client().get('/_dash-dependencies')
+    assert response.status_code == 200
+    callbacks = response.get_json()
+    clientside = [callback for callback in callbacks if callback.get('clientside_function')]
+    assert len(callbacks) - len(clientside) == SERVER_CALLBACKS
+    assert len(clientside) == CLIENTSIDE_CALLBACKS
+
+
+# The pages import the datasets of the repository from a copy, so that their snapshot, maps and statistics are written there
+def load_pages(tmp_path, monkeypatch, today=RAINY_WEEK):
+    for name in os.listdir(HERE):
+        if name.endswith('.csv'):
+            shutil.copy(os.path.join(HERE, name), tmp_path)
+    os.makedirs(tmp_path / 'maps')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(HERE)
+    import rain_alert_fn
+    monkeypatch.setattr(rain_alert_fn, 'rainy_days', functools.partial(rain_alert_fn.rainy_days, today=today))
+    sys.modules.pop('dashboard_pages', None)
+    sys.modules.pop('live_fleet', None)
+    return importlib.import_module('dashboard_pages')
+
+
+def test_pages_without_edge_geometry(tmp_path, monkeypatch):
+    from road_routing import load_graph
+    pointer = tmp_path / 'pointer.csv'
+    pointer.write_text('version https://git-lfs.github.com/spec/v1\noid sha256:0\nsize 10184860\n')
+    assert load_graph(str(pointer)) is None
+    assert load_graph(str(tmp_path / 'missing.csv')) is None
+    pages = load_pages(tmp_path, monkeypatch)
+    # Every vehicle at the positions of the three closest, as in the notebook
+    assert len(pages.electric_veh) == 7 and len(pages.gas_veh) == 8
+    assert sorted(pages.map_urls) == ['avail_electric_veh.html', 'avail_gas_veh.html']
+
+
+def test_maps_of_every_snapshot(tmp_path, monkeypatch):
+    pages = load_pages(tmp_path, monkeypatch)
+    app = load_app(monkeypatch, tmp_path)
+    client = app.server.test_client()
+    old = pages.map_urls['avail_electric_veh.html']
+    assert client.get(old).status_code == 200
+    # A new vehicle dataset is a new snapshot: the pages are built again, and the maps of the previous one are still served
+    stat = os.stat('veh_.csv')
+    os.utime('veh_.csv', ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert not pages.snapshot_current()
+    fresh = app.refresh_pages()
+    assert fresh.snapshot.key != pages.snapshot.key and fresh.snapshot_current()
+    assert app.load_pages() is fresh
+    assert app.refresh_pages() is fresh
+    new = fresh.map_urls['avail_electric_veh.html']
+    assert client.get(new).status_code == 200
+    assert client.get(old).status_code == 200
+    assert client.get('/maps/%s/missing.html' % fresh.snapshot.key).status_code == 404
+    assert client.get('/maps/0000000000000000/avail_electric_veh.html').status_code == 404
+    from snapshot_store import snapshot_file
+    assert snapshot_file('..', 'avail_electric_veh.html') is None
+
+
+def test_vehicles_within(tmp_path, monkeypatch):
+    pages = load_pages(tmp_path, monkeypatch)
+    app = load_app(monkeypatch, tmp_path)
+    client = app.server.test_client()
+    mary = pages.travellers['mary']
+    query = {'lat': mary['person_y'], 'lon': mary['person_x'], 'fuel_preference': 'electric'}
+    response = client.post('/api/within', json=dict(query, radius=500))
+    assert response.status_code == 200
+    vehicles = response.get_json()['vehicles']
+    found = list(pages.vehicle_index.within(query['lat'], query['lon'], 500, ['electric']))
+    assert [v['vehicle_id'] for v in vehicles] == [vehicle_id for _, vehicle_id in found]
+    assert all(v['fuel_type'] == 'electric' and v['dist'] <= 500 for v in vehicles)
+    assert len(client.post('/api/within', json=dict(query, radius=10000, limit=2)).get_json()['vehicles']) == 2
+    for bad in [{'radius': 0}, {'radius': 1e9}, {'radius': 'nan'}, {'radius': 500, 'limit': 0}, {}]:
+        assert client.post('/api/within', json=dict(query, **bad)).status_code == 400
+
+
+def test_fingerprinted_images(monkeypatch):
+    app = load_app(monkeypatch)
+    from static_assets import asset_url
+    url = asset_url('image.png')
+    # static/ is built on import when the checkout has none
+    assert url.startswith('/static-assets/image.')
+    response = app.server.test_client().get(url)
+    assert response.status_code == 200 and 'immutable' in response.headers['Cache-Control']
+    assert app.server.test_client().get('/static-assets/../app.py').status_code == 404
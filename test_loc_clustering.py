@@ -0,0 +1,33 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that the number of clusters (loc_clustering.select_k) is chosen, or refused with a clear error, on the smallest inputs.
+#     python -m pytest test_loc_clustering.py
+
+# In[1]:
+
+
+# Importing libraries
+import pandas as pd
+import pytest
+
+from loc_clustering import elbow, select_k
+
+
+def test_elbow():
+    assert elbow([2, 3, 4, 5, 6], [100.0, 30.0, 20.0, 15.0, 12.0]) == 3
+    assert elbow([4], [10.0]) == 4
+    assert elbow([2, 3], [5.0, 5.0]) == 2
+    # An inertia of 0 does not make the log infinite
+    assert elbow([2, 3, 4], [9.0, 1.0, 0.0]) == 2
+    with pytest.raises(ValueError):
+        elbow([], [])
+
+
+def test_select_k_on_few_rows():
+    rows = pd.DataFrame({'id': [0, 1, 2], 'lat': [43.74, 43.75, 43.76], 'lon': [7.42, 7.43, 7.44]})
+    for method in ('elbow', 'silhouette'):
+        kmeans, diagnostics = select_k(rows, 1, 3, method=method, n_jobs=1)
+        assert kmeans.n_clusters == 2 and list(diagnostics.index) == [2]
+    with pytest.raises(ValueError, match='more rows'):
+        select_k(rows.head(2), 1, 3, n_jobs=1)
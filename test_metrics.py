@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that the sampling profiler (metrics.enable_profiler) writes the stacks of slow requests, and stops sampling once the view has returned its response - before a streamed body is sent.
+#     python -m pytest test_metrics.py
+
+# In[1]:
+
+
+# Importing libraries
+import os
+import threading
+import time
+
+from flask import Flask, Response, stream_with_context
+
+from metrics import _Sampler, enable_profiler
+
+
+def samplers():
+    return [thread for thread in threading.enumerate() if isinstance(thread, _Sampler) and thread.is_alive()]
+
+
+def test_profiler(tmp_path):
+    server = Flask(__name__)
+    sampling = {}
+
+    # Runs after the hooks of the profiler, as the response leaves the app - when some Flask versions only tear a streamed request down once its body is sent
+    @server.after_request
+    def check(response):
+        sampling[response.mimetype] = bool(samplers())
+        return response
+
+    enable_profiler(server, threshold=0.05, interval=0.001, out_dir=str(tmp_path))
+
+    @server.route('/slow')
+    def slow():
+        time.sleep(0.1)
+        return 'done'
+
+    @server.route('/stream')
+    def stream():
+        def events():
+            for _ in range(3):
+                time.sleep(0.05)
+                yield 'data: tick\n\n'
+        return Response(stream_with_context(events()), mimetype='text/event-stream')
+
+    client = server.test_client()
+    assert client.get('/slow').status_code == 200
+    assert [name for name in os.listdir(tmp_path) if '_slow_' in name]
+    response = client.get('/stream', buffered=False)
+    assert response.get_data(as_text=True).count('tick') == 3
+    response.close()
+    assert sampling == {'text/html': False, 'text/event-stream': False}
+    assert not [name for name in os.listdir(tmp_path) if '_stream_' in name]
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that the rain statistics (rain_stats.py) only read the rows appended to the weather file, and read it again from its first row when it has been rewritten - even with a larger file.
+#     python -m pytest test_rain_stats.py
+
+# In[1]:
+
+
+# Importing libraries
+import datetime
+import os
+
+from rain_stats import RainStats, load_rain_stats
+
+UNTIL = datetime.datetime(2030, 1, 1)
+
+
+def write_weather(path, days, weather):
+    start = datetime.datetime(2022, 6, 26)
+    with open(path, 'w') as f:
+        f.write('Weekday,Date,Temp,Weather\n')
+        for i in range(24 * days):
+            when = start + datetime.timedelta(hours=i)
+            f.write('%s,%s %d:00,12,%s\n' % (when.strftime('%A'), when.date(), when.hour, weather))
+
+
+def test_appended_rows(tmp_path):
+    path = str(tmp_path / 'weather.csv')
+    write_weather(path, 2, 'Sunny')
+    stats = RainStats()
+    assert stats.update_from_csv(path, until=UNTIL) == 48
+    with open(path, 'a') as f:
+        f.write('Tuesday,2022-06-28 0:00,12,Rain\n')
+    assert stats.update_from_csv(path, until=UNTIL) == 1
+    assert stats.seen_month.sum() == 49 and stats.rain_month.sum() == 1
+
+
+def test_rewritten_with_a_larger_file(tmp_path):
+    path = str(tmp_path / 'weather.csv')
+    stats_path = str(tmp_path / 'rain_stats.npz')
+    write_weather(path, 2, 'Sunny')
+    load_rain_stats(stats_path, path, save=True)
+    # Rewritten in place with more rows, starting at the same hour - the offset alone would skip its first 48 hours
+    write_weather(path, 3, 'Light rain')
+    stats = load_rain_stats(stats_path, path, save=True)
+    assert stats.seen_month.sum() == 72 and stats.rain_month.sum() == 72
+    # Replaced by another file of the same content - a new inode
+    write_weather(path + '.new', 3, 'Light rain')
+    os.replace(path + '.new', path)
+    stats = load_rain_stats(stats_path, path, save=True)
+    assert stats.seen_month.sum() == 72 and stats.rain_month.sum() == 72
+    # Unchanged - nothing to read
+    assert RainStats.load(stats_path).update_from_csv(path, until=UNTIL) == 0
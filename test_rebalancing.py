@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that the rebalancing plan (rebalancing.py) only covers the periods of rain that have not ended yet.
+#     python -m pytest test_rebalancing.py
+
+# In[1]:
+
+
+# Importing libraries
+import datetime
+
+import pandas as pd
+
+from rebalancing import rebalancing_plan, upcoming_windows
+
+NOW = datetime.datetime(2022, 6, 27, 8)
+HOUR = datetime.timedelta(hours=1)
+
+
+def test_upcoming_windows():
+    past, current, future = (NOW - 3 * HOUR, NOW - HOUR), (NOW - HOUR, NOW + HOUR), (NOW + 2 * HOUR, NOW + 4 * HOUR)
+    assert upcoming_windows([past, current, future], NOW) == [current, future]
+    assert upcoming_windows([(NOW - HOUR, NOW)], NOW) == []
+
+
+def test_plan_skips_past_windows():
+    # Two idle electric vehicles in cluster 0, and a traveller of cluster 1 who prefers one
+    veh_ = pd.DataFrame({'vehicle_id': ['a', 'b'], 'fuel_type': ['electric', 'electric'], 'cluster_label': [0, 0],
+                         'lat': [43.740, 43.741], 'lon': [7.420, 7.421]})
+    travellers = pd.DataFrame({'person_id': ['p'], 'fuel_preference': ['electric'], 'cluster_label': [1],
+                               'person_y': [43.750], 'person_x': [7.430]})
+    past, future = (NOW - 3 * HOUR, NOW - HOUR), (NOW + 2 * HOUR, NOW + 4 * HOUR)
+    plan = rebalancing_plan(veh_, travellers, [past, future], now=NOW)
+    assert len(plan) == 1
+    assert plan['window_start'].iloc[0] == future[0] and plan['to_cluster'].iloc[0] == 1
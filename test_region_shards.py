@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks the hand over of a vehicle between two region shards (region_shards.py): the shard it arrives at answers with it, and with its row.
+#     python -m pytest test_region_shards.py
+
+# In[1]:
+
+
+# Importing libraries
+import os
+import threading
+
+import pandas as pd
+import pytest
+from werkzeug.serving import make_server
+
+from region_shards import Region, ShardRouter, create_shard_app
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+# Shards of veh_.csv split at the median latitude, served on free local ports
+def serve_regions(tmp_path):
+    veh_ = pd.read_csv(os.path.join(HERE, 'veh_.csv'), index_col=0)
+    split = float(veh_['lat'].median())
+    boxes = {'south': [veh_['lat'].min() - 1, veh_['lon'].min() - 1, split, veh_['lon'].max() + 1],
+             'north': [split, veh_['lon'].min() - 1, veh_['lat'].max() + 1, veh_['lon'].max() + 1]}
+    regions, servers = [], []
+    for name, bbox in boxes.items():
+        region = Region(name, 'http://127.0.0.1:0', bbox)
+        server = make_server('127.0.0.1', 0, create_shard_app(region, str(tmp_path / name)), threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        region.url = 'http://127.0.0.1:%d' % server.server_port
+        regions.append(region)
+        servers.append(server)
+    return veh_, split, regions, servers
+
+
+def test_handover(tmp_path, monkeypatch):
+    monkeypatch.chdir(HERE)
+    veh_, split, regions, servers = serve_regions(tmp_path)
+    try:
+        router = ShardRouter(regions)
+        vehicle = veh_.loc[veh_['lat'] < split].iloc[0]
+        before = router.health()
+        # The vehicle drives north, far from the others - it is handed over to the north shard
+        lat, lon = float(veh_['lat'].max()) + 0.05, float(vehicle['lon'])
+        assert router.update([{'op': 'move', 'vehicle_id': vehicle['vehicle_id'], 'lat': lat, 'lon': lon}]) == 1
+        after = router.health()
+        assert after['north']['vehicles'] == before['north']['vehicles'] + 1
+        assert after['south']['vehicles'] == before['south']['vehicles'] - 1
+
+        found = router.clients['north'].json('POST', '/nearest', {'lat': lat, 'lon': lon, 'k': 3})['vehicles']
+        assert len(found) == 3
+        assert found[0]['vehicle_id'] == vehicle['vehicle_id']
+        assert found[0]['driver_name'] == vehicle['driver_name']
+        assert found[0]['dist'] < 1.0
+        assert found[0]['lat'] == pytest.approx(lat)
+
+        # The router decides whether to ask the south shard from the distance of the third vehicle, now measured with the moved one
+        merged = router.nearest(lat, lon, 3)
+        assert [v['vehicle_id'] for v in merged] == [v['vehicle_id'] for v in found]
+    finally:
+        for server in servers:
+            server.shutdown()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that the planar distances of the vehicle index (vehicle_index.py, metric='planar') stay close to the haversine ones within the Monaco scenario: within 0.2% of the distance (PLANAR_TOLERANCE of benchmark.py) plus 1 m for the float32 rounding.
+#     python -m pytest test_vehicle_index.py
+
+# In[1]:
+
+
+# Importing libraries
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from road_routing import haversine_m
+from vehicle_index import VehicleIndex
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REL_TOLERANCE = 0.002
+ABS_TOLERANCE = 1.0
+
+
+def tolerance(dist):
+    return REL_TOLERANCE * dist + ABS_TOLERANCE
+
+
+def test_planar_distances_of_the_fleet():
+    veh_ = pd.read_csv(os.path.join(HERE, 'veh_.csv'), index_col=0)
+    travellers = pd.read_csv(os.path.join(HERE, 'pedestrian_preference.csv'), index_col=0)
+    planar = VehicleIndex.from_frame(veh_, metric='planar')
+    exact = VehicleIndex.from_frame(veh_, metric='haversine')
+    for lat, lon in zip(travellers['person_y'], travellers['person_x']):
+        found = dict((vehicle_id, dist) for dist, vehicle_id in planar.nearest(lat, lon, len(veh_)))
+        for dist, vehicle_id in exact.nearest(lat, lon, len(veh_)):
+            assert found[vehicle_id] == pytest.approx(dist, abs=tolerance(dist))
+
+
+# Random positions over Monaco, a few kilometers around the reference point, with the vectorized distance()
+def test_planar_distances_across_the_city():
+    rng = np.random.default_rng(0)
+    index = VehicleIndex(metric='planar')
+    lats = index.ref_lat + rng.uniform(-0.03, 0.03, 1000)
+    lons = index.ref_lon + rng.uniform(-0.04, 0.04, 1000)
+    for lat, lon in zip(lats[:20], lons[:20]):
+        exact = haversine_m(lat, lon, lats, lons)
+        assert np.all(np.abs(index.distance(lat, lon, lats, lons) - exact) <= tolerance(exact))
@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Checks that veh_rec() recommends the same vehicles with the live vehicle index as with the scan of the notebook - every vehicle at the positions of the three closest - and that it follows the live positions.
+#     python -m pytest test_vehicle_recommendation.py
+
+# In[1]:
+
+
+# Importing libraries
+import os
+
+import pandas as pd
+
+from vehicle_index import VehicleIndex
+from vehicle_recommendation import veh_rec
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def load_data():
+    veh_ = pd.read_csv(os.path.join(HERE, 'veh_.csv'), index_col=0)
+    travellers = pd.read_csv(os.path.join(HERE, 'pedestrian_preference.csv'), index_col=0)
+    return veh_, travellers.loc[travellers['travel_mode'] == 'ebike']
+
+
+def test_index_keeps_the_vehicles_of_the_scan():
+    veh_, ebike_travellers = load_data()
+    scan = veh_rec(ebike_travellers, veh_, ['Wednesday'])
+    live = veh_rec(ebike_travellers, veh_, ['Wednesday'], index=VehicleIndex.from_frame(veh_))
+    # Vehicles of veh_.csv share the positions of their lanes: 7 electric vehicles for Mary and 8 petrol/diesel for Alex, not 3
+    assert len(scan[0]) == 7 and len(scan[1]) == 8
+    assert sorted(live[0]['vehicle_id']) == sorted(scan[0]['vehicle_id'])
+    assert sorted(live[1]['vehicle_id']) == sorted(scan[1]['vehicle_id'])
+    # Radius of the circle of the maps - the distance to the third closest vehicle
+    assert abs(live[5] - scan[5]) < 5.0 and abs(live[4] - scan[4]) < 5.0
+
+
+def test_index_follows_live_positions():
+    veh_, ebike_travellers = load_data()
+    index = VehicleIndex.from_frame(veh_)
+    mary = ebike_travellers.loc[ebike_travellers['traveller_name'] == 'Mary Jane'].iloc[0]
+    far = veh_.loc[veh_['fuel_type'] == 'electric', 'vehicle_id'].iloc[-1]
+    index.upsert(far, float(mary['person_y']), float(mary['person_x']), 'electric')
+    electric_veh = veh_rec(ebike_travellers, veh_, ['Wednesday'], index=index)[0]
+    assert electric_veh['vehicle_id'].iloc[0] == far
+    assert electric_veh['lat'].iloc[0] == mary['person_y']
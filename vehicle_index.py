@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Live spatial index of the vehicles, for finding the closest vehicles without scanning the whole fleet.
+# The vehicles are kept in a grid of square cells (cell_size meters, about 250 m by default) per fuel type. Latitude and longitude are projected to meters with an equirectangular projection around the reference latitude, which is accurate to well under a percent at city scale.
+# upsert() and remove() apply a position update, an arrival or a departure by moving the vehicle between two cells - a constant number of dictionary operations, so the index never has to be rebuilt from veh_.csv.
+# within() is the range query: every vehicle within a radius, yielded lazily closest first, ring by ring, so a caller that stops early never looks at the rest of the fleet. It stops once every vehicle of the fuel types has been seen, and a radius wider than MAX_RINGS rings is answered by a scan of every cell instead.
+# nearest() searches the cell of the traveller and then rings of cells around it, and stops as soon as the k-th closest vehicle found is closer than any vehicle in the next ring could be. Distances are haversine distances in meters.
+# With metric='planar' (DISTANCE_METRIC=planar), positions are projected once, when they are inserted, to meters east and north of the reference point (_coords(), stored in the cells as a tuple of two floats), and distances are Euclidean in that plane, computed in float32 without any trigonometry. distance(), the vectorized form over arrays of positions, projects them with project_m(). Within the Monaco scenario the planar distances stay within 0.2% + 1 m of the haversine ones (test_vehicle_index.py and python benchmark.py check it).
+
+# In[1]:
+
+
+# Importing libraries
+import heapq
+import math
+import os
+import threading
+from collections import defaultdict
+
+import numpy as np
+
+from road_routing import haversine_m
+
+
+# In[2]:
+
+
+CELL_SIZE = 250.0
+# Meters per degree of latitude
+M_PER_DEG = 111320.0
+# Rings searched before falling back to a scan of every vehicle (sparse fleets spread over a large area, or radiuses wider than MAX_RINGS cells)
+MAX_RINGS = 200
+# 'haversine' or 'planar' - see above
+METRIC = os.environ.get('DISTANCE_METRIC', 'haversine')
+
+
+# Vectorized equirectangular projection of GPS positions to float32 meters east and north of the reference point
+def project_m(lat, lon, ref_lat, ref_lon):
+    x = (np.asarray(lon, dtype=np.float64) - ref_lon) * (M_PER_DEG * math.cos(math.radians(ref_lat)))
+    y = (np.asarray(lat, dtype=np.float64) - ref_lat) * M_PER_DEG
+    return x.astype(np.float32), y.astype(np.float32)
+
+
+class VehicleIndex:
+    def __init__(self, cell_size=CELL_SIZE, ref_lat=43.74, metric=None, ref_lon=7.42):
+        self.cell_size = cell_size
+        self.ref_lat = ref_lat
+        self.ref_lon = ref_lon
+        self.metric = metric or METRIC
+        if self.metric not in ('haversine', 'planar'):
+            raise ValueError('unknown distance metric %r' % self.metric)
+        self._m_x = M_PER_DEG * math.cos(math.radians(ref_lat))
+        self._x_scale = M_PER_DEG * math.cos(math.radians(ref_lat)) / cell_size
+        self._y_scale = M_PER_DEG / cell_size
+        self._pos = {}                      # vehicle_id -> (lat, lon, fuel_type, cell)
+        self._cells = defaultdict(dict)     # (fuel_type, cx, cy) -> {vehicle_id: (lat, lon)}, or (x, y) in meters with the planar metric
+        self._counts = defaultdict(int)     # fuel_type -> number of vehicles
+        self.version = 0                    # incremented by every update
+        self.lock = threading.RLock()
+
+    @classmethod
+    def from_frame(cls, veh_, cell_size=CELL_SIZE, metric=None):
+        if len(veh_):
+            index = cls(cell_size, float(veh_['lat'].mean()), metric, float(veh_['lon'].mean()))
+        else:
+            index = cls(cell_size, metric=metric)
+        for vehicle_id, lat, lon, fuel in zip(veh_['vehicle_id'], veh_['lat'], veh_['lon'], veh_['fuel_type']):
+            index.upsert(vehicle_id, lat, lon, fuel)
+        return index
+
+    def __len__(self):
+        return len(self._pos)
+
+    def __contains__(self, vehicle_id):
+        return vehicle_id in self._pos
+
+    def cell(self, lat, lon):
+        return int(math.floor(lon * self._x_scale)), int(math.floor(lat * self._y_scale))
+
+    def position(self, vehicle_id):
+        lat, lon, fuel, _ = self._pos[vehicle_id]
+        return lat, lon, fuel
+
+    # Arrival or move of a vehicle. The fuel type is kept from the previous position when not given.
+    def upsert(self, vehicle_id, lat, lon, fuel_type=None):
+        with self.lock:
+            old = self._pos.get(vehicle_id)
+            if fuel_type is None:
+                if old is None:
+                    raise KeyError('fuel_type is required for the arrival of %s' % vehicle_id)
+                fuel_type = old[2]
+            cell = (fuel_type,) + self.cell(lat, lon)
+            if old is None or old[3] != cell:
+                if old is not None:
+                    self._drop(vehicle_id, old)
+                self._counts[fuel_type] += 1
+            self._cells[cell][vehicle_id] = self._coords(lat, lon)
+            self._pos[vehicle_id] = (lat, lon, fuel_type, cell)
+            self.version += 1
+            return old
+
+    # Departure of a vehicle
+    def remove(self, vehicle_id):
+        with self.lock:
+            old = self._pos.pop(vehicle_id, None)
+            if old is not None:
+                self._drop(vehicle_id, old)
+                self.version += 1
+            return old
+
+    def _drop(self, vehicle_id, old):
+        bucket = self._cells[old[3]]
+        bucket.pop(vehicle_id, None)
+        if not bucket:
+            del self._cells[old[3]]
+        self._counts[old[2]] -= 1
+
+    # Every vehicle as arrays (ids, lat, lon, fuel types) with the version they were taken at, for vectorized queries over the whole fleet
+    def arrays(self):
+        with self.lock:
+            ids = np.array(list(self._pos), dtype=object)
+            values = list(self._pos.values())
+            version = self.version
+        lat = np.fromiter((v[0] for v in values), dtype=np.float64, count=len(values))
+        lon = np.fromiter((v[1] for v in values), dtype=np.float64, count=len(values))
+        fuels = np.array([v[2] for v in values], dtype=object)
+        return ids, lat, lon, fuels, version
+
+    def _ring(self, cx, cy, r):
+        if r == 0:
+            return [(cx, cy)]
+        cells = [(cx + d, cy - r) for d in range(-r, r + 1)] + [(cx + d, cy + r) for d in range(-r, r + 1)]
+        cells += [(cx - r, cy + d) for d in range(-r + 1, r)] + [(cx + r, cy + d) for d in range(-r + 1, r)]
+        return cells
+
+    # Coordinates the distances are measured on
+    def _coords(self, lat, lon):
+        if self.metric == 'planar':
+            return (lon - self.ref_lon) * self._m_x, (lat - self.ref_lat) * M_PER_DEG
+        return lat, lon
+
+    # Distances in meters from a position to arrays of positions, in the metric of the index
+    def distance(self, lat, lon, lats, lons):
+        if self.metric == 'planar':
+            px, py = project_m(lat, lon, self.ref_lat, self.ref_lon)
+            x, y = project_m(lats, lons, self.ref_lat, self.ref_lon)
+            dx, dy = x - px, y - py
+            return np.sqrt(dx * dx + dy * dy).astype(np.float64)
+        return haversine_m(lat, lon, lats, lons)
+
+    def _measure(self, lat, lon, found):
+        if not found:
+            return []
+        ids = list(found)
+        if self.metric == 'planar':
+            coords = np.array(list(found.values()), dtype=np.float32)
+            px, py = self._coords(lat, lon)
+            dx, dy = coords[:, 0] - np.float32(px), coords[:, 1] - np.float32(py)
+            dist = np.sqrt(dx * dx + dy * dy)
+        else:
+            coords = np.array(list(found.values()))
+            dist = haversine_m(lat, lon, coords[:, 0], coords[:, 1])
+        return list(zip(dist.tolist(), ids))
+
+    def _scan(self, fuels):
+        found = {}
+        for key, bucket in self._cells.items():
+            if key[0] in fuels:
+                found.update(bucket)
+        return found
+
+    # k closest vehicles of the given fuel types, as a list of (distance in meters, vehicle_id), closest first
+    def nearest(self, lat, lon, k=3, fuel_types=None):
+        with self.lock:
+            fuels = set(self._counts) if fuel_types is None else set(fuel_types)
+            total = sum(self._counts.get(f, 0) for f in fuels)
+            k = min(k, total)
+            if k == 0:
+                return []
+            cx, cy = self.cell(lat, lon)
+            best = []
+            seen = 0
+            for r in range(MAX_RINGS):
+                found = {}
+                for c in self._ring(cx, cy, r):
+                    for f in fuels:
+                        bucket = self._cells.get((f,) + c)
+                        if bucket:
+                            found.update(bucket)
+                seen += len(found)
+                best += self._measure(lat, lon, found)
+                if len(best) >= k:
+                    best.sort()
+                    best = best[:k]
+                    # Vehicles outside rings 0..r are at least r cells away
+                    if best[-1][0] <= r * self.cell_size or seen >= total:
+                        return best
+                elif seen >= total:
+                    break
+            else:
+                best = self._measure(lat, lon, self._scan(fuels))
+            best.sort()
+            return best[:k]
+
+    # Vehicles of the given fuel types within radius meters, as (distance in meters, vehicle_id), closest first
+    # A generator - vehicles are yielded as soon as no vehicle in the rings not searched yet can be closer
+    def within(self, lat, lon, radius, fuel_types=None):
+        with self.lock:
+            fuels = set(self._counts) if fuel_types is None else set(fuel_types)
+            total = sum(self._counts.get(f, 0) for f in fuels)
+            cx, cy = self.cell(lat, lon)
+            rings = int(math.ceil(radius / self.cell_size)) + 1 if radius < MAX_RINGS * self.cell_size else MAX_RINGS + 1
+            if rings > MAX_RINGS:
+                measured = self._measure(lat, lon, self._scan(fuels))
+        if rings > MAX_RINGS:
+            yield from sorted(item for item in measured if item[0] <= radius)
+            return
+        candidates = []
+        seen = 0
+        for r in range(rings):
+            with self.lock:
+                found = {}
+                for c in self._ring(cx, cy, r):
+                    for f in fuels:
+                        bucket = self._cells.get((f,) + c)
+                        if bucket:
+                            found.update(bucket)
+                measured = self._measure(lat, lon, found)
+            seen += len(found)
+            for item in measured:
+                if item[0] <= radius:
+                    heapq.heappush(candidates, item)
+            # Every vehicle has been seen - the rings further out are empty
+            if seen >= total:
+                break
+            # Vehicles outside rings 0..r are at least r cells away
+            bound = r * self.cell_size
+            while candidates and candidates[0][0] <= bound:
+                yield heapq.heappop(candidates)
+        while candidates:
+            yield heapq.heappop(candidates)
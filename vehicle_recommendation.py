@@ -4,10 +4,15 @@
 
 import pandas as pd
 import math
+import itertools
 import numpy as np
 from math import cos, asin, sqrt
 from math import sin, atan2, radians
 
+from road_routing import rerank_by_network
+from eta_cache import sort_by_eta
+from emission_factors import rank_by_emission
+
 # The distance() takes 2 set of latitude and logitude at a time and calculate the great-circle distance between the two points on a sphere. This is particularly used for navigation purposes.
 # The closest() takes the vehicles geo-cordinates as the first input and traveller's location as the second input. Now the distance() is invoked for each vehicle location against the passenger location, and the co-ordinate with the minimum disatnce is returned as output of the closest() function.
 # The second_nearest() takes the vehicles geo-cordinates as the first input and traveller's location as the second input. Now the distance() is invoked for each vehicle location against the passenger location. The distances are sorted and the second minimum is returned as output of the function.
@@ -30,6 +35,42 @@ def second_nearest(data, v):
 def third_nearest(data, v):
     return sorted(data, key=lambda p: distance(v[0][0],v[0][1],p[0],p[1]))[2]
 
+#Function to select the rows of the vehicle dataframe for (distance, vehicle_id) pairs found in the live vehicle index (vehicle_index.py)
+#Rows are in the order of the pairs, with the current positions from the index and the distance in meters ('dist')
+def live_rows(veh_, index, found):
+    order = {vehicle_id: i for i, (_, vehicle_id) in enumerate(found)}
+    subset = veh_.loc[veh_['vehicle_id'].isin(order)].copy()
+    subset = subset.iloc[subset['vehicle_id'].map(order).argsort()]
+    positions = [index.position(v) for v in subset['vehicle_id']]
+    subset['lat'] = [p[0] for p in positions]
+    subset['lon'] = [p[1] for p in positions]
+    subset['dist'] = [found[order[v]][0] for v in subset['vehicle_id']]
+    return subset
+
+#Function to find the k closest vehicles of the given fuel types in the live vehicle index
+#Returns their rows, closest first, and the distance to the farthest of them in meters - the radius of the circle drawn on the map
+#When the recommendation cache (recommendation_cache.RecommendationCache) is passed, travellers of the same cell share the search
+def live_nearest(veh_, index, lat, lon, fuel_types, k=3, cache=None):
+    found = (cache if cache is not None else index).nearest(lat, lon, k, fuel_types)
+    return live_rows(veh_, index, found), (found[-1][0] if found else 0.0)
+
+#Function to find the vehicles of the given fuel types at the positions of the k closest vehicles in the live vehicle index, closest first
+#This is the result set of the scan in veh_rec(): vehicles are recorded at the first point of their lane, so several of them share a position, and every vehicle at the position of one of the three closest is recommended
+#Returns their rows and the distance to the k-th closest vehicle in meters - the radius of the circle drawn on the map
+def live_at_closest(veh_, index, lat, lon, fuel_types, k=3, cache=None):
+    closest = (cache if cache is not None else index).nearest(lat, lon, k, fuel_types)
+    if not closest:
+        return live_rows(veh_, index, []), 0.0
+    positions = {index.position(vehicle_id)[:2] for _, vehicle_id in closest}
+    found = [(dist, vehicle_id) for dist, vehicle_id in index.within(lat, lon, closest[-1][0] + 1e-6, fuel_types)
+             if index.position(vehicle_id)[:2] in positions]
+    return live_rows(veh_, index, found), closest[-1][0]
+
+#Function to find every vehicle of the given fuel types within radius meters, in the live vehicle index
+#Returns their rows, closest first; limit stops the query after that many vehicles
+def vehicles_within(veh_, index, lat, lon, fuel_types, radius, limit=None):
+    return live_rows(veh_, index, list(itertools.islice(index.within(lat, lon, radius, fuel_types), limit)))
+
 #Function to calculate the distnce between the person and the third nearest point
 #Used in drawing the cirlce on Folium map in meters
 def circle_rad(third_nearest_row,p_points_lat,p_points_lon):
@@ -49,9 +90,14 @@ def circle_rad(third_nearest_row,p_points_lat,p_points_lon):
 # The veh_rec() function takes two inputs. The dataframe with the details of the travellers whom we are building the dashboards for, the vehicle dataset that we have identified to be considered and the list of rainy days in the week.
 # The function checks if there is a rainy day in the week, if so, will proceed with excuting the followin steps.
 # For each individual traveller, the latitude and longitude are identified and stored in a variable. For each vehicle traveller, the latitude and longitude are identified and stored in a variable. These variables are passed to the closest() which returns the closest geo-cordinate of the available vehicle, second_nearest() which returns the second closest geo-cordinate of the available vehicle, third_nearest() which returns the third closest geo-cordinate of the available vehicle. Now based on these locations and the fuel preference, a subset of the vehicle dataframe is identified for each passenger. The function returns the identified vehicle subsets, passenger names and geo-cordinates of passenger.
+# When the road graph (road_routing.build_graph) is passed, the identified vehicle subsets are re-ordered by the road network distance from the traveller's edge instead of the straight-line distance.
+# When the live vehicle index (vehicle_index.VehicleIndex) is passed, the three closest vehicles of the preferred fuel type, and every vehicle sharing their positions, are looked up in the index instead of scanning every vehicle (live_at_closest), using the positions kept up to date by the fleet feed (fleet_feed.py). The vehicles are the same as those of the scan, closest first.
+# When the recommendation cache (recommendation_cache.RecommendationCache) is passed along with the index, the closest vehicles are looked up through the cache.
+# When co2_weight is passed and the vehicle dataframe carries the 'co2_g_km' column (emission_factors.attach_emission_factors), the three vehicles with the best distance + weighted CO2 per km score are recommended instead of the three closest.
+# When the hour of the day is passed, the vehicle subsets are sorted by the estimated pickup time (eta_cache.sort_by_eta), using the per edge and hour speed table if it has been built.
 
 
-def veh_rec(ebike_travellers,veh_,rainy_days):
+def veh_rec(ebike_travellers,veh_,rainy_days,graph=None,speed_table=None,hour=None,co2_weight=None,index=None,cache=None):
     #rainy_days = rainy_days()
     p_points = []  
     p_name = []
@@ -67,35 +113,53 @@ def veh_rec(ebike_travellers,veh_,rainy_days):
                 if (row.traveller_name == "Mary Jane"): 
                     p_points.append([row.person_y, row.person_x])
                     p_name.append([row.traveller_name])
-                    points = []
-                    for vgrp_name, df_vgrp in veh_.groupby('vehicle_id'):
-                        for vrow in df_vgrp.itertuples():
-                            if (vrow.fuel_type == 'electric'):
-                                points.append([vrow.lat, vrow.lon])
-                                v_row_elec.append(vrow)
-                    closest_row = closest(points, p_points)
-                    second_nearest_row = second_nearest(points, p_points)
-                    third_nearest_row = third_nearest(points, p_points)
+                    if index is not None:
+                        electric_veh, electric_veh_dist = live_at_closest(veh_, index, row.person_y, row.person_x, ['electric'], cache=cache)
+                    else:
+                        points = []
+                        for vgrp_name, df_vgrp in veh_.groupby('vehicle_id'):
+                            for vrow in df_vgrp.itertuples():
+                                if (vrow.fuel_type == 'electric'):
+                                    points.append([vrow.lat, vrow.lon])
+                                    v_row_elec.append(vrow)
+                        closest_row = closest(points, p_points)
+                        second_nearest_row = second_nearest(points, p_points)
+                        third_nearest_row = third_nearest(points, p_points)
+                        electric_veh_dist = circle_rad(third_nearest_row,p_points[0][0],p_points[0][1])
+                        electric_veh = veh_.loc[((veh_['lat'] == closest_row[0])|(veh_['lat'] == second_nearest_row[0])| (veh_['lat'] == third_nearest_row[0]))& ((veh_['fuel_type'] == 'electric') )]
                     traveller_name = (row.traveller_name)
                     fuel_ = (row.fuel_preference)
-                    electric_veh_dist = circle_rad(third_nearest_row,p_points[0][0],p_points[0][1])
-                    electric_veh = veh_.loc[((veh_['lat'] == closest_row[0])|(veh_['lat'] == second_nearest_row[0])| (veh_['lat'] == third_nearest_row[0]))& ((veh_['fuel_type'] == 'electric') )]
+                    if co2_weight is not None and 'co2_g_km' in veh_:
+                        electric_veh = rank_by_emission(veh_.loc[veh_['fuel_type'] == 'electric'], row.person_y, row.person_x, co2_weight).head(3)
+                    if graph is not None:
+                        electric_veh = rerank_by_network(graph, row.edgeID, electric_veh)
+                    if hour is not None:
+                        electric_veh = sort_by_eta(electric_veh, row, hour, speed_table, graph)
                 
                 elif (row.traveller_name == "Alex Joe"): 
                     p_points.append([row.person_y, row.person_x])
                     p_name.append([row.traveller_name])
-                    points = []
-                    for vgrp_name, df_vgrp in veh_.groupby('vehicle_id'):
-                        for vrow in df_vgrp.itertuples():
-                            if ((vrow.fuel_type == 'diesel') | (vrow.fuel_type == 'petrol')):
-                                points.append([vrow.lat, vrow.lon])
-                                v_row_gas.append(vrow)
-                    closest_row = closest(points, p_points)
-                    second_nearest_row = second_nearest(points, p_points)
-                    third_nearest_row = third_nearest(points, p_points)
+                    if index is not None:
+                        gas_veh, gas_veh_dist = live_at_closest(veh_, index, row.person_y, row.person_x, ['diesel', 'petrol'], cache=cache)
+                    else:
+                        points = []
+                        for vgrp_name, df_vgrp in veh_.groupby('vehicle_id'):
+                            for vrow in df_vgrp.itertuples():
+                                if ((vrow.fuel_type == 'diesel') | (vrow.fuel_type == 'petrol')):
+                                    points.append([vrow.lat, vrow.lon])
+                                    v_row_gas.append(vrow)
+                        closest_row = closest(points, p_points)
+                        second_nearest_row = second_nearest(points, p_points)
+                        third_nearest_row = third_nearest(points, p_points)
+                        gas_veh = veh_.loc[((veh_['lat'] == closest_row[0])|(veh_['lat'] == second_nearest_row[0])| (veh_['lat'] == third_nearest_row[0])) & ((veh_['fuel_type'] == 'diesel') | (veh_['fuel_type'] == 'petrol'))]
+                        gas_veh_dist = circle_rad(third_nearest_row,p_points[1][0],p_points[1][1])
                     traveller_name = (row.traveller_name)
                     fuel_ = (row.fuel_preference)
-                    gas_veh = veh_.loc[((veh_['lat'] == closest_row[0])|(veh_['lat'] == second_nearest_row[0])| (veh_['lat'] == third_nearest_row[0])) & ((veh_['fuel_type'] == 'diesel') | (veh_['fuel_type'] == 'petrol'))]
-                    gas_veh_dist = circle_rad(third_nearest_row,p_points[1][0],p_points[1][1])
+                    if co2_weight is not None and 'co2_g_km' in veh_:
+                        gas_veh = rank_by_emission(veh_.loc[(veh_['fuel_type'] == 'diesel') | (veh_['fuel_type'] == 'petrol')], row.person_y, row.person_x, co2_weight).head(3)
+                    if graph is not None:
+                        gas_veh = rerank_by_network(graph, row.edgeID, gas_veh)
+                    if hour is not None:
+                        gas_veh = sort_by_eta(gas_veh, row, hour, speed_table, graph)
     return electric_veh,gas_veh,p_points,p_name,gas_veh_dist,electric_veh_dist
 
@@ -0,0 +1,83 @@
+#!/usr/bin/env python
+# coding: utf-8
+
+# Server-side paging, sorting and filtering for the table of recommended vehicles on the Notification pages.
+# The table is rendered with page_action, sort_action and filter_action set to 'custom', so the layout carries no rows. The table callback in app.py asks for one page at a time and only that page is sent to the browser.
+# prepare_table() is called once per candidate list, when the pipeline runs. It keeps the rows and, for every column, the row order sorted ascending and descending, so serving a page is a slice of a cached order instead of a sort.
+
+# In[1]:
+
+
+# Importing libraries
+import math
+
+import numpy as np
+
+
+# In[2]:
+
+
+PAGE_SIZE = 10
+
+# Operators of the DataTable filter row, for text columns
+FILTER_OPERATORS = ('contains', 'datestartswith', '!=', '=', 'ne', 'eq')
+
+
+# Rows and cached sort orders of one candidate list
+def prepare_table(df):
+    df = df.reset_index(drop=True)
+    orders = {}
+    for col in df.columns:
+        for direction, ascending in (('asc', True), ('desc', False)):
+            orders[(col, direction)] = np.asarray(df.sort_values(col, ascending=ascending, kind='mergesort').index)
+    return {'rows': df, 'records': df.to_dict('records'), 'orders': orders}
+
+
+# Parses one term of the filter query, eg. "{Fuel} contains electric" or "{Type} = 'car'"
+def split_filter_part(part):
+    for operator in FILTER_OPERATORS:
+        if ' %s ' % operator in part:
+            name, value = part.split(' %s ' % operator, 1)
+            name = name.strip()
+            if name.startswith('{') and name.endswith('}'):
+                name = name[1:-1]
+            value = value.strip()
+            if value[:1] == value[-1:] and value[:1] in ('"', "'", '`'):
+                value = value[1:-1]
+            return name, operator, value
+    return None, None, None
+
+
+def filter_mask(rows, filter_query):
+    mask = np.ones(len(rows), dtype=bool)
+    for part in (filter_query or '').split(' && '):
+        name, operator, value = split_filter_part(part)
+        if name not in rows:
+            continue
+        col = rows[name].astype(str).str.lower()
+        value = value.lower()
+        if operator == 'contains':
+            mask &= col.str.contains(value, regex=False).to_numpy()
+        elif operator == 'datestartswith':
+            mask &= col.str.startswith(value).to_numpy()
+        elif operator in ('=', 'eq'):
+            mask &= (col == value).to_numpy()
+        else:
+            mask &= (col != value).to_numpy()
+    return mask
+
+
+# One page of the table - returns the records of the page and the number of pages
+def table_page(table, page_current=0, page_size=PAGE_SIZE, sort_by=None, filter_query=''):
+    rows = table['rows']
+    if sort_by and (sort_by[0]['column_id'], sort_by[0]['direction']) in table['orders']:
+        order = table['orders'][(sort_by[0]['column_id'], sort_by[0]['direction'])]
+    else:
+        order = np.arange(len(rows))
+    if filter_query:
+        order = order[filter_mask(rows, filter_query)[order]]
+    page_size = page_size or PAGE_SIZE
+    page_count = max(1, math.ceil(len(order) / page_size))
+    start = (page_current or 0) * page_size
+    records = table['records']
+    return [records[i] for i in order[start:start + page_size]], page_count